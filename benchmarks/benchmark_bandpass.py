@@ -0,0 +1,71 @@
+"""
+Bandpass filtering of the five gating signals.
+
+Compares the former per-signal butter (b, a) design + filtfilt with the cached second-order-section design and
+one batched sosfiltfilt call, and shows how far the (b, a) form drifts for high orders and narrow bands. Run
+from the repository root:
+
+    python benchmarks/benchmark_bandpass.py --frames 3000
+"""
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from scipy.signal import butter, filtfilt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from gating.signal_processing import bandpass_filter  # noqa: E402
+
+
+def bandpass_filter_ba(main_window, signal):
+    """Former implementation: (b, a) design on every call and filtfilt"""
+    gating = main_window.config.gating
+    nyquist = 0.5 * main_window.metadata['frame_rate']
+    b, a = butter(gating.order, [gating.lowcut / nyquist, gating.highcut / nyquist], btype='band')
+
+    return filtfilt(b, a, signal)
+
+
+def best_of(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    return min(times), result
+
+
+def context(frame_rate, lowcut, highcut, order):
+    gating = SimpleNamespace(lowcut=lowcut, highcut=highcut, order=order)
+    return SimpleNamespace(config=SimpleNamespace(gating=gating), metadata={'frame_rate': frame_rate})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    signals = np.random.default_rng(0).normal(size=(5, args.frames))
+    print(f'5 signals of {args.frames} frames')
+    for frame_rate, lowcut, highcut, order in ((30, 1.33, 6.0, 6), (30, 1.33, 6.0, 2), (60, 1.0, 1.5, 6)):
+        main_window = context(frame_rate, lowcut, highcut, order)
+        old_seconds, old = best_of(
+            lambda: np.vstack([bandpass_filter_ba(main_window, signal) for signal in signals]), args.repeats
+        )
+        new_seconds, new = best_of(lambda: bandpass_filter(main_window, signals), args.repeats)
+        deviation = np.max(np.abs(old - new)) / np.max(np.abs(new))
+        print(
+            f'{frame_rate} fps, {lowcut}-{highcut} Hz, order {order}: (b, a) per signal {old_seconds * 1e3:7.2f} ms, '
+            f'cached sos batched {new_seconds * 1e3:7.2f} ms, relative deviation {deviation:.1e}'
+        )
+
+
+if __name__ == '__main__':
+    main()
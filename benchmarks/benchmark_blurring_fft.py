@@ -0,0 +1,69 @@
+"""
+Throughput of the FFT blurring signal used for automatic gating.
+
+Compares the former frame-by-frame float64 implementation with the batched rfft2 version for an
+increasing number of worker threads. Run from the repository root:
+
+    python benchmarks/benchmark_blurring_fft.py --frames 1000 --size 400
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from gating.signal_processing import calculate_blurring_fft  # noqa: E402
+
+
+def blurring_fft_per_frame(frames):
+    """Former implementation: one float64 fft2 + fftshift + partition per frame"""
+    scores = []
+    for frame in frames:
+        magnitude_spectrum = np.abs(np.fft.fftshift(np.fft.fft2(frame)))
+        threshold_index = int(0.9 * magnitude_spectrum.size)
+        scores.append(np.mean(np.partition(magnitude_spectrum.ravel(), threshold_index)[threshold_index:]))
+
+    return np.array(scores)
+
+
+def best_of(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--size', type=int, default=400, help='side length of the (cropped) frames')
+    parser.add_argument('--chunk-size', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    frames = np.random.default_rng(0).integers(0, 256, (args.frames, args.size, args.size), dtype=np.uint8)
+    print(f'{args.frames} frames of {args.size}x{args.size}, {os.cpu_count()} cores')
+
+    seconds, reference = best_of(lambda: blurring_fft_per_frame(frames), args.repeats)
+    print(f'per frame (float64 fft2)  {args.frames / seconds:8.1f} frames/s')
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        seconds, scores = best_of(
+            lambda: calculate_blurring_fft.__wrapped__(frames, chunk_size=args.chunk_size, workers=workers),
+            args.repeats,
+        )
+        deviation = np.max(np.abs(scores / reference - 1))
+        print(f'batched rfft2, {workers:2d} workers {args.frames / seconds:8.1f} frames/s (deviation {deviation:.1e})')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Accuracy and runtime of the image-based gating signals at reduced resolution.
+
+Builds a synthetic pullback whose speckle pattern moves with a cardiac-like rhythm (displacement and motion blur
+peak twice per beat), computes correlation and blurring on the cropped frames at full resolution and after
+area-averaged downsampling (config gating.downsample), and compares the extrema of the combined, filtered image
+signal with the full-resolution ones. Run from the repository root:
+
+    python benchmarks/benchmark_gating_resolution.py --frames 600 --size 400
+"""
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from omegaconf import OmegaConf
+from scipy.ndimage import gaussian_filter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from gating.signal_processing import (  # noqa: E402
+    bandpass_filter,
+    calculate_blurring_fft,
+    calculate_correlation,
+    combined_signal,
+    downsample_frames,
+    identify_extrema,
+    normalize_data,
+)
+
+
+def synthetic_pullback(n_frames, size, frame_rate, heart_rate, seed=0):
+    """Speckle pattern shifted and motion-blurred with the cardiac cycle, plus noise"""
+    rng = np.random.default_rng(seed)
+    pattern = gaussian_filter(rng.random((size, size)), 1.5)
+    pattern = (pattern - pattern.min()) / np.ptp(pattern) * 200
+    time_s = np.arange(n_frames) / frame_rate
+    displacement = 6 * np.sin(2 * np.pi * heart_rate / 60 * time_s)
+    velocity = np.abs(np.gradient(displacement))
+    frames = np.empty((n_frames, size, size), dtype=np.uint8)
+    for i in range(n_frames):
+        shifts = np.round(displacement[i] + np.linspace(-velocity[i], velocity[i], 5)).astype(int)
+        frame = np.mean([np.roll(pattern, (shift, shift // 2), axis=(0, 1)) for shift in shifts], axis=0)
+        frames[i] = np.clip(frame + rng.normal(0, 10, (size, size)), 0, 255)
+
+    return frames
+
+
+def image_signal(main_window, frames, factor):
+    """Image-based part of prepare_data for the whole stack"""
+    reduced = downsample_frames(frames, factor)
+    correlation, blurring = calculate_correlation(reduced), calculate_blurring_fft(reduced)
+    step = main_window.config.gating.normalize_step
+    signals = [bandpass_filter(main_window, normalize_data(signal, step)) for signal in (correlation, blurring)]
+
+    return combined_signal(main_window, signals, maxima_only=main_window.config.gating.maxima_only)
+
+
+def best_of(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--size', type=int, default=400, help='side length of the (cropped) frames')
+    parser.add_argument('--frame-rate', type=float, default=30)
+    parser.add_argument('--heart-rate', type=float, default=70, help='beats per minute')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--tolerance', type=int, default=1, help='frames an extremum may move')
+    args = parser.parse_args()
+
+    config = OmegaConf.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'config.yaml'))
+    main_window = SimpleNamespace(config=config, metadata={'frame_rate': args.frame_rate})
+    frames = synthetic_pullback(args.frames, args.size, args.frame_rate, args.heart_rate)
+    print(f'{args.frames} frames of {args.size}x{args.size}, {args.heart_rate:.0f} bpm at {args.frame_rate:.0f} fps')
+
+    reference_time, reference_extrema = None, None
+    for factor in (1, 2, 4):
+        seconds, signal = best_of(lambda: image_signal(main_window, frames, factor), args.repeats)
+        extrema = identify_extrema(main_window, signal)[0]
+        if reference_extrema is None:
+            reference_time, reference_extrema = seconds, extrema
+        offsets = np.abs(reference_extrema[:, None] - extrema[None, :]).min(axis=1)
+        matched = np.mean(offsets <= args.tolerance)
+        print(
+            f'downsample {factor}: {seconds:6.2f} s ({reference_time / seconds:5.1f}x), '
+            f'{len(extrema)} extrema, {matched:.0%} within {args.tolerance} frame of full resolution'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Runtime, peak memory and accuracy of the PCA motion signal next to correlation and blurring.
+
+Uses the synthetic pullback of benchmark_gating_resolution.py, whose resting frames (extremes of the cardiac
+displacement) are known. Each signal is filtered like in prepare_data and its maxima are compared with the
+resting frames. Memory is the peak traced by tracemalloc while computing the signal on a stack that is already
+downsampled (correlation, blurring) or streamed in chunks (PCA). Run from the repository root:
+
+    python benchmarks/benchmark_motion_pca.py --frames 5000 --size 256
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from omegaconf import OmegaConf
+from scipy.signal import find_peaks
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from benchmark_gating_resolution import synthetic_pullback  # noqa: E402
+from gating.headless_gating import GatingContext  # noqa: E402
+from gating.signal_processing import (  # noqa: E402
+    bandpass_filter,
+    calculate_blurring_fft,
+    calculate_correlation,
+    calculate_motion_pca,
+    downsample_frames,
+    identify_extrema,
+    normalize_data,
+)
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return seconds, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=256, help='side length of the (cropped) frames')
+    parser.add_argument('--downsample', type=int, default=2)
+    parser.add_argument('--frame-rate', type=float, default=30)
+    parser.add_argument('--heart-rate', type=float, default=70, help='beats per minute')
+    args = parser.parse_args()
+
+    config = OmegaConf.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'config.yaml'))
+    config.gating.auto_heart_rate = False
+    context = GatingContext(config, args.frame_rate)
+    frames = synthetic_pullback(args.frames, args.size, args.frame_rate, args.heart_rate)
+    displacement = np.sin(2 * np.pi * args.heart_rate / 60 * np.arange(args.frames) / args.frame_rate)
+    resting = np.sort(np.concatenate([find_peaks(displacement)[0], find_peaks(-displacement)[0]]))
+    print(f'{args.frames} frames of {args.size}x{args.size}, downsampled {args.downsample}x, {len(resting)} resting phases')
+
+    reduced = downsample_frames(frames, args.downsample)
+    signals = {
+        'correlation': lambda: calculate_correlation.__wrapped__(reduced),
+        'blurring': lambda: calculate_blurring_fft.__wrapped__(reduced),
+        'PCA motion': lambda: calculate_motion_pca.__wrapped__(frames, args.downsample),
+    }
+    for name, function in signals.items():
+        seconds, peak, signal = measure(function)
+        filtered = bandpass_filter(context, normalize_data(signal, config.gating.normalize_step))
+        maxima = identify_extrema(context, filtered)[1]
+        offsets = np.abs(resting[:, None] - maxima[None, :]).min(axis=1)
+        print(
+            f'{name:12s} {seconds:6.2f} s, peak memory {peak / 1e6:7.1f} MB, '
+            f'{np.mean(offsets <= 1):4.0%} of resting phases found within 1 frame ({len(maxima)} maxima)'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Shared FFT pass of calculate_spectral_signals against separate passes per signal.
+
+The separate passes transform every frame once for the blurring score (calculate_blurring_fft), twice for the
+phase correlation of the pairs it belongs to and once more for the spectral similarity, the shared pass reuses one
+rfft2 per frame for all three. Also reports how many resting phases of the synthetic pullback of
+benchmark_gating_resolution.py each signal finds. Run from the repository root:
+
+    python benchmarks/benchmark_spectral_signals.py --frames 2000 --size 256
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import scipy.fft
+from omegaconf import OmegaConf
+from scipy.signal import find_peaks
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from benchmark_gating_resolution import synthetic_pullback  # noqa: E402
+from gating.headless_gating import GatingContext  # noqa: E402
+from gating.signal_processing import (  # noqa: E402
+    bandpass_filter,
+    calculate_blurring_fft,
+    calculate_spectral_signals,
+    downsample_frames,
+    identify_extrema,
+    normalize_data,
+)
+
+
+def separate_passes(frames):
+    """Blurring, phase correlation shift and spectral similarity, each with its own FFTs"""
+    blurring = calculate_blurring_fft.__wrapped__(frames)
+    n_rows, n_cols = frames.shape[1:]
+    shift = []
+    for previous, current in zip(frames[:-1], frames[1:]):
+        previous_spectrum, spectrum = scipy.fft.rfft2(np.stack([previous, current]).astype(np.float32))
+        cross_power = previous_spectrum * np.conj(spectrum)
+        surface = scipy.fft.irfft2(cross_power / np.maximum(np.abs(cross_power), 1e-12), s=(n_rows, n_cols))
+        row, col = np.unravel_index(surface.argmax(), surface.shape)
+        shift.append(-np.hypot((row + n_rows / 2) % n_rows - n_rows / 2, (col + n_cols / 2) % n_cols - n_cols / 2))
+    magnitude = np.abs(scipy.fft.rfft2(frames.astype(np.float32))).reshape(len(frames), -1)
+    magnitude[:, 0] = 0
+    magnitude /= np.linalg.norm(magnitude, axis=1, keepdims=True)
+    similarity = np.sum(magnitude[:-1] * magnitude[1:], axis=1)
+
+    return blurring, np.append(shift, shift[-1]), np.append(similarity, similarity[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=256, help='side length of the (cropped) frames')
+    parser.add_argument('--downsample', type=int, default=2)
+    parser.add_argument('--frame-rate', type=float, default=30)
+    parser.add_argument('--heart-rate', type=float, default=70, help='beats per minute')
+    args = parser.parse_args()
+
+    config = OmegaConf.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'config.yaml'))
+    config.gating.auto_heart_rate = False
+    context = GatingContext(config, args.frame_rate)
+    frames = synthetic_pullback(args.frames, args.size, args.frame_rate, args.heart_rate)
+    displacement = np.sin(2 * np.pi * args.heart_rate / 60 * np.arange(args.frames) / args.frame_rate)
+    resting = np.sort(np.concatenate([find_peaks(displacement)[0], find_peaks(-displacement)[0]]))
+    reduced = downsample_frames(frames, args.downsample)
+    print(f'{args.frames} frames of {args.size}px, downsampled {args.downsample}x, {len(resting)} resting phases')
+
+    for name, function in (
+        ('blurring only', lambda stack: calculate_blurring_fft.__wrapped__(stack, workers=1)),
+        ('separate passes', separate_passes),
+        ('shared pass', lambda stack: calculate_spectral_signals.__wrapped__(stack, workers=1)),
+    ):
+        start = time.perf_counter()
+        signals = function(reduced)
+        print(f'{name:15s} {time.perf_counter() - start:.2f} s')
+
+    for name, signal in zip(('blurring', 'phase shift', 'similarity'), signals):
+        filtered = bandpass_filter(context, normalize_data(signal, config.gating.normalize_step))
+        maxima = identify_extrema(context, filtered)[1]
+        offsets = np.abs(resting[:, None] - maxima[None, :]).min(axis=1)
+        print(f'{name:12s} {np.mean(offsets <= 1):4.0%} of resting phases found within 1 frame ({len(maxima)} maxima)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Runtime and accuracy of windowed gating (config gating.window) on a long pullback.
+
+Builds the normalised raw signals of a pullback whose heart rate drifts between --start-bpm and --end-bpm and
+whose correlation signal degrades halfway (e.g. the catheter starts to wobble), then gates it once over the
+whole range and once in overlapping windows. Accuracy is the fraction of resting phases (extremes of the cardiac
+displacement) gated within 1 frame, and the fraction of gated frames that are resting phases. Run from the
+repository root:
+
+    python benchmarks/benchmark_windowed_gating.py --frames 8000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from omegaconf import OmegaConf
+from scipy.signal import find_peaks
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from gating.headless_gating import GatingContext, phase_frames  # noqa: E402
+from gating.signal_processing import filter_signals, normalize_data  # noqa: E402
+
+
+def synthetic_signals(n_frames, frame_rate, start_bpm, end_bpm, seed=0):
+    """Raw image and contour signals and report table of a pullback with drifting heart rate"""
+    rng = np.random.default_rng(seed)
+    bpm = np.linspace(start_bpm, end_bpm, n_frames)
+    phase = 2 * np.pi * np.cumsum(2 * bpm / 60 / frame_rate)  # systole and diastole, as for lowcut and highcut
+    displacement = np.sin(phase)
+    velocity = np.abs(np.cos(phase))  # motion between frames, lowest at rest
+
+    noise = np.where(np.arange(n_frames) < n_frames // 2, 0.2, 1.5)  # correlation degrades halfway
+    correlation = -velocity + rng.normal(0, 1, n_frames) * noise
+    blurring = -velocity + rng.normal(0, 0.4, n_frames)
+    contour = [displacement + rng.normal(0, 0.3, n_frames) for _ in range(3)]
+    report_data = pd.DataFrame(
+        {'frame': np.arange(1, n_frames + 1), 'elliptic_ratio': 1.2 + 0.1 * displacement},
+        index=np.arange(1, n_frames + 1),
+    )
+    resting = np.sort(np.concatenate([find_peaks(displacement)[0], find_peaks(-displacement)[0]]))
+
+    return [correlation, blurring], contour, report_data, resting
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=8000)
+    parser.add_argument('--frame-rate', type=float, default=30)
+    parser.add_argument('--start-bpm', type=float, default=55)
+    parser.add_argument('--end-bpm', type=float, default=110)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    config = OmegaConf.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'config.yaml'))
+    image_signals, contour_signals, report_data, resting = synthetic_signals(
+        args.frames, args.frame_rate, args.start_bpm, args.end_bpm
+    )
+    step = config.gating.normalize_step
+    image_signals = [normalize_data(signal, step) for signal in image_signals]
+    contour_signals = [normalize_data(signal, step) for signal in contour_signals]
+    print(f'{args.frames} frames, {args.start_bpm:.0f} to {args.end_bpm:.0f} bpm, {len(resting)} resting phases')
+
+    for window in (0, config.gating.window):
+        config.gating.window = window
+        context = GatingContext(config, args.frame_rate)
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            signals = filter_signals(context, image_signals, contour_signals)
+            diastolic, systolic, _, _ = phase_frames(context, report_data, signals[2], signals[3])
+            timings.append(time.perf_counter() - start)
+        gated = np.sort(np.concatenate([diastolic, systolic])).astype(int)
+        found = np.abs(resting[:, None] - gated[None, :]).min(axis=1) <= 1
+        correct = np.abs(gated[:, None] - resting[None, :]).min(axis=1) <= 1
+        label = f'window {window}' if window else 'whole range'
+        print(
+            f'{label:12s} {min(timings):6.3f} s, {np.mean(found):4.0%} of resting phases gated, '
+            f'{np.mean(correct):4.0%} of {len(gated)} gated frames at rest'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import itertools
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from gating.headless_gating import GatingContext, phase_frames
+from gating.signal_processing import filter_signals, raw_signals
+
+DEFAULT_GRID = {
+    'lowcut': [0.8, 1.0, 1.33, 1.67],
+    'highcut': [4.0, 5.0, 6.0, 8.0],
+    'order': [2, 4, 6],
+    'extrema_y_lim': [30, 50, 70],
+    'extrema_x_lim': [4, 6, 8],
+}
+FILTER_PARAMETERS = ('lowcut', 'highcut', 'order')
+EXTREMA_PARAMETERS = ('extrema_y_lim', 'extrema_x_lim')
+
+
+def beat_regularity(diastolic_frames, systolic_frames, n_frames, frame_rate, min_bpm=40, max_bpm=180):
+    """
+    Score of a gating result, lower is better: mean coefficient of variation of the beat intervals of both phases
+    plus the fraction of beats missing over the pullback. NaN if a phase has fewer than three frames or the median
+    beat interval is outside min_bpm to max_bpm.
+    """
+    scores = []
+    for frames in (diastolic_frames, systolic_frames):
+        if len(frames) < 3:
+            return np.nan
+        intervals = np.diff(frames)
+        median_interval = np.median(intervals)
+        if not frame_rate * 60 / max_bpm <= median_interval <= frame_rate * 60 / min_bpm:
+            return np.nan
+        missing = max(0.0, 1 - len(frames) * median_interval / n_frames)
+        scores.append(np.std(intervals) / np.mean(intervals) + missing)
+
+    return float(np.mean(scores))
+
+
+def filter_settings(grid, frame_rate):
+    """Combinations of the FILTER_PARAMETERS in grid with lowcut < highcut < Nyquist frequency"""
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    return [
+        dict(zip(FILTER_PARAMETERS, values))
+        for values in itertools.product(*(grid[name] for name in FILTER_PARAMETERS))
+        if values[0] < values[1] < frame_rate / 2
+    ]
+
+
+def tune_settings(base_config, grid, frame_rate):
+    """
+    The gating configs evaluated by auto_tune: base_config with every filter_settings combination and
+    auto_heart_rate off. If auto_heart_rate is set in base_config, the filter band derived from the heart rate
+    estimate competes as one more setting (the configured values are its fallback).
+    """
+    settings = [{**base_config, **setting} for setting in filter_settings(grid, frame_rate)]
+    if 'auto_heart_rate' not in base_config:
+        return settings
+    settings = [{**setting, 'auto_heart_rate': False} for setting in settings]
+    if base_config['auto_heart_rate']:
+        settings.append(dict(base_config))
+    return settings
+
+
+def _evaluate_filter(gating_config, frame_rate, image_signals, contour_signals, report_data, methods, extrema_grid):
+    """
+    Scores all extrema settings for one filter setting (gating_config). The signals are filtered and combined
+    with filter_signals as for gating, i.e. in windows and with the heart rate estimate if configured.
+    """
+    gating = SimpleNamespace(**gating_config)  # plain attributes, OmegaConf access adds up over the grid
+    rows = []
+    logger.disable('gating.signal_processing')  # signal weights are logged for every combination otherwise
+    try:
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            warnings.simplefilter('ignore')
+            for extrema in extrema_grid:
+                vars(gating).update(extrema)  # the signal weights depend on the extrema settings
+                context = GatingContext(SimpleNamespace(gating=gating), frame_rate)
+                row = {**gating_config, **extrema, 'score': np.nan, 'beats': 0}
+                try:
+                    *_, image_signal, contour_signal = filter_signals(context, image_signals, contour_signals)
+                    phases = phase_frames(context, report_data, image_signal, contour_signal, *methods)
+                    diastolic, systolic = phases[:2]
+                    row['score'] = beat_regularity(diastolic, systolic, len(report_data), frame_rate)
+                    row['beats'] = min(len(diastolic), len(systolic))
+                except ValueError:  # invalid band or signal too short for the filter order
+                    pass
+                rows.append(row)
+    finally:
+        logger.enable('gating.signal_processing')
+
+    return rows
+
+
+def auto_tune(
+    main_window,
+    frames,
+    report_data,
+    grid=None,
+    image_method='maxima',
+    contour_method='extrema',
+    crop=(50, 450, 50, 450),
+    frame_range=None,
+    workers=None,
+    progress_callback=None,
+    is_cancelled=None,
+):
+    """
+    Grid search over the filter and extrema parameters of config.gating.
+
+    The raw signals are computed once, every filter setting (lowcut, highcut, order, see tune_settings) is then
+    evaluated in a separate process for all extrema settings (extrema_y_lim, extrema_x_lim) and scored with
+    beat_regularity.
+
+    Parameters:
+    - main_window: Main window or gating.headless_gating.GatingContext (config and metadata are used).
+    - frames, report_data, crop, frame_range: As for prepare_data.
+    - grid (dict): Values to try per parameter, missing parameters are taken from DEFAULT_GRID.
+    - image_method, contour_method (str): 'maxima' or 'extrema', as in the Select Gating Methods dialog.
+    - workers (int): Number of processes, 1 evaluates in the calling process. Defaults to the number of cores.
+        The processes are spawned, not forked, so a calling GUI and its threads are not copied.
+    - progress_callback (callable): Called with the number of filter settings evaluated so far.
+    - is_cancelled (callable): Polled after every filter setting, the search stops if it returns True.
+
+    Returns:
+    - best (dict): The gating config with the best scoring parameters, None if no setting found regular beats.
+    - ranking (pandas.DataFrame): One row per parameter combination, best first.
+    None instead of (best, ranking) if cancelled.
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    frame_rate = main_window.metadata['frame_rate']
+    base_config = dict(main_window.config.gating)
+    image_signals, contour_signals = raw_signals(main_window, frames, report_data, crop, frame_range)
+    report_data = report_data[['frame', 'elliptic_ratio']].copy()
+
+    extrema_values = itertools.product(*(grid[name] for name in EXTREMA_PARAMETERS))
+    extrema_grid = [dict(zip(EXTREMA_PARAMETERS, values)) for values in extrema_values]
+    tasks = tune_settings(base_config, grid, frame_rate)
+    arguments = [
+        (config, frame_rate, image_signals, contour_signals, report_data, (image_method, contour_method), extrema_grid)
+        for config in tasks
+    ]
+    logger.info(f'Auto-tuning gating parameters, {len(tasks) * len(extrema_grid)} combinations')
+
+    workers = workers or os.cpu_count() or 1
+    results = []
+    if workers == 1 or len(arguments) < 2:
+        evaluated = (_evaluate_filter(*args) for args in arguments)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(arguments)), mp_context=multiprocessing.get_context('spawn')
+        )
+        evaluated = executor.map(_evaluate_filter, *zip(*arguments))
+    try:
+        for rows in evaluated:
+            results.append(rows)
+            if progress_callback is not None:
+                progress_callback(len(results))
+            if is_cancelled is not None and is_cancelled():
+                return None
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    columns = [*FILTER_PARAMETERS, *EXTREMA_PARAMETERS, 'score', 'beats']
+    if 'auto_heart_rate' in base_config:
+        columns.insert(-2, 'auto_heart_rate')
+    ranking = pd.DataFrame([row for rows in results for row in rows])
+    if ranking.empty:
+        return None, pd.DataFrame(columns=columns)
+    ranking = ranking[columns].sort_values(['score', 'beats'], ascending=[True, False], na_position='last')
+    ranking = ranking.reset_index(drop=True)
+    if np.isnan(ranking['score'].iloc[0]):
+        return None, ranking
+
+    best = {**base_config, **{name: ranking[name].iloc[0].item() for name in columns[:-2]}}
+
+    return best, ranking
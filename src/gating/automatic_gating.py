@@ -2,7 +2,7 @@ import itertools
 import numpy as np
 from loguru import logger
 
-from gating.signal_processing import identify_extrema
+from gating.headless_gating import phase_frames
 from gui.popup_windows.frame_range_dialog import StartFramesDialog
 
 from PyQt6.QtWidgets import (
@@ -80,65 +80,23 @@ class AutomaticGating:
         - contour_based_signal (numpy.ndarray): The signal containing contour measurements (filtered).
         """
         dialog = GatingMethodDialog(self.main_window)
-        if dialog.exec_():
+        if dialog.exec():
             image_method, contour_method = dialog.get_methods()
-            if image_method == "maxima":
-                temp_indices = identify_extrema(self.main_window, image_based_signal)
-                image_indices = temp_indices[1]
-            else:
-                image_indices = temp_indices[0]
-            if contour_method == "maxima":
-                temp_indices = identify_extrema(self.main_window, contour_based_signal)
-                contour_indices = temp_indices[1]
-            else:
-                contour_indices = temp_indices[0]
-
-            # Create a list with indices most likely presenting systole/diastole
-            # Take common intersection
-            final_indices = np.intersect1d(image_indices, contour_indices)
-            # print(f"Image based indices: {image_indices}")
-            # print(f"Contour based indices: {contour_indices}")
-            # print(f"Combined indices: {final_indices}")
-            # _write_csv_signals(image_based_signal, 
-            #                   contour_based_signal, 
-            #                   image_indices, 
-            #                   contour_indices, 
-            #                   final_indices)
-            # start by initializing every second
-            first_half = final_indices[::2].tolist()
-            second_half = final_indices[1::2].tolist()
-
-            # systolic contours always have higher elliptic ratio intramural because of compression
-            sum_first_half = sum(
-                [
-                    self.report_data.loc[self.report_data['frame'] == frame, 'elliptic_ratio'].values[0]
-                    for frame in first_half
-                ]
-            )
-            sum_second_half = sum(
-                [
-                    self.report_data.loc[self.report_data['frame'] == frame, 'elliptic_ratio'].values[0]
-                    for frame in second_half
-                ]
+            gated_frames_dia, gated_frames_sys, _, _ = phase_frames(
+                self.main_window,
+                self.report_data,
+                image_based_signal,
+                contour_based_signal,
+                image_method,
+                contour_method,
             )
 
             # reset all phases
-            self.main_window.data['phases'] == '-'
-            self.main_window.gated_frames_dia = []
-            self.main_window.gated_frames_sys = []
+            self.main_window.data['phases'] = ['-'] * len(self.main_window.data['phases'])
             self.main_window.diastolic_frame_box.setChecked(False)
             self.main_window.systolic_frame_box.setChecked(False)
-
-            if sum_first_half > sum_second_half:
-                self.main_window.gated_frames_dia = second_half
-                self.main_window.gated_frames_sys = first_half
-                self.main_window.gated_frames_dia.sort()
-                self.main_window.gated_frames_sys.sort()
-            else:
-                self.main_window.gated_frames_dia = first_half
-                self.main_window.gated_frames_sys = second_half
-                self.main_window.gated_frames_dia.sort()
-                self.main_window.gated_frames_sys.sort()
+            self.main_window.gated_frames_dia = gated_frames_dia
+            self.main_window.gated_frames_sys = gated_frames_sys
 
             for frame in self.main_window.gated_frames_dia:
                 self.main_window.data['phases'][frame] = 'D'
@@ -1,6 +1,7 @@
 import warnings
 import time
 import itertools
+from functools import partial
 import numpy as np
 from matplotlib.backend_bases import MouseButton
 import matplotlib.pyplot as plt
@@ -9,10 +10,15 @@ from loguru import logger
 from gating.signal_processing import *
 from gui.utils.helpers import connect_consecutive_frames
 from gating.automatic_gating import AutomaticGating
+from gating.headless_gating import phase_frames
+from gating.image_signals import DEFAULT_CROP
+from gating.auto_tune import FILTER_PARAMETERS, EXTREMA_PARAMETERS, auto_tune, tune_settings
 from gui.popup_windows.message_boxes import ErrorMessage
 from gui.popup_windows.frame_range_dialog import FrameRangeDialog, StartFramesDialog
+from gui.popup_windows.gating_parameters import GatingParametersDialog
 from gui.right_half.right_half import toggle_diastolic_frame, toggle_systolic_frame
 from report.report import report
+from report.report_worker import BackgroundTask
 
 
 def timing_decorator(func):
@@ -35,6 +41,15 @@ class ContourBasedGating:
         self.current_phase = None
         self.tmp_phase = None
         self.frame_marker = None
+        self.line_positions = np.array([])  # x positions of vertical_lines, both kept sorted
+        self.background = None  # static part of the figure (signals, legend) for blitting
+        self.event_connections = []
+        self.measured_signals = None  # raw signals of the frame range before normalisation (prepare_data), for refilter
+        self.signal_lines = []  # filtered image, filtered contour, image, contour
+        self.heart_rate_text = None
+        self.preview_markers = []  # diastolic and systolic candidates of the default gating methods
+        self.parameters_dialog = None
+        self.auto_tune_task = None
         self.default_line_color = 'grey'
         self.default_linestyle = (0, (1, 3))
 
@@ -44,13 +59,111 @@ class ContourBasedGating:
         if not dialog_success:
             self.main_window.status_bar.showMessage(self.main_window.waiting_status)
             return
+        *signals, self.measured_signals = prepare_data(
+            self.main_window, self.frames, self.report_data, frame_range=self.frame_range, return_measured=True
+        )
+        self.plot_data(*signals)
+        self.main_window.status_bar.showMessage(self.main_window.waiting_status)
+
+    def show_parameters(self):
+        """Non-modal panel for the gating settings, every change is previewed with refilter"""
+        if not self.signal_lines:
+            ErrorMessage(self.main_window, 'Please extract diastolic and systolic frames first')
+            return
+        if self.parameters_dialog is None:
+            self.parameters_dialog = GatingParametersDialog(self.main_window)
+        self.parameters_dialog.load()
+        self.parameters_dialog.show()
+        self.parameters_dialog.raise_()
+
+    def refilter(self):
+        """
+        Repeats only the cheap stages of gating (normalisation, bandpass filter, weighting and extrema) on the
+        cached raw signals with the current config.gating and updates the plotted signals in place.
+        Raises ValueError for settings the filter cannot be designed with.
+        """
+        if self.measured_signals is None:  # the plotted signals were reused from the cache
+            self.measured_signals = measure_signals(
+                self.main_window, self.frames, self.report_data, frame_range=self.frame_range
+            )
+        image_signals, contour_signals = normalize_signals(self.main_window, *self.measured_signals)
+        signals = filter_signals(self.main_window, image_signals, contour_signals)
+        self.update_signals(*signals)
+
+        return signals
+
+    def rerun_automatic_gating(self):
+        """Automatic gating on the previewed signals, replaces the gated frames and the cached gating signals"""
         image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered = (
-            prepare_data(self.main_window, self.frames, self.report_data)
+            self.refilter()
         )
-        self.plot_data(
-            image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered
+        cache_key = gating_cache_key(self.main_window, self.frames, self.report_data, self.frame_range, DEFAULT_CROP)
+        store_gating_signal(
+            self.main_window,
+            cache_key,
+            image_based_gating,
+            contour_based_gating,
+            image_based_gating_filtered,
+            contour_based_gating_filtered,
+        )
+        AutomaticGating(self.main_window, self.report_data).automatic_gating(
+            image_based_gating_filtered, contour_based_gating_filtered
+        )
+        self.remove_lines()
+        self.draw_existing_lines(self.main_window.gated_frames_dia, self.main_window.diastole_color_plt)
+        self.draw_existing_lines(self.main_window.gated_frames_sys, self.main_window.systole_color_plt)
+
+    def auto_tune_parameters(self):
+        """
+        Grid search of the gating filter and extrema parameters for a frame range in a background thread with a
+        cancellable progress dialog, the best are applied once it has finished (apply_auto_tune).
+        """
+        if self.auto_tune_task is not None:  # already running
+            return
+        self.main_window.status_bar.showMessage('Auto-tuning gating parameters...')
+        dialog_success = self.define_roi()
+        if not dialog_success:
+            self.main_window.status_bar.showMessage(self.main_window.waiting_status)
+            return
+        compute = partial(auto_tune, self.main_window, self.frames, self.report_data, frame_range=self.frame_range)
+        frame_rate = self.main_window.metadata['frame_rate']
+        self.auto_tune_task = BackgroundTask(
+            self.main_window,
+            compute,
+            self.apply_auto_tune,
+            maximum=len(tune_settings(dict(self.main_window.config.gating), None, frame_rate)),
+            label='Auto-tuning gating parameters...',
+            error='Auto-tuning failed',
+        )
+        self.auto_tune_task.worker.failed.connect(self.auto_tune_failed)
+        self.auto_tune_task.start()
+
+    def auto_tune_failed(self):
+        self.auto_tune_task = None
+
+    def apply_auto_tune(self, result):
+        self.auto_tune_task = None
+        if result is None:  # cancelled
+            return
+        best, ranking = result
+        if best is None:
+            ErrorMessage(self.main_window, 'No parameter combination found regular heart beats, please tune manually')
+            self.main_window.status_bar.showMessage(self.main_window.waiting_status)
+            return
+        logger.info(f'Gating parameters ranked by beat regularity:\n{ranking.head(10).to_string()}')
+        for name in FILTER_PARAMETERS + EXTREMA_PARAMETERS:
+            self.main_window.config.gating[name] = best[name]
+        if 'auto_heart_rate' in best:
+            self.main_window.config.gating.auto_heart_rate = best['auto_heart_rate']
+        self.main_window.status_bar.showMessage(
+            'Gating parameters set to '
+            + ', '.join(f'{name}={best[name]}' for name in FILTER_PARAMETERS + EXTREMA_PARAMETERS)
         )
-        self.main_window.status_bar.showMessage(self.main_window.waiting_status)
+
+        *signals, self.measured_signals = prepare_data(
+            self.main_window, self.frames, self.report_data, frame_range=self.frame_range, return_measured=True
+        )
+        self.plot_data(*signals)
 
     def define_roi(self):
         dialog = FrameRangeDialog(self.main_window)
@@ -68,12 +181,14 @@ class ContourBasedGating:
                 missing_frames = [
                     frame
                     for frame in range(lower_limit + 1, upper_limit + 1)
-                    if frame not in self.report_data['frame'].values
+                    if frame not in self.report_data.index
                 ]
                 str_missing = connect_consecutive_frames(missing_frames)
                 ErrorMessage(self.main_window, f'Please add contours to frames {str_missing}')
                 return False
             self.frames = self.main_window.images[lower_limit:upper_limit]
+            self.frame_range = (lower_limit, upper_limit)
+            self.measured_signals = None
             self.x = self.report_data['frame'].values  # want 1-based indexing for GUI
             return True
         return False
@@ -81,40 +196,58 @@ class ContourBasedGating:
     def plot_data(
         self, image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered
     ):
-        # Scale `_nor` signals to the same range
-        min_signal_range = min(np.min(image_based_gating), np.min(contour_based_gating))
-        max_signal_range = max(np.max(image_based_gating), np.max(contour_based_gating))
-
-        # Shift `unfiltered` signals down so their max aligns with the min of the main signals
-        shift_amount = min_signal_range - np.max(image_based_gating)
-        image_based_gating += shift_amount
-
-        shift_amount = min_signal_range - np.max(contour_based_gating)
-        contour_based_gating += shift_amount
+        image_based_gating, contour_based_gating = self.shift_unfiltered(image_based_gating, contour_based_gating)
 
         # Plotting
         self.fig = self.main_window.gating_display.fig
         self.fig.clear()
         self.ax = self.fig.add_subplot()
-
-        self.ax.plot(self.x, image_based_gating_filtered, color='green', label='Image based gating')
-        self.ax.plot(self.x, contour_based_gating_filtered, color='yellow', label='Contour based gating')
-        self.ax.plot(
-            self.x, image_based_gating, color='green', linestyle='dashed', label='Image based gating (unfiltered)'
-        )
-        self.ax.plot(
-            self.x, contour_based_gating, color='yellow', linestyle='dashed', label='Contour based gating (unfiltered)'
-        )
+        self.vertical_lines = []
+        self.line_positions = np.array([])
+        self.selected_line = None
+        self.frame_marker = None
+        self.background = None
+
+        self.signal_lines = [
+            self.ax.plot(self.x, image_based_gating_filtered, color='green', label='Image based gating')[0],
+            self.ax.plot(self.x, contour_based_gating_filtered, color='yellow', label='Contour based gating')[0],
+            self.ax.plot(
+                self.x, image_based_gating, color='green', linestyle='dashed', label='Image based gating (unfiltered)'
+            )[0],
+            self.ax.plot(
+                self.x,
+                contour_based_gating,
+                color='yellow',
+                linestyle='dashed',
+                label='Contour based gating (unfiltered)',
+            )[0],
+        ]
+        self.preview_markers = [
+            self.ax.plot([], [], 'o', color=color, markersize=4)[0]
+            for color in (self.main_window.diastole_color_plt, self.main_window.systole_color_plt)
+        ]
 
         self.ax.set_xlabel('Frame')
         self.ax.get_yaxis().set_visible(False)
         legend = self.ax.legend(ncol=2, loc='lower right')
         legend.set_draggable(True)
+        self.heart_rate_text = self.ax.text(
+            0.01, 0.97, self.heart_rate_label(), transform=self.ax.transAxes, ha='left', va='top'
+        )
+
+        self.ax.autoscale_view()
+        self.ax.autoscale(False)  # vertical lines and frame marker must not rescale the signals
 
-        # Interactive event connections
-        plt.connect('button_press_event', self.on_click)
-        plt.connect('motion_notify_event', self.on_motion)
-        plt.connect('button_release_event', self.on_release)
+        # Interactive event connections, replacing those of a previous plot
+        canvas = self.fig.canvas
+        for connection in self.event_connections:
+            canvas.mpl_disconnect(connection)
+        self.event_connections = [
+            canvas.mpl_connect('button_press_event', self.on_click),
+            canvas.mpl_connect('motion_notify_event', self.on_motion),
+            canvas.mpl_connect('button_release_event', self.on_release),
+            canvas.mpl_connect('draw_event', self.on_draw),
+        ]
 
         with warnings.catch_warnings(record=True) as caught_warnings:
             warnings.simplefilter("always")
@@ -142,6 +275,57 @@ class ContourBasedGating:
 
         return True
 
+    @staticmethod
+    def shift_unfiltered(image_based_gating, contour_based_gating):
+        """Shifts the unfiltered signals down so their max aligns with the min of both"""
+        min_signal_range = min(np.min(image_based_gating), np.min(contour_based_gating))
+        image_based_gating = image_based_gating + min_signal_range - np.max(image_based_gating)
+        contour_based_gating = contour_based_gating + min_signal_range - np.max(contour_based_gating)
+
+        return image_based_gating, contour_based_gating
+
+    def heart_rate_label(self):
+        windows = self.main_window.metadata.get('heart_rate_windows')
+        if windows:
+            bpm = [window['heart_rate']['bpm'] for window in windows if window['heart_rate'] is not None]
+            text = f'{len(windows)} gating windows'
+            if bpm:
+                text = f'Heart rate {min(bpm):.0f}-{max(bpm):.0f} bpm in ' + text
+            return text
+        heart_rate = self.main_window.metadata.get('heart_rate')
+        if heart_rate is None:
+            return ''
+        text = f"Heart rate {heart_rate['bpm']:.0f} bpm (confidence {heart_rate['confidence']:.0%})"
+        if 'extrema_x_lim' not in heart_rate:
+            text += ', too low to adapt the gating settings'
+        return text
+
+    def update_signals(
+        self, image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered
+    ):
+        """
+        Replaces the data of the plotted signals (see refilter) and marks the frames automatic gating would
+        choose with the default methods, the vertical lines of the gated frames are kept.
+        """
+        image_based_gating, contour_based_gating = self.shift_unfiltered(image_based_gating, contour_based_gating)
+        signals = (image_based_gating_filtered, contour_based_gating_filtered, image_based_gating, contour_based_gating)
+        for line, signal in zip(self.signal_lines, signals):
+            line.set_ydata(signal)
+        self.heart_rate_text.set_text(self.heart_rate_label())
+
+        diastolic, systolic, _, _ = phase_frames(
+            self.main_window, self.report_data, image_based_gating_filtered, contour_based_gating_filtered
+        )
+        for marker, frames in zip(self.preview_markers, (diastolic, systolic)):
+            indices = np.searchsorted(self.x, np.asarray(frames, dtype=int) + 1)  # frames are 0-based
+            marker.set_data(self.x[indices], contour_based_gating_filtered[indices])
+
+        self.ax.relim()
+        self.ax.autoscale(True, axis='y')
+        self.ax.autoscale_view(scalex=False)
+        self.ax.autoscale(False)
+        self.fig.canvas.draw_idle()
+
     def on_click(self, event):
         if self.fig.canvas.cursor().shape() != 0:  # zooming or panning mode
             return
@@ -150,16 +334,11 @@ class ContourBasedGating:
             set_dia = False
             set_sys = False
             set_slider_to = event.xdata
-            if self.selected_line is not None:
-                self.selected_line.set_linestyle(self.default_linestyle)
-                self.selected_line = None
-            if self.vertical_lines:
-                # Check if click is near any existing line
-                distances = [abs(line.get_xdata()[0] - event.xdata) for line in self.vertical_lines]
-                if min(distances) < len(self.frames) / 100:  # sensitivity for line selection
-                    self.selected_line = self.vertical_lines[np.argmin(distances)]
-                    new_line = False
-                    set_slider_to = self.selected_line.get_xdata()[0]
+            # Check if click is near any existing line
+            nearest_line = self.nearest_line(event.xdata, len(self.frames) / 100)  # sensitivity for line selection
+            if nearest_line is not None:
+                new_line = False
+                set_slider_to = nearest_line.get_xdata()[0]
             if new_line:
                 if self.current_phase == 'D':
                     color = self.main_window.diastole_color_plt
@@ -169,11 +348,8 @@ class ContourBasedGating:
                     set_sys = True
                 else:
                     color = self.default_line_color
-                self.selected_line = plt.axvline(x=event.xdata, color=color, linestyle=self.default_linestyle)
-                self.vertical_lines.append(self.selected_line)
-
-            self.selected_line.set_linestyle('dashed')
-            plt.draw()
+                nearest_line = self.add_line(event.xdata, color)
+            self.select_line(nearest_line)
 
             set_slider_to = round(set_slider_to - 1)  # slider is 0-based
             self.main_window.display_slider.set_value(set_slider_to, reset_highlights=False)
@@ -197,49 +373,115 @@ class ContourBasedGating:
                 toggle_systolic_frame(self.main_window, True, drag=True)
 
         self.tmp_phase = None
+        self.sort_lines()  # the selected line may have been dragged
 
     def on_motion(self, event):
         if self.fig.canvas.cursor().shape() != 0:  # zooming or panning mode
             return
         if event.button is MouseButton.LEFT and self.selected_line:
-            self.selected_line.set_xdata(np.array([event.xdata]))
             if event.xdata is not None:
+                self.selected_line.set_xdata([event.xdata, event.xdata])
                 self.main_window.display_slider.set_value(
                     round(event.xdata - 1), reset_highlights=False
-                )  # slider is 0-based
-                plt.draw()
-            else:
+                )  # slider is 0-based, also blits the moved line
+            else:  # dragged out of the plot
                 self.vertical_lines.remove(self.selected_line)
+                self.selected_line.remove()
                 self.selected_line = None
                 self.tmp_phase = None
-                plt.draw()
+                self.sort_lines()
+                self.fig.canvas.draw_idle()
+
+    def on_draw(self, event):
+        """Full redraws (zoom, resize, plt.draw) renew the cached background, then the moving artists are added"""
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        if self.selected_line is not None:
+            self.ax.draw_artist(self.selected_line)
+        if self.frame_marker is not None:
+            self.frame_marker.set_ydata([self.ax.get_ylim()[0]])
+            self.ax.draw_artist(self.frame_marker)
+
+    def blit(self):
+        """Redraws only the selected line and the frame marker on top of the cached background"""
+        canvas = self.fig.canvas
+        if self.background is None:  # nothing drawn yet
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.background)
+        self.draw_animated()
+        canvas.blit(self.fig.bbox)
 
     def set_frame(self, frame):
-        plt.autoscale(False)
-        if self.frame_marker:
-            self.frame_marker[0].remove()
-        self.frame_marker = self.ax.plot(frame + 1, self.ax.get_ylim()[0], 'yo', clip_on=False)
-        plt.draw()
+        if self.frame_marker is None:
+            self.frame_marker = self.ax.plot(
+                frame + 1, self.ax.get_ylim()[0], 'yo', clip_on=False, animated=True, scalex=False, scaley=False
+            )[0]
+        else:
+            self.frame_marker.set_xdata([frame + 1])
+        self.blit()
+
+    def select_line(self, line):
+        """
+        Highlights line, it is taken out of the cached background while selected since it can be dragged.
+        Needs one full redraw per selection, dragging and slider moves are then blitted.
+        """
+        if self.selected_line is not None:
+            self.selected_line.set_linestyle(self.default_linestyle)
+            self.selected_line.set_animated(False)
+        self.selected_line = line
+        if line is not None:
+            line.set_linestyle('dashed')
+            line.set_animated(True)
+        self.fig.canvas.draw()
+
+    def add_line(self, x, color):
+        line = self.ax.axvline(x=x, color=color, linestyle=self.default_linestyle)
+        index = np.searchsorted(self.line_positions, x)
+        self.vertical_lines.insert(index, line)
+        self.line_positions = np.insert(self.line_positions, index, x)
+
+        return line
+
+    def sort_lines(self):
+        """Keeps vertical_lines and line_positions sorted by position for nearest_line"""
+        self.vertical_lines.sort(key=lambda line: line.get_xdata()[0])
+        self.line_positions = np.array([line.get_xdata()[0] for line in self.vertical_lines], dtype=float)
+
+    def nearest_line(self, x, tolerance):
+        """Vertical line closest to x if within tolerance, binary search on the sorted positions"""
+        index = np.searchsorted(self.line_positions, x)
+        candidates = [i for i in (index - 1, index) if 0 <= i < len(self.line_positions)]
+        if not candidates:
+            return None
+        nearest = min(candidates, key=lambda i: abs(self.line_positions[i] - x))
+        if abs(self.line_positions[nearest] - x) < tolerance:
+            return self.vertical_lines[nearest]
+        return None
 
     def draw_existing_lines(self, frames, color):
         frames = [frame for frame in frames if frame in (self.x - 1)]  # remove frames outside of user-defined range
         for frame in frames:
-            self.vertical_lines.append(plt.axvline(x=frame + 1, color=color, linestyle=self.default_linestyle))
+            self.vertical_lines.append(self.ax.axvline(x=frame + 1, color=color, linestyle=self.default_linestyle))
+        self.sort_lines()
+        self.fig.canvas.draw_idle()
 
     def remove_lines(self):
         for line in self.vertical_lines:
             line.remove()
         self.vertical_lines = []
-        plt.draw
+        self.line_positions = np.array([])
+        self.selected_line = None
+        self.fig.canvas.draw_idle()
 
     def update_color(self, color=None):
         color = color or self.default_line_color
         if self.selected_line is not None:
             self.selected_line.set_color(color)
-            plt.draw()
+            self.blit()
 
     def reset_highlights(self):
         if self.selected_line is not None:
-            self.selected_line.set_linestyle(self.default_linestyle)
-            self.selected_line = None
-            plt.draw()
+            self.select_line(None)
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import List, Optional
+
+import numpy as np
+
+from gating.signal_processing import gating_context, identify_extrema, prepare_data
+
+
+class GatingContext(SimpleNamespace):
+    """
+    Stands in for the main window in gating.signal_processing, with the attributes of
+    gating.signal_processing.gating_context. Allows gating without any Qt object.
+    """
+
+    def __init__(self, config, frame_rate):
+        super().__init__(**vars(gating_context(config, frame_rate)))
+
+
+@dataclass
+class GatingResult:
+    """Outcome of automatic gating, no QT dependencies. Frames are 0-based as in main_window.gated_frames_*"""
+
+    diastolic_frames: List[int]
+    systolic_frames: List[int]
+    image_based_gating: np.ndarray
+    contour_based_gating: np.ndarray
+    image_based_gating_filtered: np.ndarray
+    contour_based_gating_filtered: np.ndarray
+    image_indices: np.ndarray = field(default_factory=lambda: np.array([], dtype=int))
+    contour_indices: np.ndarray = field(default_factory=lambda: np.array([], dtype=int))
+    heart_rate: Optional[dict] = None  # see gating.signal_processing.estimate_heart_rate
+    heart_rate_windows: Optional[list] = None  # per window if the pullback was gated in windows (filter_windows)
+
+    @property
+    def phases(self):
+        """Dict frame -> 'D' or 'S'"""
+        return {**{frame: 'D' for frame in self.diastolic_frames}, **{frame: 'S' for frame in self.systolic_frames}}
+
+
+def phase_frames(
+    main_window, report_data, image_signal, contour_signal, image_method='maxima', contour_method='extrema'
+):
+    """
+    Assigns diastolic and systolic frames from the filtered image and contour signals.
+
+    Indices found in both signals ('maxima' or 'extrema' each) are alternately assigned to the two phases.
+    Diastole frames can depict more distal parts of the coronary artery, and AAOCA undergoes more compression
+    during systole, hence the sum of the elliptic ratio is higher for the systolic half.
+
+    Returns (diastolic_frames, systolic_frames, image_indices, contour_indices), frames are 0-based and sorted.
+    """
+    image_extrema, image_maxima = identify_extrema(main_window, image_signal)
+    contour_extrema, contour_maxima = identify_extrema(main_window, contour_signal)
+    image_indices = image_maxima if image_method == 'maxima' else image_extrema
+    contour_indices = contour_maxima if contour_method == 'maxima' else contour_extrema
+
+    # Create a list with indices most likely presenting systole/diastole, take common intersection
+    final_indices = np.intersect1d(image_indices, contour_indices)
+    frames = report_data['frame'].to_numpy()  # 1-based report frames
+    elliptic_ratio = report_data['elliptic_ratio'].to_numpy(dtype=float)
+    first_half, second_half = final_indices[::2], final_indices[1::2]
+
+    # systolic contours always have higher elliptic ratio intramural because of compression
+    if elliptic_ratio[first_half].sum() > elliptic_ratio[second_half].sum():
+        diastolic, systolic = second_half, first_half
+    else:
+        diastolic, systolic = first_half, second_half
+
+    return (
+        sorted((frames[diastolic] - 1).tolist()),  # back to 0-based frames
+        sorted((frames[systolic] - 1).tolist()),
+        image_indices,
+        contour_indices,
+    )
+
+
+def gate_pullback(
+    frames,
+    report_data,
+    config,
+    frame_rate,
+    image_method='maxima',
+    contour_method='extrema',
+    crop=(50, 450, 50, 450),
+    frame_range=None,
+):
+    """
+    Automatic gating of one pullback without GUI, e.g. for batch processing of archived pullbacks.
+
+    Parameters:
+    - frames (numpy.ndarray): Image stack (n_frames, height, width) matching the rows of report_data.
+    - report_data (pandas.DataFrame): Per-frame metrics as returned by report(), needs the columns frame (1-based),
+        shortest_distance, vector_angle, vector_length and elliptic_ratio.
+    - config: Application config (config.yaml), the gating section is used.
+    - frame_rate (float): Frames per second of the pullback.
+    - image_method, contour_method (str): 'maxima' or 'extrema', as in the Select Gating Methods dialog.
+    - crop (tuple): x1, x2, y1, y2 region used for the image-based signals.
+    - frame_range (tuple): Optional (lower_limit, upper_limit) of frames in the pullback, only used for caching.
+
+    Returns:
+    - GatingResult
+    """
+    if len(frames) != len(report_data):
+        raise ValueError(f'Got {len(frames)} frames but {len(report_data)} rows of report data')
+    for method in (image_method, contour_method):
+        if method not in ('maxima', 'extrema'):
+            raise ValueError(f"Gating method must be 'maxima' or 'extrema', got {method!r}")
+
+    context = GatingContext(config, frame_rate)
+    x1, x2, y1, y2 = crop
+    image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered = (
+        prepare_data(context, frames, report_data, x1, x2, y1, y2, frame_range=frame_range)
+    )
+    diastolic, systolic, image_indices, contour_indices = phase_frames(
+        context, report_data, image_based_gating_filtered, contour_based_gating_filtered, image_method, contour_method
+    )
+
+    return GatingResult(
+        diastolic,
+        systolic,
+        image_based_gating,
+        contour_based_gating,
+        image_based_gating_filtered,
+        contour_based_gating_filtered,
+        image_indices,
+        contour_indices,
+        context.metadata.get('heart_rate'),
+        context.metadata.get('heart_rate_windows'),
+    )
@@ -0,0 +1,148 @@
+import numpy as np
+from loguru import logger
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from gating.signal_processing import blurring_scores, downsample_frames, unit_frames
+
+DEFAULT_CROP = (50, 450, 50, 450)  # x1, x2, y1, y2 as in prepare_data
+
+
+class ImageSignalStream:
+    """
+    Incrementally computes the image-based gating signals of a pullback while its frames arrive.
+
+    Frames are collected in a small ring buffer and processed buffer_size at a time: the FFT blurring score of
+    every frame and the correlation of every frame with the next one. Only the last normalised frame is carried
+    over between buffers, so memory does not grow with the pullback length.
+
+    The per-frame values double as the signal store of the pullback: signals computed for a frame range outside
+    the stream are kept with store(), and signals() serves any sub-range whose values are all known.
+    """
+
+    def __init__(self, n_frames, crop=DEFAULT_CROP, buffer_size=16, downsample=1):
+        self.crop = tuple(crop)
+        self.downsample = downsample
+        self.buffer_size = buffer_size
+        self.correlation = np.zeros(n_frames)  # correlation[i]: frame i with frame i + 1
+        self.blurring = np.full(n_frames, np.nan)
+        self.correlation_done = np.zeros(n_frames, dtype=bool)
+        self.blurring_done = np.zeros(n_frames, dtype=bool)
+        self.n_done = 0  # frames streamed so far
+        self.n_received = 0
+        self.buffer = None
+        self.previous = None  # last normalised frame of the previous buffer
+
+    def push(self, frames):
+        """Adds the next frames (in pullback order)."""
+        x1, x2, y1, y2 = self.crop
+        for frame in frames:
+            cropped = downsample_frames(frame[None, x1:x2, y1:y2], self.downsample)[0]
+            if self.buffer is None:
+                self.buffer = np.empty((self.buffer_size, *cropped.shape), dtype=np.float32)
+            self.buffer[self.n_received % self.buffer_size] = cropped
+            self.n_received += 1
+            if self.n_received % self.buffer_size == 0:
+                self._process(self.buffer)
+
+    def finish(self):
+        """Processes the frames left in the buffer, call once all frames were pushed."""
+        remaining = self.n_received - self.n_done
+        if remaining:
+            self._process(self.buffer[:remaining])
+
+    def _process(self, frames):
+        start = self.n_done
+        self.blurring[start : start + len(frames)] = blurring_scores(frames)
+        rows = unit_frames(frames)
+        if self.previous is not None:
+            self.correlation[start - 1] = np.sum(self.previous * rows[0])
+        self.correlation[start : start + len(frames) - 1] = np.sum(rows[:-1] * rows[1:], axis=1)
+        self.correlation_done[max(start - 1, 0) : start + len(frames) - 1] = True
+        self.blurring_done[start : start + len(frames)] = True
+        self.previous = rows[-1]
+        self.n_done += len(frames)
+
+    @property
+    def complete(self):
+        return bool(self.blurring_done.all())
+
+    def store(self, lower_limit, upper_limit, correlation, blurring, crop=DEFAULT_CROP, downsample=1):
+        """Keeps signals computed elsewhere for frames lower_limit:upper_limit (last correlation value unknown)."""
+        if tuple(crop) != self.crop or downsample != self.downsample:
+            return
+        self.correlation[lower_limit : upper_limit - 1] = correlation[:-1]
+        self.correlation_done[lower_limit : upper_limit - 1] = True
+        self.blurring[lower_limit:upper_limit] = blurring
+        self.blurring_done[lower_limit:upper_limit] = True
+
+    def signals(self, lower_limit, upper_limit, crop=DEFAULT_CROP, downsample=1):
+        """
+        Returns (correlation, blurring) for frames lower_limit:upper_limit if they are already computed for the
+        same crop and downsampling, else None. As in calculate_correlation the last correlation value is 0.
+        """
+        if tuple(crop) != self.crop or downsample != self.downsample or lower_limit >= upper_limit:
+            return None
+        if not self.blurring_done[lower_limit:upper_limit].all():
+            return None
+        if not self.correlation_done[lower_limit : upper_limit - 1].all():
+            return None
+        correlation = self.correlation[lower_limit:upper_limit].copy()
+        correlation[-1] = 0
+
+        return correlation, self.blurring[lower_limit:upper_limit].copy()
+
+
+class ImageSignalWorker(QObject):
+    """Feeds the frames of a loaded pullback into an ImageSignalStream in a background thread."""
+
+    finished = pyqtSignal()
+
+    def __init__(self, images, stream):
+        super().__init__()
+        self.images = images
+        self.stream = stream
+        self.cancelled = False
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            for start in range(0, len(self.images), self.stream.buffer_size):
+                if self.cancelled:
+                    return
+                self.stream.push(self.images[start : start + self.stream.buffer_size])
+            self.stream.finish()
+            logger.info(f'Image-based gating signals ready for {self.stream.n_done} frames')
+        except Exception as e:
+            logger.exception(f'Image-based gating signals could not be computed: {e}')
+        finally:
+            self.finished.emit()
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def start_image_signals(main_window):
+    """Starts computing the image-based gating signals of the freshly loaded pullback in the background."""
+    stop_image_signals(main_window)
+    main_window.image_signals = ImageSignalStream(
+        len(main_window.images), downsample=main_window.config.gating.downsample
+    )
+    thread = QThread(main_window)
+    worker = ImageSignalWorker(main_window.images, main_window.image_signals)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.finished.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    main_window.image_signal_thread = (thread, worker)
+    thread.start()
+
+
+def stop_image_signals(main_window):
+    """Cancels the background computation of a previously loaded pullback."""
+    if getattr(main_window, 'image_signal_thread', None) is not None:
+        thread, worker = main_window.image_signal_thread
+        worker.cancel()
+        thread.quit()
+        thread.wait()
+        main_window.image_signal_thread = None
+    main_window.image_signals = None
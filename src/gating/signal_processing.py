@@ -1,11 +1,33 @@
+import functools
+import hashlib
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
 import numpy as np
+import scipy.fft
 from loguru import logger
-from scipy.signal import find_peaks, butter, filtfilt
-import cv2
+from omegaconf import OmegaConf
+from scipy.signal import find_peaks, butter, sosfiltfilt, welch
+
+
+CONTOUR_SIGNAL_NAMES = ('Shortest distance', 'Vector angle', 'Vector length')
+
+
+def image_signal_names(main_window):
+    """Names of the image-based signals of measure_signals for the current config.gating, in their order"""
+    gating = main_window.config.gating
+    names = ['Correlation', 'Blurring']
+    if getattr(gating, 'spectral_signals', False):
+        names += ['Phase shift', 'Spectral similarity']
+    if getattr(gating, 'motion_pca', False):
+        names.append('PCA motion')
+    return names
 
 
 def timing_decorator(func):
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
         result = func(*args, **kwargs)
@@ -17,156 +39,638 @@ def timing_decorator(func):
 
 
 @timing_decorator
-def prepare_data(main_window, frames, report_data, x1=50, x2=450, y1=50, y2=450):
-    """Prepares data for plotting."""
-    try:
-        gating_signal = main_window.data['gating_signal']
-        if not gating_signal:  # skip if empty
-            raise KeyError
-        if gating_signal['gating_config'] == main_window.config.gating and len(
-            gating_signal['image_based_gating']
-        ) == len(frames):
-            return (
-                gating_signal['image_based_gating'],
-                gating_signal['contour_based_gating'],
-                gating_signal['image_based_gating_filtered'],
-                gating_signal['contour_based_gating_filtered'],
-            )
-    except KeyError:
-        pass
-
-    # Initialize variables
-    step = main_window.config.gating.normalize_step
-    maxima_only = main_window.config.gating.maxima_only
-    # Crop frames to a specific region
-    frames = frames[:, x1:x2, y1:y2]
-
-    # Normalize signals
-    correlation = normalize_data(calculate_correlation(frames), step)
-    blurring = normalize_data(calculate_blurring_fft(frames), step)
-    # shortest_dist = normalize_data(report_data['shortest_distance'], step)
-    # vector_angle = normalize_data(report_data['vector_angle'], step)
-    # vector_length = normalize_data(report_data['vector_length'], step)
-    # Shift contour signals to align with current frame
-    shortest_dist = normalize_data(np.roll(report_data['shortest_distance'], 1), step)
-    vector_angle = normalize_data(np.roll(report_data['vector_angle'], 1), step)
-    vector_length = normalize_data(np.roll(report_data['vector_length'], 1), step)
-    
-    # Set first frame to 0 (no previous frame)
-    shortest_dist[0] = 0
-    vector_angle[0] = 0
-    vector_length[0] = 0
-
-    signal_image_based_filtered = [
-        bandpass_filter(main_window, correlation),
-        bandpass_filter(main_window, blurring),
-    ]
-    signal_contour_based_filtered = [
-        bandpass_filter(main_window, shortest_dist),
-        bandpass_filter(main_window, vector_angle),
-        bandpass_filter(main_window, vector_length),
-    ]
-    image_based_gating = combined_signal(main_window, [correlation, blurring], maxima_only=maxima_only)
-    image_based_gating_filtered = combined_signal(main_window, signal_image_based_filtered, maxima_only=maxima_only)
-    contour_based_gating = combined_signal(main_window, [shortest_dist, vector_angle, vector_length], maxima_only=False)
-    contour_based_gating_filtered = combined_signal(main_window, signal_contour_based_filtered, maxima_only=False)
+def prepare_data(
+    main_window, frames, report_data, x1=50, x2=450, y1=50, y2=450, frame_range=None, return_measured=False
+):
+    """
+    Prepares data for plotting.
+
+    frames are main_window.images[lower_limit:upper_limit] for frame_range (lower_limit, upper_limit). The combined
+    signals are reused if frame range, crop, gating config and the content of frames and contours are unchanged.
+    The per-frame image-based signals of the pullback (see gating.image_signals) are computed once per crop and
+    served for any sub-range.
+    With return_measured the output of measure_signals is appended (None if the signals were reused), so the
+    settings can be previewed without measuring again.
+    """
+    crop = (x1, x2, y1, y2)
+    cache_key = gating_cache_key(main_window, frames, report_data, frame_range, crop)
+    gating_signal = main_window.data.get('gating_signal') or {}
+    if gating_signal.get('cache_key') == cache_key:
+        logger.info('Reusing gating signals, frame range, crop, config and frames are unchanged')
+        set_heart_rate(main_window, gating_signal.get('heart_rate'))
+        set_window_heart_rates(main_window, gating_signal.get('heart_rate_windows'))
+        signals = (
+            np.asarray(gating_signal['image_based_gating']),
+            np.asarray(gating_signal['contour_based_gating']),
+            np.asarray(gating_signal['image_based_gating_filtered']),
+            np.asarray(gating_signal['contour_based_gating_filtered']),
+        )
+        return (*signals, None) if return_measured else signals
+
+    measured_signals = measure_signals(main_window, frames, report_data, crop, frame_range)
+    image_signals, contour_signals = normalize_signals(main_window, *measured_signals)
+    image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered = (
+        filter_signals(main_window, image_signals, contour_signals)
+    )
+
+    store_gating_signal(
+        main_window,
+        cache_key,
+        image_based_gating,
+        contour_based_gating,
+        image_based_gating_filtered,
+        contour_based_gating_filtered,
+    )
+    signals = (image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered)
+
+    return (*signals, measured_signals) if return_measured else signals
+
+
+def window_settings(main_window):
+    """(window, overlap) in frames from config.gating, window 0 processes the frame range at once"""
+    gating = main_window.config.gating
+    return getattr(gating, 'window', 0), getattr(gating, 'window_overlap', 0)
+
+
+def gating_windows(n_frames, window, overlap):
+    """
+    (start, stop) of evenly spaced windows of window frames covering n_frames, consecutive windows overlap by at
+    least overlap frames (at most half a window). A single window if window is 0 or covers all frames.
+    """
+    if not window or n_frames <= window:
+        return [(0, n_frames)]
+    overlap = min(overlap, window // 2)
+    n_windows = int(np.ceil((n_frames - overlap) / (window - overlap)))
+    starts = np.round(np.linspace(0, n_frames - window, n_windows)).astype(int)
+
+    return [(int(start), int(start) + window) for start in starts]
+
+
+def gating_context(config, frame_rate, heart_rate=None):
+    """The attributes of main_window read by this module: config, metadata, the gating signal cache and stream"""
+    metadata = {'frame_rate': frame_rate}
+    if heart_rate is not None:
+        metadata['heart_rate'] = heart_rate
+    return SimpleNamespace(config=config, metadata=metadata, data={}, image_signals=None)
+
 
+def window_context(main_window, heart_rate=None):
+    """Stands in for main_window for one window, keeps the heart rate estimate of the window apart"""
+    return gating_context(main_window.config, main_window.metadata['frame_rate'], heart_rate)
+
+
+def stitch_windows(pieces, windows, n_frames):
+    """Joins per-window signals, cross-faded linearly where consecutive windows overlap"""
+    total = np.zeros(n_frames)
+    weights = np.zeros(n_frames)
+    for i, ((start, stop), piece) in enumerate(zip(windows, pieces)):
+        weight = np.ones(stop - start)
+        if i > 0:
+            overlap = windows[i - 1][1] - start
+            weight[:overlap] = np.linspace(0, 1, overlap + 2)[1:-1]
+        if i < len(windows) - 1:
+            overlap = stop - windows[i + 1][0]
+            if overlap > 0:  # windows that only touch are joined as they are, weight[-0:] is the whole window
+                weight[-overlap:] = np.minimum(weight[-overlap:], np.linspace(1, 0, overlap + 2)[1:-1])
+        total[start:stop] += weight * piece
+        weights[start:stop] += weight
+
+    return total / weights
+
+
+def filter_windows(main_window, image_signals, contour_signals, windows, workers=None):
+    """
+    filter_signals for overlapping windows in parallel, each with its own z-score, heart rate estimate and signal
+    weights, so changes of heart rate or catheter behaviour along long pullbacks do not affect the whole range.
+    The combined signals are stitched with stitch_windows, the heart rate estimates are kept for identify_extrema.
+    """
+    n_frames = len(contour_signals[0])
+    errstate = np.geterr()  # thread-local, the windows are filtered as the caller would
+
+    def filter_window(window):
+        start, stop = window
+        context = window_context(main_window)
+        with np.errstate(**errstate):
+            image = [normalize_data(signal[start:stop], 0) for signal in image_signals]
+            contour = [normalize_data(signal[start:stop], 0) for signal in contour_signals]
+            return filter_signals(context, image, contour), context.metadata.get('heart_rate')
+
+    workers = min(len(windows), workers or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(filter_window, windows))
+
+    set_heart_rate(main_window, None)
+    heart_rates = [heart_rate for _, heart_rate in results]
+    set_window_heart_rates(
+        main_window,
+        [{'start': start, 'stop': stop, 'heart_rate': rate} for (start, stop), rate in zip(windows, heart_rates)],
+    )
+    logger.info(f'Gating signals combined in {len(windows)} windows')
+
+    return tuple(stitch_windows([signals[i] for signals, _ in results], windows, n_frames) for i in range(4))
+
+
+def store_gating_signal(
+    main_window,
+    cache_key,
+    image_based_gating,
+    contour_based_gating,
+    image_based_gating_filtered,
+    contour_based_gating_filtered,
+):
+    """Keeps the combined signals in main_window.data (saved with the contours) for reuse by prepare_data"""
     main_window.data['gating_signal'] = {
         'image_based_gating': list(image_based_gating),
         'contour_based_gating': list(contour_based_gating),
         'image_based_gating_filtered': list(image_based_gating_filtered),
         'contour_based_gating_filtered': list(contour_based_gating_filtered),
         'gating_config': dict(main_window.config.gating),
+        'heart_rate': main_window.metadata.get('heart_rate'),
+        'heart_rate_windows': main_window.metadata.get('heart_rate_windows'),
+        'cache_key': cache_key,
     }
 
+
+def raw_signals(main_window, frames, report_data, crop=(50, 450, 50, 450), frame_range=None):
+    """
+    Normalised per-frame signals before filtering: the image-based signals named by image_signal_names and
+    [shortest distance, vector angle, vector length].
+    """
+    image_signals, contour_signals = measure_signals(main_window, frames, report_data, crop, frame_range)
+
+    return normalize_signals(main_window, image_signals, contour_signals)
+
+
+def measure_signals(main_window, frames, report_data, crop=(50, 450, 50, 450), frame_range=None):
+    """
+    The expensive part of gating, per-frame signals before normalisation in the order of raw_signals. Everything
+    after it (normalize_signals, filter_signals) is cheap enough to repeat for every change of the gating settings.
+    """
+    x1, x2, y1, y2 = crop
+    factor = main_window.config.gating.downsample
+    stream = getattr(main_window, 'image_signals', None)
+    precomputed = None
+    if stream is not None and frame_range is not None:
+        precomputed = stream.signals(*frame_range, crop=crop, downsample=factor)
+    spectral = getattr(main_window.config.gating, 'spectral_signals', False)
+    if precomputed is None or spectral:
+        # Crop frames to a specific region, cardiac motion does not need every pixel
+        reduced = downsample_frames(frames[:, x1:x2, y1:y2], factor)
+    if spectral:  # blurring comes with the shared FFT pass
+        blurring, shift, similarity = calculate_spectral_signals(reduced)
+    if precomputed is not None:
+        correlation = precomputed[0]
+        if not spectral:
+            blurring = precomputed[1]
+    else:
+        correlation = calculate_correlation(reduced)
+        if not spectral:
+            blurring = calculate_blurring_fft(reduced)
+        if stream is not None and frame_range is not None:
+            stream.store(*frame_range, correlation, blurring, crop=crop, downsample=factor)
+
+    image_signals = [correlation, blurring]
+    if spectral:
+        image_signals += [shift, similarity]
+    if getattr(main_window.config.gating, 'motion_pca', False):
+        image_signals.append(calculate_motion_pca(frames[:, x1:x2, y1:y2], factor))
+
+    # Shift contour signals to align with current frame
+    columns = ['shortest_distance', 'vector_angle', 'vector_length']
+    contour_signals = [np.roll(report_data[column].to_numpy(dtype=float), 1) for column in columns]
+
+    return image_signals, contour_signals
+
+
+def normalize_signals(main_window, image_signals, contour_signals):
+    """Z-scores the signals of measure_signals with gating.normalize_step"""
+    step = main_window.config.gating.normalize_step
+    image_signals = [normalize_data(signal, step) for signal in image_signals]
+    contour_signals = [normalize_data(signal, step) for signal in contour_signals]
+    for signal in contour_signals:
+        signal[0] = 0  # first frame has no previous frame
+
+    return image_signals, contour_signals
+
+
+def filter_signals(main_window, image_signals, contour_signals):
+    """
+    Heart rate estimate (if gating.auto_heart_rate is set, kept in main_window.metadata) and combine_signals for
+    the normalised raw signals. Signals longer than gating.window frames are processed in windows (filter_windows).
+    """
+    windows = gating_windows(len(contour_signals[0]), *window_settings(main_window))
+    set_window_heart_rates(main_window, None)
+    if len(windows) > 1:
+        return filter_windows(main_window, image_signals, contour_signals, windows)
+
+    heart_rate = None
+    if getattr(main_window.config.gating, 'auto_heart_rate', False):
+        signals = np.vstack([*image_signals, *contour_signals])
+        heart_rate = estimate_heart_rate(signals, main_window.metadata['frame_rate'])
+    set_heart_rate(main_window, heart_rate)
+
+    return combine_signals(main_window, image_signals, contour_signals)
+
+
+def combine_signals(main_window, image_signals, contour_signals):
+    """
+    Bandpass filters the raw signals and combines them into the image and contour based gating signals.
+
+    Returns (image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered).
+    """
+    maxima_only = main_window.config.gating.maxima_only
+    image_names = image_signal_names(main_window)
+    filtered = bandpass_filter(main_window, np.vstack([*image_signals, *contour_signals]))  # one batched call
+    signal_image_based_filtered = list(filtered[: len(image_signals)])
+    signal_contour_based_filtered = list(filtered[len(image_signals) :])
+    contour_names = CONTOUR_SIGNAL_NAMES
+    image_based_gating = combined_signal(main_window, image_signals, maxima_only, image_names)
+    image_based_gating_filtered = combined_signal(main_window, signal_image_based_filtered, maxima_only, image_names)
+    contour_based_gating = combined_signal(main_window, contour_signals, False, contour_names)
+    contour_based_gating_filtered = combined_signal(main_window, signal_contour_based_filtered, False, contour_names)
+
     return image_based_gating, contour_based_gating, image_based_gating_filtered, contour_based_gating_filtered
 
 
+def fingerprint(*arrays):
+    """Short hash of the shape, dtype and content of arrays"""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.shape}{array.dtype.str}'.encode())
+        digest.update(array.tobytes())
+
+    return digest.hexdigest()
+
+
+def gating_cache_key(main_window, frames, report_data, frame_range, crop, stride=7):
+    """
+    Everything the combined gating signals depend on, JSON serialisable since it is saved with the contours.
+    The frames are fingerprinted on a sparse pixel grid (every stride-th row and column) to stay cheap.
+    """
+    contour_columns = report_data[['shortest_distance', 'vector_angle', 'vector_length']].to_numpy(dtype=float)
+    return {
+        'frame_range': [int(limit) for limit in frame_range] if frame_range is not None else None,
+        'crop': [int(limit) for limit in crop],
+        'gating_config': OmegaConf.to_container(main_window.config.gating)
+        if OmegaConf.is_config(main_window.config.gating)
+        else dict(main_window.config.gating),
+        'frame_rate': main_window.metadata['frame_rate'],
+        'frames_fingerprint': fingerprint(np.asarray(frames)[:, ::stride, ::stride]),
+        'contours_fingerprint': fingerprint(contour_columns),
+    }
+
+
+def downsample_frames(frames, factor, chunk_size=64):
+    """
+    Area-averaged downsampling of a frame stack by an integer factor (float32). Rows and columns at the edge
+    that do not fill a whole block are dropped.
+    """
+    if factor <= 1:
+        return frames
+    n_frames, height, width = frames.shape
+    height, width = height // factor, width // factor
+    reduced = np.zeros((n_frames, height, width), dtype=np.float32)
+    for start in range(0, n_frames, chunk_size):
+        chunk = frames[start : start + chunk_size, : height * factor, : width * factor]
+        # strided sums avoid a float copy of the full resolution chunk
+        for row in range(factor):
+            for column in range(factor):
+                reduced[start : start + chunk_size] += chunk[:, row::factor, column::factor]
+    reduced /= factor**2
+
+    return reduced
+
+
 def normalize_data(data, step):
-    # z-score normalization either for full set, or defined steps
-    if step == 0:
-        return (data - np.mean(data)) / np.std(data)
-    else:
-        normalized_data = np.zeros_like(data)
+    """
+    Z-score normalization either for the full signal (step 0) or for consecutive segments of step samples.
+    The shorter tail segment is normalized on its own, constant segments (zero variance) become 0 instead of NaN.
+    Missing values are interpolated first (interpolate_missing), so they do not blank their segment.
+    """
+    data = interpolate_missing(np.asarray(data, dtype=float))
+    if step == 0 or step >= len(data):
+        return z_score(data[None, :])[0]
+
+    n_full = len(data) // step * step
+    normalized_data = np.empty_like(data)
+    normalized_data[:n_full] = z_score(data[:n_full].reshape(-1, step)).ravel()
+    if n_full < len(data):
+        normalized_data[n_full:] = z_score(data[None, n_full:])[0]
+
+    return normalized_data
+
+
+def interpolate_missing(data):
+    """Linear interpolation of NaN and infinite values from the nearest finite ones, 0 if there are none"""
+    missing = ~np.isfinite(data)
+    if not missing.any():
+        return data
+    frames = np.flatnonzero(missing)
+    logger.warning(f'Interpolated {len(frames)} missing signal value(s) at frame(s) {frames.tolist()}')
+    if missing.all():
+        return np.zeros_like(data)
+    data = data.copy()
+    data[missing] = np.interp(frames, np.flatnonzero(~missing), data[~missing])
 
-        for i in range(0, len(data), step):
-            segment = data[i : i + step]
+    return data
 
-            segment_normalized = (segment - np.mean(segment)) / np.std(segment)
 
-            normalized_data[i : i + step] = segment_normalized
+def z_score(segments):
+    """Row-wise z-score of a 2D array, 0 for rows without variance"""
+    if segments.size == 0:
+        return segments.copy()
+    deviation = segments - segments.mean(axis=1, keepdims=True)
+    std = segments.std(axis=1, keepdims=True)
 
-        return normalized_data
+    return np.divide(deviation, std, out=np.zeros_like(deviation), where=std > 0)
 
 
 @timing_decorator
-def calculate_correlation(frames):
-    """Calculates correlation coefficients between consecutive frames."""
-    correlations = []
-    for i in range(len(frames) - 1):
-        corr = np.corrcoef(frames[i].ravel(), frames[i + 1].ravel())[0, 1]
-        correlations.append(corr)
-    correlations.append(0)  # to match the length of the frames
+def calculate_correlation(frames, chunk_size=16):
+    """
+    Calculates Pearson correlation coefficients between consecutive frames.
+
+    Every frame is centred and scaled to unit norm once (float32, chunk_size frames at a time), so each
+    correlation is the dot product of two consecutive rows. The last value is 0 to match the length of the frames.
+    """
+    correlations = np.zeros(len(frames))
+    previous = None  # last normalised frame of the previous chunk
+    for start in range(0, len(frames), chunk_size):
+        chunk = unit_frames(frames[start : start + chunk_size])
+        if previous is not None:
+            correlations[start - 1] = np.sum(previous * chunk[0])
+        correlations[start : start + len(chunk) - 1] = np.sum(chunk[:-1] * chunk[1:], axis=1)
+        previous = chunk[-1]
 
     return correlations
 
 
 @timing_decorator
-def calculate_blurring_fft(frames):
-    """Calculates blurring using Fast Fourier Transform. Takes the average of the 10% highest frequencies."""
-    blurring_scores = []
-    for frame in frames:
-        fft_data = np.fft.fft2(frame)
-        fft_shifted = np.fft.fftshift(fft_data)
-        magnitude_spectrum = np.abs(fft_shifted)
-
-        # Use np.partition to get the 10% highest frequencies
-        n = len(magnitude_spectrum.ravel())
-        threshold_index = int(0.9 * n)
-        highest_frequencies = np.partition(magnitude_spectrum.ravel(), threshold_index)[threshold_index:]
-        blurring_score = np.mean(highest_frequencies)
-        blurring_scores.append(blurring_score)
-
-    return blurring_scores
-    # blurring_scores = []
-    # for frame in frames:
-    #     # use cv2.Laplacian to calculate the blurring, should return same format as above
-    #     laplacian = cv2.Laplacian(frame, cv2.CV_64F)
-    #     magnitude_spectrum = np.abs(laplacian)
-
-    #     n = len(magnitude_spectrum.ravel())
-    #     threshold_index = int(0.9 * n)
-    #     highest_frequencies = np.partition(laplacian.ravel(), threshold_index)[threshold_index:]
-    #     blurring_score = np.mean(highest_frequencies)
-    #     blurring_scores.append(blurring_score)
-
-    # return blurring_scores
+def calculate_motion_pca(frames, downsample=1, n_components=8, n_iter=2, oversample=8, chunk_size=256, seed=0):
+    """
+    Cardiac motion from the principal components of the frame stack (frames x pixels), by randomized SVD.
+
+    Each pass streams the (downsampled, float32) frames in chunks, so memory stays at chunk_size frames plus
+    pixels x (n_components + oversample) values independent of the pullback length. Returns the negative
+    frame-to-frame displacement in the space of the leading components, which like the correlation peaks while
+    the vessel is at rest. Slow changes along the pullback barely move between consecutive frames.
+    """
+    n_frames = len(frames)
+    if n_frames < 3:
+        return np.zeros(n_frames)
+
+    def chunks():
+        for start in range(0, n_frames, chunk_size):
+            chunk = downsample_frames(frames[start : start + chunk_size], downsample)
+            yield start, np.asarray(chunk, dtype=np.float32).reshape(len(chunk), -1)
+
+    mean = None
+    for _, chunk in chunks():
+        mean = chunk.sum(axis=0) if mean is None else mean + chunk.sum(axis=0)
+    mean /= n_frames
+
+    def times(matrix):  # (X - mean) @ matrix, n_frames x k
+        result = np.empty((n_frames, matrix.shape[1]), dtype=np.float32)
+        for start, chunk in chunks():
+            result[start : start + len(chunk)] = chunk @ matrix - mean @ matrix
+        return result
+
+    def transposed_times(matrix):  # (X - mean).T @ matrix, pixels x k
+        result = -np.outer(mean, matrix.sum(axis=0))
+        for start, chunk in chunks():
+            result += chunk.T @ matrix[start : start + len(chunk)]
+        return result
+
+    rank = min(n_components + oversample, n_frames, mean.size)
+    sketch = times(np.random.default_rng(seed).standard_normal((mean.size, rank)).astype(np.float32))
+    for _ in range(n_iter):  # power iterations separate the leading components from noise
+        basis = np.linalg.qr(transposed_times(np.linalg.qr(sketch)[0]))[0]
+        sketch = times(basis)
+    basis = np.linalg.qr(sketch)[0]
+    components_t = transposed_times(basis)  # B.T, B = basis.T @ (X - mean)
+    _, singular_values, right = np.linalg.svd(components_t, full_matrices=False)
+    scores = basis @ (right.T[:, :n_components] * singular_values[:n_components])
+
+    displacement = np.linalg.norm(np.diff(scores, axis=0), axis=1)
+    motion = -np.append(displacement, displacement[-1])  # last frame has no successor
+
+    return motion
+
+
+def unit_frames(frames):
+    """Flattens frames to float32 rows with zero mean and unit norm (constant frames become NaN, as in np.corrcoef)"""
+    rows = np.array(frames, dtype=np.float32).reshape(len(frames), -1)  # copy, normalised in place
+    rows -= rows.mean(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rows /= np.sqrt(np.sum(rows * rows, axis=1, keepdims=True))
+
+    return rows
+
+
+@timing_decorator
+def calculate_blurring_fft(frames, chunk_size=16, workers=None):
+    """
+    Calculates blurring using Fast Fourier Transform. Takes the average of the 10% highest frequencies.
+
+    Chunks of chunk_size frames are transformed at once (float32 rfft2) and processed by up to workers threads
+    (default: all cores), numpy and scipy.fft release the GIL for the heavy parts.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [frames[start : start + chunk_size] for start in range(0, len(frames), chunk_size)]
+    if workers == 1 or len(chunks) == 1:
+        scores = [blurring_scores(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            scores = list(executor.map(blurring_scores, chunks))
+
+    return np.concatenate(scores) if scores else np.zeros(0)
+
+
+def blurring_scores(frames):
+    """
+    Mean of the 10% highest magnitudes of the 2D spectrum for a stack of frames.
+
+    The spectrum of a real frame is conjugate symmetric, so the full magnitude spectrum is the rfft2 half plus
+    its mirrored inner columns. No fftshift is needed as the order does not matter for the top decile.
+    """
+    spectrum = np.abs(scipy.fft.rfft2(np.asarray(frames, dtype=np.float32)))
+
+    return top_decile_magnitude(spectrum, frames.shape[2])
+
+
+def top_decile_magnitude(spectrum, n_cols):
+    """Blurring score from rfft2 magnitudes (n_frames, n_rows, n_cols // 2 + 1) of frames with n_cols columns"""
+    n_frames = len(spectrum)
+    mirrored = spectrum[:, :, 1 : (n_cols + 1) // 2]  # columns that appear twice in the full spectrum
+    magnitudes = np.concatenate([spectrum.reshape(n_frames, -1), mirrored.reshape(n_frames, -1)], axis=1)
+
+    threshold_index = int(0.9 * magnitudes.shape[1])
+    highest_frequencies = np.partition(magnitudes, threshold_index, axis=1)[:, threshold_index:]
+
+    return highest_frequencies.mean(axis=1, dtype=np.float64)
+
+
+@timing_decorator
+def calculate_spectral_signals(frames, chunk_size=16, workers=None):
+    """
+    Blurring, phase correlation shift and spectral similarity of a frame stack from one shared FFT pass.
+
+    Chunks of chunk_size + 1 frames (the last frame pairs with the first of the next chunk) are processed by up to
+    workers threads with spectral_scores. Shift and similarity describe frame i and i + 1, the shift is negated so
+    that, like correlation and blurring, the signal is highest at rest. Their last value is repeated.
+
+    Returns:
+    - blurring, shift, similarity (numpy.ndarray): One value per frame each, blurring as calculate_blurring_fft.
+    """
+    n_frames = len(frames)
+    if n_frames == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    workers = workers or os.cpu_count() or 1
+    chunks = [frames[start : start + chunk_size + 1] for start in range(0, n_frames, chunk_size)]
+    if workers == 1 or len(chunks) == 1:
+        scores = [spectral_scores(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            scores = list(executor.map(spectral_scores, chunks))
+
+    blurring = np.concatenate([chunk_blurring[:chunk_size] for chunk_blurring, _, _ in scores])
+    shift = -np.concatenate([chunk_shift for _, chunk_shift, _ in scores])
+    similarity = np.concatenate([chunk_similarity for _, _, chunk_similarity in scores])
+    if n_frames == 1:
+        return blurring, np.zeros(1), np.ones(1)
+
+    return blurring, np.append(shift, shift[-1]), np.append(similarity, similarity[-1])
+
+
+def spectral_scores(frames):
+    """
+    Per-frame and frame-to-frame scores from one rfft2 per frame:
+    - blurring: Mean of the 10% highest spectral magnitudes of each frame (blurring_scores).
+    - shift: Translation in pixels between consecutive frames from phase correlation, i.e. the peak of the inverse
+        FFT of the normalised cross-power spectrum, refined to subpixels with a parabola through its neighbours.
+    - similarity: Cosine similarity of the magnitude spectra of consecutive frames (without the mean), which does
+        not change with translation and drops with deformation and blur.
+    """
+    n_frames, n_rows, n_cols = frames.shape
+    spectrum = scipy.fft.rfft2(np.asarray(frames, dtype=np.float32))
+    magnitude = np.abs(spectrum)
+    blurring = top_decile_magnitude(magnitude, n_cols)
+    if n_frames < 2:
+        return blurring, np.zeros(0), np.zeros(0)
+
+    cross_power = spectrum[:-1] * np.conj(spectrum[1:])
+    cross_power /= np.maximum(np.abs(cross_power), 1e-12)
+    surface = scipy.fft.irfft2(cross_power, s=(n_rows, n_cols))
+    pairs = np.arange(n_frames - 1)
+    row, col = np.divmod(surface.reshape(n_frames - 1, -1).argmax(axis=1), n_cols)
+
+    def subpixel(peak, below, above, size):
+        curvature = below - 2 * surface[pairs, row, col] + above
+        with np.errstate(invalid='ignore', divide='ignore'):
+            offset = np.where(curvature < 0, 0.5 * (below - above) / curvature, 0)
+        return (peak + offset + size / 2) % size - size / 2  # shifts beyond half the frame wrap around
+
+    dy = subpixel(row, surface[pairs, row - 1, col], surface[pairs, (row + 1) % n_rows, col], n_rows)
+    dx = subpixel(col, surface[pairs, row, col - 1], surface[pairs, row, (col + 1) % n_cols], n_cols)
+    shift = np.hypot(dy, dx)
+
+    weights = np.ones(magnitude.shape[2])
+    weights[1 : (n_cols + 1) // 2] = 2  # mirrored columns of the full spectrum
+    magnitude[:, 0, 0] = 0  # mean brightness
+    products = np.einsum('nij,nij,j->n', magnitude[:-1], magnitude[1:], weights)
+    norms = np.sqrt(np.einsum('nij,nij,j->n', magnitude, magnitude, weights))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        similarity = products / (norms[:-1] * norms[1:])
+
+    return blurring, shift, np.nan_to_num(similarity)
+
+
+def estimate_heart_rate(signals, frame_rate, min_bpm=40, max_bpm=180, min_confidence=0.2):
+    """
+    Heart rate from the Welch power spectrum of the gating signals (one per row, averaged).
+
+    Both resting phases show up in the signals, so the dominant frequency is searched at twice the heart rate,
+    i.e. 1.33-6 Hz for 40-180 bpm as the default filter band. The confidence is the share of the power within
+    15% of the peak frequency. Returns a dict with bpm and confidence and, if the confidence is at least
+    min_confidence, the derived lowcut, highcut and extrema_x_lim (half a signal period), else None.
+    """
+    signals = np.atleast_2d(np.asarray(signals, dtype=float))
+    n_frames = signals.shape[-1]
+    nyquist = 0.5 * frame_rate
+    if n_frames < 16 or 2 * min_bpm / 60 >= nyquist:
+        return None
+    nperseg = min(n_frames, 256)
+    frequencies, power = welch(signals, fs=frame_rate, nperseg=nperseg, nfft=4 * nperseg, axis=-1)
+    power = power.mean(axis=0)
+    band = (frequencies >= 2 * min_bpm / 60) & (frequencies <= min(2 * max_bpm / 60, 0.95 * nyquist))
+    if not band.any() or power[band].sum() <= 0:
+        return None
+
+    peak = frequencies[band][np.argmax(power[band])]
+    near_peak = band & (np.abs(frequencies - peak) <= 0.15 * peak)
+    confidence = float(power[near_peak].sum() / power[band].sum())
+    heart_rate = {'bpm': float(60 * peak / 2), 'confidence': confidence}
+    if confidence >= min_confidence:
+        heart_rate['lowcut'] = float(peak / 2)
+        heart_rate['highcut'] = float(min(2.4 * peak, 0.9 * nyquist))
+        heart_rate['extrema_x_lim'] = max(1, int(round(0.5 * frame_rate / peak)))
+
+    return heart_rate
+
+
+def set_heart_rate(main_window, heart_rate):
+    """Keeps the heart rate estimate of the current gating, its settings override config.gating (gating_setting)"""
+    if heart_rate is None:
+        main_window.metadata.pop('heart_rate', None)
+        return
+    main_window.metadata['heart_rate'] = heart_rate
+    logger.info(f"Estimated heart rate {heart_rate['bpm']:.0f} bpm (confidence {heart_rate['confidence']:.0%})")
+
+
+def set_window_heart_rates(main_window, heart_rate_windows):
+    """Keeps the heart rate estimates of windowed gating (filter_windows), list of dicts with start, stop, heart_rate"""
+    if heart_rate_windows is None:
+        main_window.metadata.pop('heart_rate_windows', None)
+        return
+    main_window.metadata['heart_rate_windows'] = heart_rate_windows
+
+
+def gating_setting(main_window, name):
+    """config.gating value, or the one derived from the estimated heart rate if gating.auto_heart_rate is set"""
+    heart_rate = getattr(main_window, 'metadata', {}).get('heart_rate')
+    if heart_rate and name in heart_rate and getattr(main_window.config.gating, 'auto_heart_rate', False):
+        return heart_rate[name]
+    return getattr(main_window.config.gating, name)
+
+
+@functools.lru_cache(maxsize=64)
+def bandpass_sos(fs, lowcut, highcut, order):
+    """Butterworth bandpass filter in second-order sections, designed once per (fs, lowcut, highcut, order)"""
+    nyquist = 0.5 * fs
+    return butter(order, [lowcut / nyquist, highcut / nyquist], btype='band', output='sos')
 
 
 def bandpass_filter(main_window, signal):
     """
     Applies a Butterworth bandpass filter to the input signal using instance parameters.
 
+    Second-order sections stay stable for high orders and narrow bands, where the (b, a) form of the filter
+    does not.
+
     Parameters:
-    - signal (array-like): The input signal to filter.
+    - signal (array-like): The input signal to filter, or a 2D array with one signal per row.
 
     Returns:
-    - filtered_signal (numpy.ndarray): The bandpass filtered signal.
+    - filtered_signal (numpy.ndarray): The bandpass filtered signal(s).
     """
-    lowcut = main_window.config.gating.lowcut
-    highcut = main_window.config.gating.highcut
-    order = main_window.config.gating.order
+    lowcut = gating_setting(main_window, 'lowcut')
+    highcut = gating_setting(main_window, 'highcut')
     fs = main_window.metadata['frame_rate']  # for Butterworth filter
+    sos = bandpass_sos(float(fs), float(lowcut), float(highcut), int(main_window.config.gating.order))
 
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-
-    # Design Butterworth bandpass filter
-    b, a = butter(order, [low, high], btype='band')
-
-    # Apply filter using filtfilt for zero phase distortion
-    filtered_signal = filtfilt(b, a, signal)
+    # Apply filter forwards and backwards for zero phase distortion
+    filtered_signal = sosfiltfilt(sos, signal, axis=-1)
 
     return filtered_signal
 
@@ -175,6 +679,7 @@ def combined_signal(
     main_window,
     signal_list,
     maxima_only=False,
+    names=None,
 ):
     """
     Combines multiple signals into one by weighting them based on the variability of their extrema.
@@ -183,6 +688,7 @@ def combined_signal(
     Parameters:
     - signal_list (list): A list of signals to combine.
     - maxima_only (bool): If True, only maxima are considered for variability calculation.
+    - names (list): Names of the signals for logging the weights.
 
     Returns:
     - combined_signal (numpy.ndarray): The combined signal.
@@ -208,7 +714,9 @@ def combined_signal(
 
 
     # print the chosen weights per variable
-    if len(signal_list) == 3:
+    if names is not None:
+        logger.info('Signal weights: ' + ', '.join(f'{name}: {weight:.2f}' for name, weight in zip(names, weights)))
+    elif len(signal_list) == 3:
         logger.info(f"Signal weights: Shortest distance: {weights[0]:.2f}, Vector angle: {weights[1]:.2f}, Vector length: {weights[2]:.2f}")
     elif len(signal_list) == 2:
         logger.info(f"Signal weights: Correlation: {weights[0]:.2f}, Blurring: {weights[1]:.2f}")
@@ -221,8 +729,12 @@ def combined_signal(
 
 
 def identify_extrema(main_window, signal):
+    windows = gating_windows(len(signal), *window_settings(main_window))
+    if len(windows) > 1:
+        return windowed_extrema(main_window, signal, windows)
+
     extrema_y_lim = main_window.config.gating.extrema_y_lim
-    extrema_x_lim = main_window.config.gating.extrema_x_lim
+    extrema_x_lim = gating_setting(main_window, 'extrema_x_lim')
 
     # Remove NaN and infinite values from the signal
     signal = np.nan_to_num(signal, nan=0.0, posinf=0.0, neginf=0.0)
@@ -239,3 +751,24 @@ def identify_extrema(main_window, signal):
     extrema_indices = np.sort(extrema_indices)
 
     return extrema_indices, maxima_indices
+
+
+def windowed_extrema(main_window, signal, windows):
+    """
+    identify_extrema per window with the heart rate estimate of the window. Each window contributes the extrema
+    up to the middle of its overlaps with the neighbouring windows.
+    """
+    heart_rates = {
+        (window['start'], window['stop']): window['heart_rate']
+        for window in getattr(main_window, 'metadata', {}).get('heart_rate_windows') or []
+    }
+    seams = [(start + previous_stop) // 2 for (start, _), (_, previous_stop) in zip(windows[1:], windows[:-1])]
+    bounds = zip([0, *seams], [*seams, len(signal)])
+    extrema_indices, maxima_indices = [], []
+    for (start, stop), (lower, upper) in zip(windows, bounds):
+        context = window_context(main_window, heart_rates.get((start, stop)))
+        extrema, maxima = identify_extrema(context, signal[start:stop])
+        extrema_indices.append(extrema[(extrema + start >= lower) & (extrema + start < upper)] + start)
+        maxima_indices.append(maxima[(maxima + start >= lower) & (maxima + start < upper)] + start)
+
+    return np.concatenate(extrema_indices), np.concatenate(maxima_indices)
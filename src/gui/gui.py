@@ -14,6 +14,7 @@ from gui.right_half.right_half import RightHalf
 from gui.shortcuts import init_shortcuts, init_menu
 from input_output.contours_io import write_contours
 from gating.contour_based_gating import ContourBasedGating
+from gating.image_signals import stop_image_signals
 # from segmentation.predict import Predict
 
 
@@ -40,6 +41,11 @@ class Master(QMainWindow):
         self.data = {}  # container to be saved in JSON file later, includes contours, etc.
         self.metadata = {}  # metadata used outside of read_image (not saved to JSON file)
         self.images = None
+        self.report_task = None  # background report computation, see report.report_worker
+        self.wall_thickness = None  # (angles, frames, thickness map) of the last report
+        self.results_plot = None
+        self.image_signals = None  # image-based gating signals, see gating.image_signals
+        self.image_signal_thread = None
         self.diastole_color = (39, 69, 219)
         self.diastole_color_plt = tuple(x / 255 for x in self.diastole_color)  # for matplotlib
         self.systole_color = (209, 55, 38)
@@ -75,4 +81,8 @@ class Master(QMainWindow):
 
     def auto_save(self):
         if self.image_displayed:
-            write_contours(self)
\ No newline at end of file
+            write_contours(self)
+
+    def closeEvent(self, event):
+        stop_image_signals(self)  # background thread must not outlive the window
+        super().closeEvent(event)
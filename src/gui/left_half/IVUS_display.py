@@ -214,31 +214,35 @@ class IVUSDisplay(QGraphicsView):
         For each contour type, try to build a Spline -> unscaled contour (if data exists)
         """
         for ct in ContourType:
-            key = ct.value
-            contour_data = self.main_window.data.get(key, [[], []])
             for frame in range(num_frames):
-                try:
-                    if contour_data and contour_data[0][frame]:
-                        xs = contour_data[0][frame]
-                        ys = contour_data[1][frame]
-                        geometry = SplineGeometry(
-                            xs,
-                            ys,
-                            self.n_points_contour,
-                            (xs[0], ys[0]),
-                            None,
-                        )
-                        spline = Spline(
-                            geometry,
-                            self.contour_configs[ct].color if ct in self.contour_configs else self.color_contour,
-                            self.contour_thickness,
-                            self.contour_configs[ct].alpha if ct in self.contour_configs else self.alpha_contour,
-                        ).full_contours()
-                        self.full_contours[key][frame] = spline.get_unscaled_contour(scaling_factor=1)
-                    else:
-                        self.full_contours[key][frame] = None
-                except Exception:
-                    self.full_contours[key][frame] = None
+                self.build_full_contour(ct, frame)
+
+    def build_full_contour(self, ct: ContourType, frame: int):
+        """(Re)builds self.full_contours for one contour type and frame from the knot points in main_window.data"""
+        key = ct.value
+        contour_data = self.main_window.data.get(key, [[], []])
+        try:
+            if contour_data and contour_data[0][frame]:
+                xs = contour_data[0][frame]
+                ys = contour_data[1][frame]
+                geometry = SplineGeometry(
+                    xs,
+                    ys,
+                    self.n_points_contour,
+                    (xs[0], ys[0]),
+                    None,
+                )
+                spline = Spline(
+                    geometry,
+                    self.contour_configs[ct].color if ct in self.contour_configs else self.color_contour,
+                    self.contour_thickness,
+                    self.contour_configs[ct].alpha if ct in self.contour_configs else self.alpha_contour,
+                ).full_contours()
+                self.full_contours[key][frame] = spline.get_unscaled_contour(scaling_factor=1)
+            else:
+                self.full_contours[key][frame] = None
+        except Exception:
+            self.full_contours[key][frame] = None
 
     def get_full_contour_list(self, contour_type: ContourType = None):
         """
@@ -381,6 +385,8 @@ class IVUSDisplay(QGraphicsView):
         self.graphics_scene.addItem(m)
         if hasattr(self.main_window, "longitudinal_view"):
             self.main_window.longitudinal_view.update_marker(self.frame)
+        if hasattr(self.main_window, "wall_thickness_display"):
+            self.main_window.wall_thickness_display.update_marker(self.frame)
 
     def _remove_non_image_items(self, image_types):
         for it in list(self.graphics_scene.items()):
@@ -401,8 +407,11 @@ class IVUSDisplay(QGraphicsView):
         poly = Polygon(list(zip(x, y)))
 
         if not poly.is_valid or poly.area == 0:
-            logger.warning("Invalid or zero-area polygon created. Skipping metrics.")
-            return            
+            logger.warning(
+                f"Invalid or zero-area lumen contour in frame {self.frame + 1}. Skipping metrics "
+                "(use Edit > Check Contours to list and repair self-intersecting contours)."
+            )
+            return
 
         lumen_area, lumen_circumf, _, _ = compute_polygon_metrics(self.main_window, poly, self.frame)
         longest_d, far_x, far_y = farthest_points(self.main_window, poly.exterior.coords, self.frame)
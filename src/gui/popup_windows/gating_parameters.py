@@ -0,0 +1,123 @@
+from loguru import logger
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (
+    QCheckBox,
+    QDialog,
+    QDialogButtonBox,
+    QDoubleSpinBox,
+    QFormLayout,
+    QPushButton,
+    QSpinBox,
+)
+
+from gating.signal_processing import gating_setting
+
+# name: (minimum, maximum, step, decimals), decimals None for integer settings
+PARAMETERS = {
+    'normalize_step': (0, 100000, 10, None),
+    'lowcut': (0.05, 15.0, 0.05, 2),
+    'highcut': (0.1, 30.0, 0.1, 2),
+    'order': (1, 10, 1, None),
+    'extrema_y_lim': (0, 100, 5, None),
+    'extrema_x_lim': (1, 100, 1, None),
+    'window': (0, 100000, 100, None),
+    'window_overlap': (0, 10000, 10, None),
+}
+SWITCHES = ('maxima_only', 'auto_heart_rate')
+HEART_RATE_SETTINGS = ('lowcut', 'highcut', 'extrema_x_lim')  # overridden by the estimate with auto_heart_rate
+
+
+class GatingParametersDialog(QDialog):
+    """
+    Panel for config.gating next to the gating plot. Changes are previewed immediately by re-filtering the cached
+    raw signals (ContourBasedGating.refilter), the gated frames only change with Re-run Automatic Gating.
+    """
+
+    def __init__(self, main_window):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.setWindowTitle('Gating Parameters')
+        self.setWindowModality(Qt.WindowModality.NonModal)
+
+        # coalesces the value changes of one event loop iteration (e.g. holding an arrow key) into one preview
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.preview)
+
+        layout = QFormLayout(self)
+        self.inputs = {}
+        for name, (minimum, maximum, step, decimals) in PARAMETERS.items():
+            if decimals is None:
+                spin_box = QSpinBox(self)
+            else:
+                spin_box = QDoubleSpinBox(self)
+                spin_box.setDecimals(decimals)
+            spin_box.setRange(minimum, maximum)
+            spin_box.setSingleStep(step)
+            spin_box.valueChanged.connect(self.schedule_preview)
+            if name in HEART_RATE_SETTINGS:
+                spin_box.valueChanged.connect(self.disable_auto_heart_rate)
+            self.inputs[name] = spin_box
+            layout.addRow(name, spin_box)
+        for name in SWITCHES:
+            check_box = QCheckBox(self)
+            check_box.toggled.connect(self.schedule_preview)
+            self.inputs[name] = check_box
+            layout.addRow(name, check_box)
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Close, self)
+        rerun_button = QPushButton('Re-run Automatic Gating', self)
+        buttonBox.addButton(rerun_button, QDialogButtonBox.ButtonRole.ActionRole)
+        rerun_button.clicked.connect(self.rerun_automatic_gating)
+        buttonBox.rejected.connect(self.reject)
+        layout.addWidget(buttonBox)
+        self.load()
+
+    def load(self, names=None):
+        """
+        Shows the settings in use without triggering a preview: config.gating, e.g. after auto-tuning, or the
+        values derived from the heart rate estimate while auto_heart_rate overrides them (gating_setting).
+        """
+        gating = self.main_window.config.gating
+        for name in names or self.inputs:
+            widget = self.inputs[name]
+            widget.blockSignals(True)
+            if isinstance(widget, QCheckBox):
+                widget.setChecked(bool(getattr(gating, name, False)))
+            else:
+                widget.setValue(gating_setting(self.main_window, name))
+            widget.blockSignals(False)
+
+    def apply(self):
+        """Writes the panel values to config.gating"""
+        gating = self.main_window.config.gating
+        for name, widget in self.inputs.items():
+            gating[name] = widget.isChecked() if isinstance(widget, QCheckBox) else widget.value()
+
+    def disable_auto_heart_rate(self):
+        """Edited filter band or peak distance replaces the values derived from the heart rate, as in auto-tuning"""
+        self.inputs['auto_heart_rate'].setChecked(False)
+
+    def schedule_preview(self):
+        self.timer.start()  # not connected directly, the new value would be taken as the interval
+
+    def preview(self):
+        self.apply()
+        try:
+            self.main_window.contour_based_gating.refilter()
+        except ValueError as e:  # e.g. lowcut above highcut or the Nyquist frequency
+            logger.warning(f'Gating parameters not applicable: {e}')
+            self.main_window.status_bar.showMessage(f'Gating parameters not applicable: {e}')
+            return
+        if self.inputs['auto_heart_rate'].isChecked():  # the estimate may have changed with the signals
+            self.load(HEART_RATE_SETTINGS)
+        self.main_window.status_bar.showMessage(self.main_window.waiting_status)
+
+    def rerun_automatic_gating(self):
+        self.timer.stop()
+        self.apply()
+        try:
+            self.main_window.contour_based_gating.rerun_automatic_gating()
+        except ValueError as e:
+            self.main_window.status_bar.showMessage(f'Gating parameters not applicable: {e}')
@@ -1,131 +1,231 @@
-from loguru import logger
-from PyQt6.QtWidgets import QMainWindow, QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsLineItem
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QImage, QPen
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from loguru import logger
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg, NavigationToolbar2QT
+from matplotlib.figure import Figure
+from PyQt6.QtWidgets import QMainWindow, QVBoxLayout, QWidget
+from scipy.ndimage import gaussian_filter1d
 
 pd.options.mode.chained_assignment = None  # default='warn'
 
-from scipy.ndimage import gaussian_filter1d
-
-from report.report import report
+PHASES = {'D': 'Diastole', 'S': 'Systole'}
+PHASE_COLORS = {'D': 'C0', 'S': 'C1'}
+OSTIAL_COLORS = {'D': '#008b8b', 'S': '#ff6f00'}
+MIN_AREA_COLOR = '#0055ff'
+SERIES_COLUMNS = [
+    'frame',
+    'position',
+    'distance',
+    'lumen_area',
+    'elliptic_ratio',
+    'lumen_volume',
+    'plaque_volume',
+    'eem_area',
+]
+
+
+def decimate(x, y, max_points):
+    """
+    Reduces a series to about max_points by keeping the minimum and maximum of equally sized buckets,
+    so peaks stay visible at screen resolution.
+    """
+    valid = np.isfinite(y)
+    x, y = x[valid], y[valid]
+    if len(x) <= max_points:
+        return x, y
+
+    n_buckets = max(max_points // 2, 1)
+    bucket = np.arange(len(x)) * n_buckets // len(x)
+    order = np.lexsort((y, bucket))  # sorted by bucket, then by value
+    first = np.r_[True, bucket[order][1:] != bucket[order][:-1]]
+    last = np.r_[first[1:], True]
+    keep = np.unique(order[first | last])
+
+    return x[keep], y[keep]
 
 
 class ResultsPlot(QMainWindow):
+    """
+    Interactive lumen area, elliptic ratio and volume plots by phase.
+
+    The smoothed series are cached per phase and only recomputed for phases whose data changed
+    (see update_data), scatter points and lines are decimated to the canvas width.
+    """
+
     def __init__(self, main_window, report_data):
         super().__init__(main_window)
         self.main_window = main_window
-        self.report_data = report_data
         self.pullback_speed = main_window.metadata.get('pullback_speed', 1)
         self.pullback_start_frame = main_window.metadata.get('pullback_start_frame', 0)
         self.frame_rate = main_window.metadata.get('frame_rate', 30)
 
         self.setWindowTitle('Results Plot')
-        self.scene = QGraphicsScene()
-        self.view = QGraphicsView(self.scene)
-        self.setCentralWidget(self.view)
-        self.plot_results()
-
-    def plot_results(self):
-        self.scene.clear()
-        self.scene.setSceneRect(0, 0, 1000, 1200)
-
+        self.fig = Figure(figsize=(10, 15))
+        self.canvas = FigureCanvasQTAgg(self.fig)
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.addWidget(NavigationToolbar2QT(self.canvas, self))
+        layout.addWidget(self.canvas)
+        self.setCentralWidget(widget)
+        self.resize(1000, 1200)
+
+        self.ax1, self.ax2, self.ax3 = self.fig.subplots(3, 1, gridspec_kw={'hspace': 0.4})
+        self.ax1_frames = self.ax1.twiny()
+        self.ax2_frames = self.ax2.twiny()
+        self.series = {}  # phase -> cached data and smoothed series
+        self.artists = {}  # phase -> line and scatter artists
+        self.annotations = []
+        self._setup_axes()
+        self.canvas.mpl_connect('resize_event', lambda event: self._update_artists(list(self.series)))
+
+        self.report_data = None
+        self.update_data(report_data)
+
+    def _setup_axes(self):
+        for ax, ylabel, title in (
+            (self.ax1, 'Lumen Area (mm²)', 'Lumen Area vs Distance by Phase'),
+            (self.ax2, 'Elliptic Ratio', 'Elliptic Ratio vs Distance by Phase'),
+            (self.ax3, 'Cumulative Volume (mm\N{SUPERSCRIPT THREE})', 'Cumulative Volume vs Distance by Phase'),
+        ):
+            ax.set_xlabel('Distance (mm)')
+            ax.set_ylabel(ylabel)
+            ax.set_title(title)
+            ax.invert_xaxis()  # Invert the x-axis to start x=0 on the right side
+        self.ax1_frames.set_xlabel('Frames')
+        self.ax2_frames.set_xlabel('Frames')
+
+    def update_data(self, report_data):
+        """Updates the plots with a new report, only phases whose data changed are smoothed and redrawn."""
+        self.report_data = report_data
         df = self.prep_data()
-        df['phase'] = df['phase'].replace({'D': 'Diastole', 'S': 'Systole'})
-
-        # Create a matplotlib figure with two subplots and increased vertical space
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 10), gridspec_kw={'hspace': 0.4})
-
-        # Plot lumen area by phase
-        min_lumen_area = float('inf')
-        min_lumen_area_value = None
-        min_lumen_area_distance = None
-        min_lumen_area_frame = None
-
-        for phase, group in df.groupby('phase'):
-            # Smooth the lumen_area
-            smoothed_area = gaussian_filter1d(group['lumen_area'], sigma=2)  # Adjust sigma for smoothing
-            ax1.plot(group['distance'], smoothed_area, label=f'Lumen Area - {phase}')
-            ax1.scatter(group['distance'], group['lumen_area'], alpha=0.3)
-
-            # Find the minimum lumen area across all phases
-            phase_min_lumen_area = group['lumen_area'].min()
-            if phase_min_lumen_area < min_lumen_area:
-                min_lumen_area = phase_min_lumen_area
-                min_lumen_area_value = phase_min_lumen_area
-                min_lumen_area_distance = group.loc[group['lumen_area'].idxmin(), 'distance']
-                min_lumen_area_frame = group.loc[group['lumen_area'].idxmin(), 'frame']
-
-            # Define colors based on phase
-            ostial_color = '#008b8b' if phase == 'Diastole' else '#ff6f00'
-            min_area_color = '#0055ff'
-
-            # Highlight the lumen_area at distance 0 for ostial area
-            ostial_lumen_area = group.loc[group['distance'] == 0, 'lumen_area'].values
-            if len(ostial_lumen_area) > 0:
-                ax1.scatter(0, ostial_lumen_area[0], color=ostial_color, zorder=5)
-                ax1.text(
-                    0,
-                    ostial_lumen_area[0],
-                    f'{ostial_lumen_area[0]:.2f} ({group.loc[group["distance"] == 0, "frame"].values[0]})',
-                    color=ostial_color,
-                )
-
-        # Highlight the smallest lumen area with a specific color
-        if min_lumen_area_value is not None and min_lumen_area_distance is not None:
-            ax1.scatter(min_lumen_area_distance, min_lumen_area_value, color=min_area_color, zorder=5)
-            ax1.text(
-                min_lumen_area_distance,
-                min_lumen_area_value,
-                f'{min_lumen_area_value:.2f} ({min_lumen_area_frame})',
-                color=min_area_color,
-            )
 
-        ax1.set_xlabel('Distance (mm)')
-        ax1.set_ylabel('Lumen Area (mm²)')
-        ax1.set_title('Lumen Area vs Distance by Phase')
-        ax1.invert_xaxis()  # Invert the x-axis to start x=0 on the right side
-        ax1.legend()
-
-        # Add a second x-axis for frames
-        ax1_frames = ax1.twiny()
-        ax1_frames.set_xlim(ax1.get_xlim())
-        ax1_frames.set_xticks(df['distance'][::5])  # Keep every 5th frame
-        ax1_frames.set_xticklabels(df['frame'][::5])
-        ax1_frames.set_xlabel('Frames')
-
-        # Plot elliptic ratio by phase
-        for phase, group in df.groupby('phase'):
-            # Smooth the elliptic_ratio
-            smoothed_ratio = gaussian_filter1d(group['elliptic_ratio'], sigma=2)  # Adjust sigma for smoothing
-            ax2.plot(group['distance'], smoothed_ratio, label=f'Elliptic Ratio - {phase}')
-            ax2.scatter(group['distance'], group['elliptic_ratio'], alpha=0.3)
-
-        ax2.set_xlabel('Distance (mm)')
-        ax2.set_ylabel('Elliptic Ratio')
-        ax2.set_title('Elliptic Ratio vs Distance by Phase')
-        ax2.invert_xaxis()  # Invert the x-axis to start x=0 on the right side
-        ax2.legend()
-
-        # Add a second x-axis for frames
-        ax2_frames = ax2.twiny()
-        ax2_frames.set_xlim(ax2.get_xlim())
-        ax2_frames.set_xticks(df['distance'][::5])  # Keep every 5th frame
-        ax2_frames.set_xticklabels(df['frame'][::5])
-        ax2_frames.set_xlabel('Frames')
-
-        # Save the plot to a QImage
-        fig.canvas.draw()
-        width, height = fig.canvas.get_width_height()
-        img = QImage(
-            fig.canvas.buffer_rgba(), 
-            width, 
-            height, 
-            QImage.Format.Format_ARGB32
-        )
-
-        self.scene.addPixmap(QPixmap.fromImage(img))
+        changed = []
+        for phase in PHASES:
+            group = df.loc[df['phase'] == phase, SERIES_COLUMNS]
+            cached = self.series.get(phase)
+            if cached is not None and cached['data'].equals(group):
+                continue
+            changed.append(phase)
+            if group.empty:
+                self.series.pop(phase, None)
+            else:
+                self.series[phase] = self._smooth(group)
+
+        if changed:
+            logger.debug(f'Updating results plot for phases {changed}')
+            self._update_artists(changed)
+            self._update_annotations()
+        self.canvas.draw_idle()
+
+    @staticmethod
+    def _smooth(group):
+        volumes = group.sort_values('position')
+        return {
+            'data': group,
+            'distance': group['distance'].to_numpy(dtype=float),
+            'lumen_area': group['lumen_area'].to_numpy(dtype=float),
+            'elliptic_ratio': group['elliptic_ratio'].to_numpy(dtype=float),
+            'smoothed_area': gaussian_filter1d(group['lumen_area'].to_numpy(dtype=float), sigma=2),
+            'smoothed_ratio': gaussian_filter1d(group['elliptic_ratio'].to_numpy(dtype=float), sigma=2),
+            'volume_distance': volumes['distance'].to_numpy(dtype=float),
+            'lumen_volume': volumes['lumen_volume'].to_numpy(dtype=float),
+            'plaque_volume': volumes['plaque_volume'].to_numpy(dtype=float),
+            'has_eem': bool((group['eem_area'] > 0).any()),
+        }
+
+    def _create_artists(self, phase):
+        color = PHASE_COLORS[phase]
+        name = PHASES[phase]
+        self.artists[phase] = {
+            'area_line': self.ax1.plot([], [], color=color, label=f'Lumen Area - {name}')[0],
+            'area_points': self.ax1.scatter([], [], color=color, alpha=0.3),
+            'ratio_line': self.ax2.plot([], [], color=color, label=f'Elliptic Ratio - {name}')[0],
+            'ratio_points': self.ax2.scatter([], [], color=color, alpha=0.3),
+            'lumen_volume': self.ax3.plot([], [], color=color)[0],
+            'plaque_volume': self.ax3.plot([], [], color=color, linestyle='dashed')[0],
+        }
+
+    def _update_artists(self, phases):
+        max_points = 2 * max(self.canvas.width(), 100)
+        for phase in phases:
+            if phase not in self.artists:
+                self._create_artists(phase)
+            artists = self.artists[phase]
+            series = self.series.get(phase)
+            if series is None:
+                for artist in artists.values():
+                    artist.set_visible(False)
+                continue
+
+            name = PHASES[phase]
+            distance = series['distance']
+            artists['area_line'].set_data(*decimate(distance, series['smoothed_area'], max_points))
+            artists['area_points'].set_offsets(np.column_stack(decimate(distance, series['lumen_area'], max_points)))
+            artists['ratio_line'].set_data(*decimate(distance, series['smoothed_ratio'], max_points))
+            artists['ratio_points'].set_offsets(
+                np.column_stack(decimate(distance, series['elliptic_ratio'], max_points))
+            )
+            artists['lumen_volume'].set_data(series['volume_distance'], series['lumen_volume'])
+            artists['lumen_volume'].set_label(
+                f'Lumen Volume - {name} ({series["lumen_volume"][-1]:.1f} mm\N{SUPERSCRIPT THREE})'
+            )
+            artists['plaque_volume'].set_data(series['volume_distance'], series['plaque_volume'])
+            artists['plaque_volume'].set_label(
+                f'Plaque Volume - {name} ({series["plaque_volume"][-1]:.1f} mm\N{SUPERSCRIPT THREE})'
+                if series['has_eem']
+                else '_nolegend_'
+            )
+            for artist in artists.values():
+                artist.set_visible(True)
+            artists['plaque_volume'].set_visible(series['has_eem'])
+
+        for ax, points in ((self.ax1, 'area_points'), (self.ax2, 'ratio_points'), (self.ax3, None)):
+            ax.relim(visible_only=True)
+            if points is not None:  # relim ignores scatter collections
+                for artists in self.artists.values():
+                    if artists[points].get_visible() and len(artists[points].get_offsets()):
+                        ax.update_datalim(artists[points].get_offsets())
+            ax.autoscale_view()
+            handles = [line for line in ax.get_lines() if line.get_visible() and not line.get_label().startswith('_')]
+            if handles:
+                ax.legend(handles=handles)
+        self._update_frame_axes()
+
+    def _update_frame_axes(self):
+        """Frame numbers on a second x-axis, about ten ticks independent of the pullback length"""
+        if not self.series:
+            return
+        data = max(self.series.values(), key=lambda series: len(series['data']))['data']
+        distance, frames = data['distance'].to_numpy(), data['frame'].to_numpy()
+        step = max(len(distance) // 10, 1)
+        for ax, ax_frames in ((self.ax1, self.ax1_frames), (self.ax2, self.ax2_frames)):
+            ax_frames.set_xlim(ax.get_xlim())
+            ax_frames.set_xticks(distance[::step])
+            ax_frames.set_xticklabels(frames[::step])
+
+    def _update_annotations(self):
+        """Ostial lumen area per phase and the overall minimal lumen area"""
+        for artist in self.annotations:
+            artist.remove()
+        self.annotations = []
+
+        minimum = None
+        for phase, series in self.series.items():
+            data = series['data']
+            ostial = data.loc[data['distance'] == 0]
+            if not ostial.empty:
+                area, frame = ostial['lumen_area'].iloc[0], ostial['frame'].iloc[0]
+                self.annotations.append(self.ax1.scatter(0, area, color=OSTIAL_COLORS[phase], zorder=5))
+                self.annotations.append(self.ax1.text(0, area, f'{area:.2f} ({frame})', color=OSTIAL_COLORS[phase]))
+
+            row = data.loc[data['lumen_area'].idxmin()]
+            if minimum is None or row['lumen_area'] < minimum['lumen_area']:
+                minimum = row
+
+        if minimum is not None:
+            area, distance, frame = minimum['lumen_area'], minimum['distance'], minimum['frame']
+            self.annotations.append(self.ax1.scatter(distance, area, color=MIN_AREA_COLOR, zorder=5))
+            self.annotations.append(self.ax1.text(distance, area, f'{area:.2f} ({frame})', color=MIN_AREA_COLOR))
 
     def prep_data(self):
         df = self.report_data[self.report_data['phase'] != '-'].copy()  # Use copy to avoid warnings
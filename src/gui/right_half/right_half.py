@@ -8,6 +8,7 @@ from PyQt6.QtWidgets import QHBoxLayout, QVBoxLayout, QSplitter, QPushButton, QC
 
 from gui.right_half.gating_display import GatingDisplay
 from gui.right_half.longitudinal_view import LongitudinalView
+from gui.right_half.wall_thickness_display import WallThicknessDisplay
 from gui.popup_windows.small_display import SmallDisplay
 from gui.utils.contours_gui import new_measure, new_reference
 # from segmentation.segment import segment
@@ -52,6 +53,9 @@ class RightHalf:
         splitter.addWidget(main_window.gating_display)
         main_window.longitudinal_view = LongitudinalView(main_window)
         splitter.addWidget(main_window.longitudinal_view)
+        main_window.wall_thickness_display = WallThicknessDisplay(main_window)
+        main_window.wall_thickness_display.hide()  # shown from the View menu once a report with EEM contours exists
+        splitter.addWidget(main_window.wall_thickness_display)
         
         gating_display_size = main_window.gating_display.sizeHint().height()
         splitter.setSizes([gating_display_size, gating_display_size])
@@ -0,0 +1,46 @@
+import numpy as np
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+
+
+class WallThicknessDisplay(FigureCanvasQTAgg):
+    """Heatmap of the wall thickness (angle x frame), aligned with the frames of the longitudinal view."""
+
+    def __init__(self, main_window, parent=None, dpi=100):
+        width = main_window.config.display.image_size / dpi
+        self.fig = Figure(figsize=(width, width / 4), dpi=dpi)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.main_window = main_window
+        self.ax = self.fig.add_subplot()
+        self.image = None
+        self.colorbar = None
+        self.frame_marker = None
+
+    def set_data(self, angles, frames, thickness):
+        """Draws the thickness matrix (n_angles, n_frames) into a map spanning the whole pullback."""
+        num_frames = self.main_window.metadata['num_frames']
+        full_map = np.full((len(angles), num_frames), np.nan, dtype=np.float32)
+        full_map[:, frames] = thickness
+
+        self.fig.clear()
+        self.ax = self.fig.add_subplot()
+        self.image = self.ax.imshow(
+            full_map,
+            aspect='auto',
+            interpolation='nearest',
+            cmap='viridis',
+            extent=(0.5, num_frames + 0.5, angles[-1] + 360 / len(angles), 0),  # evenly spaced rays
+        )
+        self.colorbar = self.fig.colorbar(self.image, ax=self.ax, pad=0.01)
+        self.colorbar.set_label('Wall thickness (mm)')
+        self.ax.set_xlabel('Frame')
+        self.ax.set_ylabel('Angle (°)')
+        self.frame_marker = self.ax.axvline(self.main_window.display.frame + 1, color='white', linewidth=0.8)
+        self.fig.tight_layout()
+        self.draw_idle()
+
+    def update_marker(self, frame):
+        if self.frame_marker is not None and self.isVisible():
+            self.frame_marker.set_xdata([frame + 1, frame + 1])
+            self.draw_idle()
@@ -12,7 +12,7 @@ from PyQt6.QtCore import Qt, QUrl
 from gui.popup_windows.frame_range_dialog import FrameRangeDialog
 from gui.popup_windows.message_boxes import ErrorMessage, SuccessMessage
 from gui.popup_windows.video_player import VideoPlayer
-from gui.utils.contours_gui import new_contour, new_measure
+from gui.utils.contours_gui import new_contour, new_measure, check_contours
 from input_output.metadata import MetadataWindow
 from input_output.read_image import read_image
 from input_output.contours_io import write_contours, save_gated_images
@@ -74,6 +74,7 @@ def init_menu(main_window):
     manual_branch_contour = edit_menu.addAction('Manual Branch Contour', partial(new_contour, main_window, ContourType.BRANCH))
     manual_branch_contour.setShortcut('X')
     edit_menu.addAction('Remove Contours', partial(remove_contours, main_window))
+    edit_menu.addAction('Check Contours', partial(check_contours, main_window))
     edit_menu.addSeparator()
     edit_menu.addAction('Reset Phases', partial(reset_phases, main_window))
     edit_menu.addSeparator()
@@ -92,6 +93,8 @@ def init_menu(main_window):
     reset_windowing_action.setShortcut('R')
     toggle_color_action = view_menu.addAction('Toggle Color', partial(toggle_color, main_window))
     toggle_color_action.setShortcut('C')
+    wall_thickness_action = view_menu.addAction('Wall Thickness Map', partial(toggle_wall_thickness, main_window))
+    wall_thickness_action.setShortcut('T')
     view_menu.addSeparator()
     filter_1 = view_menu.addAction('Apply Median Blur', partial(toggle_filter, main_window, index=0))
     filter_1.setShortcut('3')
@@ -102,6 +105,8 @@ def init_menu(main_window):
 
     run_menu = main_window.menu_bar.addMenu('Run')
     run_menu.addAction('Extract Diastolic and Systolic Frames', main_window.contour_based_gating)
+    run_menu.addAction('Auto-tune Gating Parameters', main_window.contour_based_gating.auto_tune_parameters)
+    run_menu.addAction('Gating Parameters...', main_window.contour_based_gating.show_parameters)
     # run_menu.addAction('Automatic Segmentation', partial(segment, main_window))
 
     metadata_menu = main_window.menu_bar.addMenu('Metadata')
@@ -349,14 +354,28 @@ def toggle_color(main_window):
         main_window.display.display_image(update_image=True)
 
 
+def toggle_wall_thickness(main_window):
+    if main_window.wall_thickness_display.isVisible():
+        main_window.wall_thickness_display.hide()
+    elif main_window.wall_thickness is None:
+        ErrorMessage(main_window, 'Please write a report with EEM contours first.')
+    else:
+        main_window.wall_thickness_display.show()
+        main_window.wall_thickness_display.update_marker(main_window.display.frame)
+
+
 def plot_results(main_window):
     if main_window.image_displayed:
         report_data = report(main_window, suppress_messages=True)
         if report_data is None:
             logger.error('No report data available to plot')
             return
-        results_plot = ResultsPlot(main_window, report_data)
-        results_plot.show()
+        if main_window.results_plot is not None:  # already open, only redraw what changed
+            main_window.results_plot.update_data(report_data)
+            main_window.results_plot.raise_()
+            return
+        main_window.results_plot = ResultsPlot(main_window, report_data)
+        main_window.results_plot.show()
 
 
 def save_video_pullback(main_window):
@@ -1,5 +1,11 @@
+from loguru import logger
+from PyQt6.QtWidgets import QMessageBox
+
 from gui.popup_windows.message_boxes import ErrorMessage
 from gui.left_half.IVUS_display import ContourType
+from gui.utils.helpers import connect_consecutive_frames
+from report.contour_validation import find_self_intersections, repair_contour
+from report.report import full_contour_lists
 
 def new_contour(main_window, contour_type: ContourType):
     if not main_window.image_displayed:
@@ -32,3 +38,78 @@ def new_reference(main_window):
         return
 
     main_window.display.start_reference()
+
+
+def check_contours(main_window, frames=None, quiet=False):
+    """
+    Lists all frames with self-intersecting contours and offers to repair them.
+
+    With quiet, nothing is shown if all contours are valid (used before writing the report).
+    Returns False if the user cancelled, True otherwise.
+    """
+    if not main_window.image_displayed:
+        ErrorMessage(main_window, 'Cannot check contours before reading input file')
+        return False
+
+    if frames is None:
+        frames = range(main_window.metadata['num_frames'])
+    invalid_frames = find_self_intersections(full_contour_lists(main_window), list(frames))
+    if not invalid_frames:
+        if not quiet:
+            QMessageBox.information(main_window, 'Check Contours', 'No self-intersecting contours found')
+        return True
+
+    listing = '\n'.join(
+        f'{name}: {connect_consecutive_frames([frame + 1 for frame in invalid])}'
+        for name, invalid in invalid_frames.items()
+    )
+    logger.bind(file=main_window.file_name).warning(f'Self-intersecting contours in frames\n{listing}')
+    answer = QMessageBox.question(
+        main_window,
+        'Check Contours',
+        f'Self-intersecting contours found in frames\n{listing}\n\nRepair them automatically?',
+        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel,
+    )
+    if answer == QMessageBox.StandardButton.Cancel:
+        return False
+    if answer == QMessageBox.StandardButton.Yes:
+        repair_contours(main_window, invalid_frames)
+
+    return True
+
+
+# per-frame metrics of a contour, report.compute_all only recomputes frames where they are 0
+FRAME_METRICS = {'lumen': ('lumen_area', 'lumen_circumf', 'elliptic_ratio'), 'eem': ('eem_area',)}
+
+
+def repair_contours(main_window, invalid_frames):
+    """
+    Replaces the knot points of the given {contour name: frames} by the repaired outline of their spline and
+    resets the metrics of the repaired frames, so the report and gating use the repaired contour.
+    """
+    main_window.status_bar.showMessage('Repairing contours...')
+    full_contours = full_contour_lists(main_window)
+    not_repaired = []
+    for name, frames in invalid_frames.items():
+        contour_type = ContourType(name)
+        knots_x, knots_y = main_window.data[name]
+        contour_x, contour_y = full_contours[name]
+        for frame in frames:
+            n_knots = len(knots_x[frame])
+            if knots_x[frame][0] == knots_x[frame][-1] and knots_y[frame][0] == knots_y[frame][-1]:
+                n_knots -= 1  # closed splines repeat their first knot
+            repaired = repair_contour(contour_x[frame], contour_y[frame], n_points=max(n_knots, 3))
+            if repaired is None:
+                not_repaired.append(f'{name} {frame + 1}')
+                continue
+            knots_x[frame], knots_y[frame] = repaired
+            main_window.display.build_full_contour(contour_type, frame)
+            for key in FRAME_METRICS.get(name, ()):
+                if key in main_window.data:
+                    main_window.data[key][frame] = 0
+
+    main_window.contours_drawn = True
+    main_window.display.display_image(update_contours=True)
+    main_window.status_bar.showMessage(main_window.waiting_status)
+    if not_repaired:
+        ErrorMessage(main_window, f'Could not repair contours: {", ".join(not_repaired)}')
@@ -10,6 +10,7 @@ from PyQt6.QtWidgets import QFileDialog
 from gui.popup_windows.message_boxes import ErrorMessage
 from input_output.metadata import parse_dicom
 from input_output.contours_io import read_contours
+from gating.image_signals import start_image_signals
 
 
 def read_image(main_window):
@@ -56,6 +57,7 @@ def read_image(main_window):
         main_window.file_name = os.path.splitext(file_name)[0]  # remove file extension
         main_window.metadata['num_frames'] = main_window.images.shape[0]
         main_window.display_slider.setMaximum(main_window.metadata['num_frames'] - 1)
+        start_image_signals(main_window)  # image-based gating signals, computed while the user works
 
         success = read_contours(main_window, main_window.file_name)
         if success:
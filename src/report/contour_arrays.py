@@ -0,0 +1,67 @@
+import warnings
+
+import numpy as np
+
+
+def stack_contours(x_list, y_list, frames):
+    """
+    Stacks the contours of the given frames into two (n_frames, n_points) arrays.
+
+    Shorter contours are padded with their first point, which keeps every polygon closed and only adds
+    zero-length edges. Frames without contour are returned as all-NaN rows.
+
+    Returns:
+    - x, y (numpy.ndarray): stacked coordinates (float64).
+    - valid (numpy.ndarray): boolean mask of frames with a contour.
+    """
+    contours = [(x_list[frame], y_list[frame]) if x_list[frame] is not None else None for frame in frames]
+    valid = np.array([contour is not None and len(contour[0]) >= 3 for contour in contours], dtype=bool)
+    n_points = max((len(contour[0]) for contour, ok in zip(contours, valid) if ok), default=0)
+
+    x = np.full((len(frames), n_points), np.nan)
+    y = np.full((len(frames), n_points), np.nan)
+    for row in np.flatnonzero(valid):
+        contour_x, contour_y = contours[row]
+        n = len(contour_x)
+        x[row, :n] = contour_x
+        y[row, :n] = contour_y
+        x[row, n:] = contour_x[0]
+        y[row, n:] = contour_y[0]
+
+    return x, y, valid
+
+
+def polygon_areas(x, y):
+    """Shoelace area of every row (in squared coordinate units)."""
+    return 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1))
+
+
+def polygon_centroids(x, y):
+    """Area centroid of every row, falls back to the vertex mean for degenerate polygons."""
+    cross = x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y
+    area = 0.5 * np.sum(cross, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroid_x = np.sum((x + np.roll(x, -1, axis=1)) * cross, axis=1) / (6 * area)
+        centroid_y = np.sum((y + np.roll(y, -1, axis=1)) * cross, axis=1) / (6 * area)
+    degenerate = ~np.isfinite(centroid_x) | ~np.isfinite(centroid_y)
+    if degenerate.any():
+        with warnings.catch_warnings():  # rows without contour stay NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            centroid_x[degenerate] = np.nanmean(x[degenerate], axis=1)
+            centroid_y[degenerate] = np.nanmean(y[degenerate], axis=1)
+
+    return centroid_x, centroid_y
+
+
+def angles_from(x, y, center_x, center_y):
+    """
+    Angle in degrees [0, 360) of points relative to a center, same convention as vector_angle in the
+    report (measured from the image y-axis).
+    """
+    return np.degrees(np.arctan2(-(x - center_x), y - center_y)) % 360
+
+
+def ray_directions(angles):
+    """Unit vectors (dx, dy) for angles in degrees, inverse of angles_from."""
+    radians = np.radians(angles)
+    return -np.sin(radians), np.cos(radians)
@@ -0,0 +1,168 @@
+import numpy as np
+from shapely.geometry import MultiPolygon, Polygon
+
+from report.contour_arrays import stack_contours, polygon_centroids, angles_from
+
+
+def star_shaped(x, y):
+    """
+    Flags stacked closed polygons that wind exactly once around their centroid with every edge turning the
+    same way. Those polygons are simple, which clears most contours in O(n_points) before the edge test.
+    """
+    center_x, center_y = polygon_centroids(x, y)
+    angles = angles_from(x, y, center_x[:, None], center_y[:, None])
+    turn = (np.roll(angles, -1, axis=1) - angles + 180) % 360 - 180
+    moving = (np.roll(x, -1, axis=1) != x) | (np.roll(y, -1, axis=1) != y)  # padding edges have zero length
+    with np.errstate(invalid='ignore'):
+        # a turn of 180 degrees (collinear points on both sides of the centroid) is ambiguous
+        forward = np.all(((turn > 0) & (turn < 180)) | ~moving, axis=1)
+        backward = np.all(((turn < 0) & (turn > -180)) | ~moving, axis=1)
+        winding = np.abs(turn.sum(axis=1))
+
+    return (forward | backward) & np.isclose(winding, 360)
+
+
+def self_intersecting(x, y):
+    """
+    Flags stacked closed polygons whose edges cross, touch or overlap each other (invalid in shapely).
+
+    Polygons that are star-shaped around their centroid are accepted right away. For the others, the edges
+    of all frames are bucketed in one pass into a grid with cells of the mean edge length of their frame, and
+    only edges sharing a cell are tested against each other with the orientation test. Zero-length edges
+    (the padding of stack_contours or repeated points) are ignored, neighbouring edges only count if they fold
+    back onto each other. Polygons with fewer than three distinct edges are invalid as well.
+
+    Parameters:
+    - x, y (numpy.ndarray): stacked closed polygons of shape (n_frames, n_points), see stack_contours.
+
+    Returns:
+    - invalid (numpy.ndarray): boolean mask of self-intersecting polygons.
+    """
+    contoured = np.isfinite(x).all(axis=1)  # frames without contour are skipped
+    moving = (np.roll(x, -1, axis=1) != x) | (np.roll(y, -1, axis=1) != y)
+    invalid = contoured & (moving.sum(axis=1) < 3)
+    rows = np.flatnonzero(~star_shaped(x, y) & contoured & ~invalid)
+    if not rows.size:
+        return invalid
+
+    # one entry per edge of non-zero length, ordered by frame; rank is the position along the outline
+    frame, edge = np.nonzero(moving[rows])
+    n_edges = moving[rows].sum(axis=1)
+    rank = np.arange(len(frame)) - (np.cumsum(n_edges) - n_edges)[frame]
+    ax, ay = x[rows[frame], edge], y[rows[frame], edge]
+    bx, by = np.roll(x, -1, axis=1)[rows[frame], edge], np.roll(y, -1, axis=1)[rows[frame], edge]
+
+    # grid of n_cells x n_cells over the bounding box of each frame, a contour passes about one edge per cell
+    x_min, y_min = x[rows].min(axis=1), y[rows].min(axis=1)
+    span = np.maximum(x[rows].max(axis=1) - x_min, y[rows].max(axis=1) - y_min)
+    perimeter = np.bincount(frame, weights=np.hypot(bx - ax, by - ay), minlength=len(rows))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n_cells = np.clip(np.nan_to_num(np.ceil(span * n_edges / perimeter)), 1, np.maximum(n_edges, 1))
+    n_cells = n_cells.astype(np.int64)
+    cell_size = np.where(span > 0, span / n_cells, 1.0)[frame]
+    last_cell = n_cells[frame] - 1
+    x_first = np.clip(((np.minimum(ax, bx) - x_min[frame]) // cell_size).astype(np.int64), 0, last_cell)
+    x_last = np.clip(((np.maximum(ax, bx) - x_min[frame]) // cell_size).astype(np.int64), 0, last_cell)
+    y_first = np.clip(((np.minimum(ay, by) - y_min[frame]) // cell_size).astype(np.int64), 0, last_cell)
+    y_last = np.clip(((np.maximum(ay, by) - y_min[frame]) // cell_size).astype(np.int64), 0, last_cell)
+
+    # one (cell, edge) entry for every cell the bounding box of an edge covers
+    x_cells = x_last - x_first + 1
+    covered = x_cells * (y_last - y_first + 1)
+    entry_edge = np.repeat(np.arange(len(frame)), covered)
+    offset = np.arange(len(entry_edge)) - np.repeat(np.cumsum(covered) - covered, covered)
+    cell_x = x_first[entry_edge] + offset % x_cells[entry_edge]
+    cell_y = y_first[entry_edge] + offset // x_cells[entry_edge]
+    frame_cells = np.cumsum(n_cells**2) - n_cells**2
+    cell = frame_cells[frame[entry_edge]] + cell_y * n_cells[frame[entry_edge]] + cell_x
+    order = np.argsort(cell, kind='stable')
+    cell, entry_edge = cell[order], entry_edge[order]
+
+    # candidate pairs: edges sharing a cell, entries of a cell are contiguous after sorting
+    first, second = [], []
+    for distance in range(1, len(cell)):
+        same = cell[:-distance] == cell[distance:]
+        if not same.any():  # no cell holds more than distance edges
+            break
+        first.append(entry_edge[:-distance][same])
+        second.append(entry_edge[distance:][same])
+    if not first:
+        return invalid
+    i, j = np.concatenate(first), np.concatenate(second)  # edges sharing several cells are tested repeatedly
+
+    def orientation(p, q):
+        """Side of point q relative to edge p (0: collinear)"""
+        return (bx[p] - ax[p]) * (q[1] - ay[p]) - (by[p] - ay[p]) * (q[0] - ax[p])
+
+    def on_edge(p, q):
+        """Collinear point q lies on edge p (within its bounding box)"""
+        return (
+            (np.minimum(ax[p], bx[p]) <= q[0])
+            & (q[0] <= np.maximum(ax[p], bx[p]))
+            & (np.minimum(ay[p], by[p]) <= q[1])
+            & (q[1] <= np.maximum(ay[p], by[p]))
+        )
+
+    start_i, end_i, start_j, end_j = (ax[i], ay[i]), (bx[i], by[i]), (ax[j], ay[j]), (bx[j], by[j])
+    side_c, side_d = orientation(i, start_j), orientation(i, end_j)
+    side_a, side_b = orientation(j, start_i), orientation(j, end_i)
+    rank_distance = np.abs(rank[i] - rank[j])
+    neighbours = (rank_distance == 1) | (rank_distance == n_edges[frame[i]] - 1)
+    crossing = (side_c * side_d < 0) & (side_a * side_b < 0) & ~neighbours
+    invalid[rows[frame[i[crossing]]]] = True
+
+    # contact through collinear endpoints is rare, only those pairs are checked for touching or overlap
+    pair = np.flatnonzero((side_c == 0) | (side_d == 0) | (side_a == 0) | (side_b == 0))
+    i, j, neighbours = i[pair], j[pair], neighbours[pair]
+    side_c, side_d, side_a, side_b = side_c[pair], side_d[pair], side_a[pair], side_b[pair]
+    start_i, end_i, start_j, end_j = (ax[i], ay[i]), (bx[i], by[i]), (ax[j], ay[j]), (bx[j], by[j])
+    touching = (
+        ((side_c == 0) & on_edge(i, start_j))
+        | ((side_d == 0) & on_edge(i, end_j))
+        | ((side_a == 0) & on_edge(j, start_i))
+        | ((side_b == 0) & on_edge(j, end_i))
+    )
+    # neighbours share a vertex, they only overlap if collinear and pointing in opposite directions
+    direction = (bx[i] - ax[i]) * (bx[j] - ax[j]) + (by[i] - ay[i]) * (by[j] - ay[j])
+    folding = (side_c == 0) & (side_d == 0) & (direction < 0)
+    invalid[rows[frame[i[np.where(neighbours, folding, touching)]]]] = True
+    return invalid
+
+
+def find_self_intersections(contours, frames):
+    """
+    Returns {contour name: [frames (0-based) with a self-intersecting contour]} for all contour types
+    at once, contours as returned by report.full_contour_lists.
+    """
+    invalid_frames = {}
+    for name, (x_list, y_list) in contours.items():
+        x, y, valid = stack_contours(x_list, y_list, frames)
+        invalid = self_intersecting(x, y) & valid
+        if invalid.any():
+            invalid_frames[name] = [frames[row] for row in np.flatnonzero(invalid)]
+
+    return invalid_frames
+
+
+def repair_contour(x, y, n_points=None):
+    """
+    Removes self-intersections by keeping the largest valid part of the polygon (shapely buffer(0)),
+    resampled to n_points (default: same number of points) evenly spaced along the outline.
+
+    Returns:
+    - x, y (list): repaired contour starting at the point closest to the original first point,
+      or None if nothing with an area is left.
+    """
+    n_points = n_points or len(x)
+    repaired = Polygon(zip(x, y)).buffer(0)
+    if isinstance(repaired, MultiPolygon):
+        repaired = max(repaired.geoms, key=lambda polygon: polygon.area)
+    if repaired.is_empty or repaired.area == 0:
+        return None
+
+    outline = repaired.exterior
+    start = outline.project(Polygon(zip(x, y)).exterior.interpolate(0))
+    distances = (start + np.linspace(0, outline.length, n_points, endpoint=False)) % outline.length
+    points = [outline.interpolate(distance) for distance in distances]
+
+    return [point.x for point in points], [point.y for point in points]
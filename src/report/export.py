@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+CONTOUR_COLUMNS = ['frame', 'x', 'y', 'position']
+
+
+def build_contour_table(main_window, contours, phases):
+    """
+    Builds one long-format table with the points of all contour types and phases.
+
+    Coordinates are rescaled to mm and y is flipped against the image height in a single
+    array operation over all frames and contour types.
+
+    Parameters:
+    - contours (dict): contour name -> (x_list, y_list), one entry per frame (None if no contour).
+    - phases (dict): phase name -> list of frames (0-based).
+
+    Returns:
+    - table (pandas.DataFrame): columns contour, phase, frame (1-based), x, y, position.
+    """
+    resolution = main_window.metadata['resolution']
+    img_dim_mm = main_window.metadata['dimension'] * resolution
+    pullback_length = np.asarray(main_window.metadata['pullback_length'], dtype=float)
+
+    x_parts, y_parts, frame_parts, offset_parts, labels = [], [], [], [], []
+    for contour_name, (x_list, y_list) in contours.items():
+        if x_list is None:
+            continue
+        for phase, frames in phases.items():
+            if not frames:
+                continue
+            valid_frames = [frame for frame in frames if x_list[frame] is not None]
+            if not valid_frames:
+                continue
+            lengths = [len(x_list[frame]) for frame in valid_frames]
+            x_parts.extend(x_list[frame] for frame in valid_frames)
+            y_parts.extend(y_list[frame] for frame in valid_frames)
+            frame_parts.append(np.repeat(valid_frames, lengths))
+            offset_parts.append(np.full(sum(lengths), pullback_length[frames[0]]))
+            labels.append((contour_name, phase, sum(lengths)))
+
+    if not labels:
+        return pd.DataFrame(columns=['contour', 'phase'] + CONTOUR_COLUMNS)
+
+    x = np.concatenate(x_parts).astype(float)
+    y = np.concatenate(y_parts).astype(float)
+    frames = np.concatenate(frame_parts)
+    offsets = np.concatenate(offset_parts)
+
+    table = pd.DataFrame(
+        {
+            'contour': np.repeat([label[0] for label in labels], [label[2] for label in labels]),
+            'phase': np.repeat([label[1] for label in labels], [label[2] for label in labels]),
+            'frame': frames + 1,
+            'x': x * resolution,
+            'y': np.abs(y * resolution - img_dim_mm),
+            'position': pullback_length[frames] - offsets,
+        }
+    )
+
+    return table
+
+
+def build_reference_table(main_window, frames):
+    """Builds the reference point table (frame, x, y, position) for the given frames in mm."""
+    resolution = main_window.metadata['resolution']
+    img_dim_mm = main_window.metadata['dimension'] * resolution
+    pullback_length = np.asarray(main_window.metadata['pullback_length'], dtype=float)
+
+    valid_frames = np.array([frame for frame in frames if main_window.data['reference'][frame] is not None], dtype=int)
+    if not len(valid_frames):
+        return pd.DataFrame(columns=CONTOUR_COLUMNS)
+    points = np.array([main_window.data['reference'][frame] for frame in valid_frames], dtype=float)
+
+    return pd.DataFrame(
+        {
+            'frame': valid_frames + 1,
+            'x': points[:, 0] * resolution,
+            'y': np.abs(points[:, 1] * resolution - img_dim_mm),
+            'position': pullback_length[valid_frames] - pullback_length[frames[0]],
+        }
+    )
+
+
+def save_contour_tables(main_window, contours, save_as_csv=True, save_as_parquet=False):
+    """
+    Saves diastolic and systolic contours of all contour types.
+
+    CSV files keep the legacy layout and file set: one tab-separated file per contour type and phase, no header,
+    written for every phase with gated frames (empty if none of them has a contour) for lumen and for the other
+    contour types present in any frame, plus the reference points per phase.
+    The parquet file contains all contours and phases in one long-format table.
+    """
+    phases = {'diastolic': main_window.gated_frames_dia, 'systolic': main_window.gated_frames_sys}
+    for phase, frames in phases.items():
+        if not frames:
+            logger.warning(f'No frames available for {phase} contours, skipping export.')
+    phases_with_frames = [phase for phase, frames in phases.items() if frames]
+
+    table = build_contour_table(main_window, contours, phases)
+    if not phases_with_frames:
+        return table
+
+    out_dir = os.path.join(main_window.file_name + '_csv_files')
+    os.makedirs(out_dir, exist_ok=True)
+
+    if save_as_csv:
+        logger.info(f'Saving contours to {out_dir}')
+        groups = dict(list(table.groupby(['contour', 'phase'], sort=False)))
+        for contour_name, (x_list, _) in contours.items():
+            if contour_name != 'lumen' and (x_list is None or all(contour is None for contour in x_list)):
+                continue
+            for phase in phases_with_frames:
+                name = phase if contour_name == 'lumen' else f'{contour_name}_{phase}'
+                group = groups.get((contour_name, phase), table.iloc[:0])
+                group[CONTOUR_COLUMNS].to_csv(
+                    os.path.join(out_dir, f'{name}_contours.csv'), sep='\t', header=False, index=False
+                )
+        for phase in phases_with_frames:
+            build_reference_table(main_window, phases[phase]).to_csv(
+                os.path.join(out_dir, f'{phase}_reference_points.csv'), sep='\t', header=False, index=False
+            )
+
+    if save_as_parquet and not table.empty:
+        out_file = os.path.join(out_dir, 'contours.parquet')
+        try:
+            table.to_parquet(out_file, index=False)
+            logger.info(f'Saved contours to {out_file}')
+        except ImportError as e:  # pyarrow/fastparquet are optional
+            logger.warning(f'Could not save contours as parquet, install pyarrow to enable it. Reason: {e}')
+
+    return table
@@ -0,0 +1,61 @@
+import numpy as np
+
+from report.contour_arrays import stack_contours, polygon_areas, polygon_centroids, angles_from
+
+LESION_COLUMNS = ('calcium_area', 'calcium_arc', 'calcium_thickness', 'branch_area', 'branch_angle')
+
+
+def angular_extent(angles):
+    """
+    Arc in degrees covered by the points of every row, i.e. 360 minus the largest angular gap
+    between neighbouring points (including the gap across 0°).
+    """
+    angles = np.sort(angles, axis=1)
+    gaps = np.diff(angles, axis=1, append=angles[:, :1] + 360)
+    return 360 - gaps.max(axis=1)
+
+
+def lesion_metrics(lumen, calcium, branch, frames, resolution):
+    """
+    Calcium and side branch metrics for all frames at once, relative to the lumen centroid.
+
+    Parameters:
+    - lumen, calcium, branch (tuple): (x_list, y_list) with one contour per frame (None if not drawn).
+    - frames (list): frames (0-based) to include.
+    - resolution (float): pixel size in mm.
+
+    Returns:
+    - metrics (dict): arrays aligned with frames for
+      calcium_area (mm²), calcium_arc (° around the lumen centroid), calcium_thickness (radial extent in mm),
+      branch_area (ostium area in mm²) and branch_angle (° of the branch centroid, NaN without branch).
+      Frames without calcium/branch contour get 0 for areas, arc and thickness.
+    """
+    n = len(frames)
+    metrics = {name: np.zeros(n) for name in LESION_COLUMNS}
+    metrics['branch_angle'] = np.full(n, np.nan)
+
+    lumen_x, lumen_y, lumen_valid = stack_contours(*lumen, frames)
+    center_x, center_y = np.full(n, np.nan), np.full(n, np.nan)
+    if lumen_valid.any():
+        center_x[lumen_valid], center_y[lumen_valid] = polygon_centroids(lumen_x[lumen_valid], lumen_y[lumen_valid])
+
+    calcium_x, calcium_y, calcium_valid = stack_contours(*calcium, frames)
+    calcium_area = polygon_areas(calcium_x[calcium_valid], calcium_y[calcium_valid])
+    metrics['calcium_area'][calcium_valid] = calcium_area * resolution**2
+    rows = np.flatnonzero(calcium_valid & lumen_valid)
+    if len(rows):
+        x, y = calcium_x[rows], calcium_y[rows]
+        cx, cy = center_x[rows, None], center_y[rows, None]
+        radius = np.hypot(x - cx, y - cy)
+        metrics['calcium_arc'][rows] = angular_extent(angles_from(x, y, cx, cy))
+        metrics['calcium_thickness'][rows] = (radius.max(axis=1) - radius.min(axis=1)) * resolution
+
+    branch_x, branch_y, branch_valid = stack_contours(*branch, frames)
+    branch_area = polygon_areas(branch_x[branch_valid], branch_y[branch_valid])
+    metrics['branch_area'][branch_valid] = branch_area * resolution**2
+    rows = np.flatnonzero(branch_valid & lumen_valid)
+    if len(rows):
+        branch_cx, branch_cy = polygon_centroids(branch_x[rows], branch_y[rows])
+        metrics['branch_angle'][rows] = angles_from(branch_cx, branch_cy, center_x[rows], center_y[rows])
+
+    return metrics
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+COMPARISON_METRICS = ('lumen_area', 'elliptic_ratio', 'shortest_distance')
+
+
+def compare_phases(report_data, metrics=COMPARISON_METRICS):
+    """
+    Pairs every systolic frame with the diastolic frame closest in pullback position.
+
+    Parameters:
+    - report_data (pandas.DataFrame): report table with 'frame', 'position', 'phase' and the metric columns.
+    - metrics (iterable): metric columns to compare.
+
+    Returns:
+    - comparison (pandas.DataFrame): one row per systolic frame with the matched diastolic frame,
+      both values of every metric and their difference (systole - diastole). Empty if a phase is missing.
+    """
+    diastole = report_data[report_data['phase'] == 'D'].sort_values('position', kind='stable')
+    systole = report_data[report_data['phase'] == 'S'].sort_values('position', kind='stable')
+    if diastole.empty or systole.empty:
+        return pd.DataFrame()
+
+    position_dia = diastole['position'].to_numpy(dtype=float)
+    position_sys = systole['position'].to_numpy(dtype=float)
+
+    # nearest neighbour: candidate right of the insertion point and the one left of it
+    right = np.clip(np.searchsorted(position_dia, position_sys), 0, len(position_dia) - 1)
+    left = np.clip(right - 1, 0, len(position_dia) - 1)
+    use_left = np.abs(position_sys - position_dia[left]) <= np.abs(position_dia[right] - position_sys)
+    matched = np.where(use_left, left, right)
+
+    comparison = {
+        'systolic_frame': systole['frame'].to_numpy(),
+        'diastolic_frame': diastole['frame'].to_numpy()[matched],
+        'position': position_sys,
+        'position_difference': position_sys - position_dia[matched],
+    }
+    for metric in metrics:
+        values_sys = systole[metric].to_numpy(dtype=float)
+        values_dia = diastole[metric].to_numpy(dtype=float)[matched]
+        comparison[f'{metric}_systole'] = values_sys
+        comparison[f'{metric}_diastole'] = values_dia
+        comparison[f'{metric}_delta'] = values_sys - values_dia
+
+    return pd.DataFrame(comparison)
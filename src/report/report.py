@@ -1,22 +1,35 @@
 import os
 import math
-import csv
+from functools import partial
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from loguru import logger
-from PyQt6.QtWidgets import QProgressDialog
-from PyQt6.QtCore import Qt
 from shapely.geometry import Polygon
 from shapely.errors import TopologicalError
 from itertools import combinations
 
 from gui.popup_windows.message_boxes import ErrorMessage, SuccessMessage
+from report.export import save_contour_tables
+from report.volumes import compute_volumes, add_volume_columns, volume_summary
+from report.phase_comparison import compare_phases
+from report.report_worker import ReportTask
+from report.lesion_metrics import lesion_metrics
+from report.wall_thickness import wall_thickness_map, save_wall_thickness
+from report.report_plots import save_report_plots
 
 
 def report(main_window, lower_limit=None, upper_limit=None, suppress_messages=False):
-    """Writes a report file containing lumen area, etc."""
+    """
+    Writes a report file containing lumen area, etc.
+
+    With suppress_messages the report is computed on the calling thread and returned (used by gating and
+    the results plot). Otherwise it is computed in a background thread with a cancellable progress dialog,
+    and written once the worker has finished, in which case None is returned.
+    Only the full report (all frames, not suppressed) writes the contour tables, wall thickness map, plots,
+    volumes and phase comparison, so gating on a frame range does not overwrite them. The plots are rendered
+    after the report has been written (write_report), not as part of the computation.
+    """
 
     if not main_window.image_displayed:
         if not suppress_messages:
@@ -33,29 +46,110 @@ def report(main_window, lower_limit=None, upper_limit=None, suppress_messages=Fa
             ErrorMessage(main_window, 'Cannot write report before drawing contours')
         return None
 
-    report_data = compute_all(
+    if getattr(main_window, 'report_task', None) is not None:  # report is already being written
+        return None
+
+    if not suppress_messages:
+        from gui.utils.contours_gui import check_contours  # imports the display, which imports this module
+
+        if not check_contours(main_window, contoured_frames, quiet=True):
+            return None
+
+    full_report = not suppress_messages and lower_limit is None and upper_limit is None
+    report_config = main_window.config.report
+    compute = partial(
+        compute_all,
         main_window,
         contoured_frames,
-        suppress_messages,
-        plot=main_window.config.report.plot,
-        save_as_csv=main_window.config.report.save_as_csv,
+        save_as_csv=full_report and report_config.save_as_csv,
+        save_as_parquet=full_report and report_config.save_as_parquet,
+        wall_thickness_rays=report_config.wall_thickness_rays if full_report else 0,
     )
-    if report_data is not None:  # else user cancelled progress bar
-        # Add metadata information as columns to the first row
-        report_data.loc[0, 'pullback_speed'] = main_window.metadata['pullback_speed']
-        report_data.loc[0, 'pullback_start_frame'] = main_window.metadata['pullback_start_frame']
-        report_data.loc[0, 'frame_rate'] = main_window.metadata['frame_rate']
-
-        report_data.to_csv(
-            os.path.splitext(main_window.file_name)[0] + '_report.txt',
+    if suppress_messages:
+        return write_report(main_window, contoured_frames, compute(), suppress_messages=True, full_report=False)
+
+    main_window.report_task = ReportTask(
+        main_window,
+        compute,
+        partial(
+            write_report,
+            main_window,
+            contoured_frames,
+            full_report=full_report,
+            plot_frames=report_config.plot_frames if full_report and report_config.plot else 0,
+            plot_formats=tuple(report_config.plot_formats),
+        ),
+        maximum=len(contoured_frames),
+    )
+    main_window.report_task.start()
+    return None
+
+
+def write_report(
+    main_window,
+    contoured_frames,
+    report_data,
+    suppress_messages=False,
+    full_report=True,
+    plot_frames=0,
+    plot_formats=('png',),
+):
+    """
+    Adds volumes and metadata to the computed report and writes the report file, plus the volume summary and
+    phase comparison for the full report. Then renders plot_frames sample frames (report_plots) in plot_formats.
+    """
+    if report_data is None:  # user cancelled progress bar
+        return None
+
+    segment_volumes = compute_volumes(report_data)
+    add_volume_columns(report_data, segment_volumes)
+
+    # Add metadata information as columns to the first row
+    first_row = report_data.index[0]
+    report_data.loc[first_row, 'pullback_speed'] = main_window.metadata['pullback_speed']
+    report_data.loc[first_row, 'pullback_start_frame'] = main_window.metadata['pullback_start_frame']
+    report_data.loc[first_row, 'frame_rate'] = main_window.metadata['frame_rate']
+
+    report_data.to_csv(
+        os.path.splitext(main_window.file_name)[0] + '_report.txt',
+        sep='\t',
+        float_format='%.2f',
+        index=False,
+        header=True,
+    )
+    if full_report:
+        main_window.segment_volumes = segment_volumes
+        volume_summary(segment_volumes).to_csv(
+            os.path.splitext(main_window.file_name)[0] + '_volumes.txt',
             sep='\t',
             float_format='%.2f',
-            index=False,
-            header=True,
+            index_label='phase',
         )
+        phase_comparison = compare_phases(report_data)
+        if not phase_comparison.empty:
+            phase_comparison.to_csv(
+                os.path.splitext(main_window.file_name)[0] + '_phase_comparison.txt',
+                sep='\t',
+                float_format='%.2f',
+                index=False,
+                header=True,
+            )
 
-        if not suppress_messages:
-            SuccessMessage(main_window, 'Write report')
+    if plot_frames:
+        lumen = full_contour_lists(main_window)['lumen']
+        save_report_plots(main_window.file_name, lumen, main_window.data, contoured_frames, plot_frames, plot_formats)
+
+    if full_report:  # the widgets show the whole pullback, not the frame range of a gating report
+        if getattr(main_window, 'results_plot', None) is not None:
+            main_window.results_plot.update_data(report_data)
+        if hasattr(main_window, 'wall_thickness_display'):
+            if getattr(main_window, 'wall_thickness', None) is not None:
+                main_window.wall_thickness_display.set_data(*main_window.wall_thickness)
+            else:
+                main_window.wall_thickness_display.hide()
+
+    if not suppress_messages:
+        SuccessMessage(main_window, 'Write report')
 
     return report_data
 
@@ -82,20 +176,21 @@ def _safe_polygon_area(x_coords, y_coords, frame, contour_name, main_window):
         raise
 
 
-def compute_all(main_window, contoured_frames, suppress_messages, plot=True, save_as_csv=True):
-    """compute all metrics and plot if desired"""
-    if not suppress_messages:
-        progress = QProgressDialog(main_window)
-        # Change 2: Scoped Window Flags
-        progress.setWindowFlags(Qt.WindowType.Dialog)
-        progress.setModal(True)
-        progress.setMinimum(0)
-        progress.setMaximum(len(contoured_frames))
-        progress.resize(500, 100)
-        progress.setValue(0)
-        progress.setWindowTitle('Writing report...')
-        progress.show()
-
+def compute_all(
+    main_window,
+    contoured_frames,
+    save_as_csv=True,
+    save_as_parquet=False,
+    wall_thickness_rays=0,
+    progress_callback=None,
+    is_cancelled=None,
+):
+    """
+    Computes all metrics and returns the report table.
+
+    Safe to run outside the GUI thread: progress is reported through progress_callback(n_done) and the
+    computation stops (returning None) as soon as is_cancelled() returns True.
+    """
     longest_distance = main_window.data['longest_distance']
     farthest_x = main_window.data['farthest_point'][0]
     farthest_y = main_window.data['farthest_point'][1]
@@ -115,54 +210,21 @@ def compute_all(main_window, contoured_frames, suppress_messages, plot=True, sav
         vector_length = [0] * main_window.metadata['num_frames']
         vector_angle = [0] * main_window.metadata['num_frames']
 
-    # helper to fetch per-type full_contours defensively
-    def _get_full_list_by_name(name):
-        fc = getattr(main_window.display, "full_contours", None)
-        if fc is None:
-            return None
-        if isinstance(fc, dict):
-            return fc.get(name, None)
-        if isinstance(fc, list):
-            return fc
-        return None
-
-    # Lumen full contours (defensive)
-    lumen_full_list = _get_full_list_by_name("lumen")
-    # Fallback: try display.get_full_contour_list for backward compatibility
-    if lumen_full_list is None:
-        try:
-            from gui.left_half.IVUS_display import ContourType
-            lumen_full_list = main_window.display.get_full_contour_list(ContourType.LUMEN)
-        except (ImportError, AttributeError) as e:
-            logger.bind(file=main_window.file_name).warning(
-                f'Could not import ContourType/get_full_contour_list; using display.full_contours fallback. Reason: {e}'
-            )
-            lumen_full_list = getattr(main_window.display, "full_contours", None)
-
-    # !! Build other contour full lists (eem, calcium, branch) for CSV saving / optional metrics, careful if new added !!
-    eem_full_list = _get_full_list_by_name("eem")
-    calc_full_list = _get_full_list_by_name("calcium")
-    branch_full_list = _get_full_list_by_name("branch")
-
-    def build_xy_lists(full_list):
-        if full_list is None:
-            nframes = main_window.metadata.get("num_frames", 0)
-            return [None] * nframes, [None] * nframes
-        x_list = [contour[0] if (contour is not None and len(contour) >= 2) else None for contour in full_list]
-        y_list = [contour[1] if (contour is not None and len(contour) >= 2) else None for contour in full_list]
-        return x_list, y_list
-
-    lumen_x, lumen_y = build_xy_lists(lumen_full_list)
-    eem_x, eem_y = build_xy_lists(eem_full_list)
-    calc_x, calc_y = build_xy_lists(calc_full_list)
-    branch_x, branch_y = build_xy_lists(branch_full_list)
+    contours = full_contour_lists(main_window)
+    lumen_x, lumen_y = contours['lumen']
+    eem_x, eem_y = contours['eem']
 
     # Ensure main_window.data has an 'eem_area' list to write into (defensive)
     n_frames = main_window.metadata.get('num_frames', len(lumen_x) if lumen_x is not None else 0)
     if 'eem_area' not in main_window.data or len(main_window.data['eem_area']) < n_frames:
         main_window.data.setdefault('eem_area', [0] * n_frames)
 
-    for frame in contoured_frames:
+    for index, frame in enumerate(contoured_frames):
+        if progress_callback is not None:
+            progress_callback(index)
+        if is_cancelled is not None and is_cancelled():
+            return None
+
         # skip frames already computed (defensive check)
         if lumen_area[frame] and elliptic_ratio[frame] != 0:
             # compute EEM area if not present
@@ -196,120 +258,121 @@ def compute_all(main_window, contoured_frames, suppress_messages, plot=True, sav
             area = _safe_polygon_area(eem_x[frame], eem_y[frame], frame=frame, contour_name="eem", main_window=main_window)
             main_window.data['eem_area'][frame] = area
 
-        if not suppress_messages:
-            progress.setValue(frame)
-            if progress.wasCanceled():
-                return None
-
-    report_data = pd.DataFrame()
-    report_data['frame'] = [frame + 1 for frame in contoured_frames]
-    report_data['position'] = 0
-    n_frames = main_window.metadata.get('num_frames', len(contoured_frames))
-    start_frame = main_window.metadata['pullback_start_frame']
-    if start_frame <= 0.25 * n_frames:
-        offset = main_window.metadata['pullback_length'][start_frame - 1]
-        report_data['position'] = [main_window.metadata['pullback_length'][frame] for frame in contoured_frames]
-        report_data['position'] = report_data['position'] - offset
-    else:
-        report_data['position'] = [main_window.metadata['pullback_length'][frame] for frame in contoured_frames]
-    report_data['position'] = report_data['position'].apply(lambda x: max(x, 0))
-    report_data['phase'] = [main_window.data['phases'][frame] for frame in contoured_frames]
-    report_data['lumen_area'] = [lumen_area[frame] for frame in contoured_frames]
-    report_data['lumen_circumf'] = [lumen_circumf[frame] for frame in contoured_frames]
-    report_data['longest_distance'] = [longest_distance[frame] for frame in contoured_frames]
-    report_data['shortest_distance'] = [shortest_distance[frame] for frame in contoured_frames]
-    report_data['elliptic_ratio'] = [elliptic_ratio[frame] for frame in contoured_frames]
-    report_data['vector_length'] = [vector_length[frame] for frame in contoured_frames]
-    report_data['vector_angle'] = [vector_angle[frame] for frame in contoured_frames]
-    report_data['measurement_1'] = [main_window.data['measure_lengths'][frame][0] for frame in contoured_frames]
-    report_data['measurement_2'] = [main_window.data['measure_lengths'][frame][1] for frame in contoured_frames]
-
-    report_data['eem_area'] = [main_window.data.get('eem_area', [0] * n_frames)[frame] for frame in contoured_frames]
+    metrics = {
+        'lumen_area': lumen_area,
+        'lumen_circumf': lumen_circumf,
+        'longest_distance': longest_distance,
+        'shortest_distance': shortest_distance,
+        'elliptic_ratio': elliptic_ratio,
+        'vector_length': vector_length,
+        'vector_angle': vector_angle,
+    }
+    report_data = build_report_table(main_window, contoured_frames, metrics)
+    for name, values in lesion_metrics(
+        lumen=contours['lumen'],
+        calcium=contours['calcium'],
+        branch=contours['branch'],
+        frames=contoured_frames,
+        resolution=main_window.metadata['resolution'],
+    ).items():
+        report_data[name] = values
 
     main_window.data['elliptic_ratio'] = elliptic_ratio
     main_window.data['vector_length'] = vector_length
     main_window.data['vector_angle'] = vector_angle
 
-    # Save CSVs for lumen (diastolic/systolic) and for other contours if present
-    if save_as_csv:
-        save_csv_files(main_window, lumen_x, lumen_y, name='diastolic', frames=main_window.gated_frames_dia)
-        save_csv_files(main_window, lumen_x, lumen_y, name='systolic', frames=main_window.gated_frames_sys)
-
-        # save EEM/Calcium/Branch CSVs if contours exist for any frame
-        if eem_x is not None and any(elem is not None for elem in eem_x):
-            save_csv_files(main_window, eem_x, eem_y, name='eem_diastolic', frames=main_window.gated_frames_dia)
-            save_csv_files(main_window, eem_x, eem_y, name='eem_systolic', frames=main_window.gated_frames_sys)
-        if calc_x is not None and any(elem is not None for elem in calc_x):
-            save_csv_files(main_window, calc_x, calc_y, name='calcium_diastolic', frames=main_window.gated_frames_dia)
-            save_csv_files(main_window, calc_x, calc_y, name='calcium_systolic', frames=main_window.gated_frames_sys)
-        if branch_x is not None and any(elem is not None for elem in branch_x):
-            save_csv_files(main_window, branch_x, branch_y, name='branch_diastolic', frames=main_window.gated_frames_dia)
-            save_csv_files(main_window, branch_x, branch_y, name='branch_systolic', frames=main_window.gated_frames_sys)
+    if save_as_csv or save_as_parquet:
+        save_contour_tables(main_window, contours, save_as_csv=save_as_csv, save_as_parquet=save_as_parquet)
+    if wall_thickness_rays:
+        main_window.wall_thickness = None  # no map from a previous report if the EEM contours were removed
+    if wall_thickness_rays and any(contour is not None for contour in eem_x):
+        angles, thickness = wall_thickness_map(
+            contours['lumen'], contours['eem'], contoured_frames, main_window.metadata['resolution'], wall_thickness_rays
+        )
+        main_window.wall_thickness = (angles, contoured_frames, thickness)
+        save_wall_thickness(main_window.file_name, angles, contoured_frames, thickness)
+    if progress_callback is not None:
+        progress_callback(len(contoured_frames))
 
-    if not suppress_messages:
-        progress.close()
-
-    if plot:
-        index_1 = int(len(contoured_frames) * 0.2)
-        index_2 = int(len(contoured_frames) * 0.4)
-        index_3 = int(len(contoured_frames) * 0.6)
-        index_4 = int(len(contoured_frames) * 0.8)
-        indices_to_plot = [index_1, index_2, index_3, index_4]
-        frames_to_plot = [contoured_frames[frame] for frame in indices_to_plot]
-        fig, axes = plt.subplots(2, 2, figsize=(12, 12))
-
-        for index, frame in enumerate(frames_to_plot):
-            ax = axes[index // 2, index % 2]
-            ax.plot(
-                lumen_x[frame],
-                lumen_y[frame],
-                '-g',
-                linewidth=2,
-                label='Contour',
-            )
-            ax.plot(centroid_x[frame], centroid_y[frame], 'ro', markersize=8, label='Centroid')
-            ax.plot(farthest_x[frame][0], farthest_y[frame][0], 'bo', markersize=8, label='Farthest Point 1')
-            ax.plot(farthest_x[frame][1], farthest_y[frame][1], 'bo', markersize=8, label='Farthest Point 2')
-            ax.plot(nearest_x[frame][0], nearest_y[frame][0], 'yo', markersize=8, label='Nearest Point 1')
-            ax.plot(nearest_x[frame][1], nearest_y[frame][1], 'yo', markersize=8, label='Nearest Point 2')
-
-            # Annotate with shortest and longest distances
-            ax.annotate(
-                f'Shortest Distance: {shortest_distance[frame]:.2f} mm',
-                xy=(centroid_x[frame], centroid_y[frame]),
-                xycoords='data',
-                xytext=(10, 30),
-                textcoords='offset points',
-                arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=.2'),
-            )
+    return report_data
 
-            ax.annotate(
-                f'Longest Distance: {longest_distance[frame]:.2f} mm',
-                xy=(centroid_x[frame], centroid_y[frame]),
-                xycoords='data',
-                xytext=(10, -30),
-                textcoords='offset points',
-                arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=-.2'),
-            )
 
-            ax.annotate(
-                f'Lumen Area: {lumen_area[frame]:.2f} mm\N{SUPERSCRIPT TWO}\nElliptic Ratio: {longest_distance[frame]/shortest_distance[frame]:.2f}',
-                xy=(centroid_x[frame], centroid_y[frame]),
-                xycoords='data',
-                xytext=(10, 0),
-                textcoords='offset points',
-                arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=0'),
+def full_contour_lists(main_window):
+    """
+    Returns {contour name: (x_list, y_list)} with one entry per frame (None if the frame has no contour).
+    !! Careful if new contour types are added !!
+    """
+
+    # helper to fetch per-type full_contours defensively
+    def _get_full_list_by_name(name):
+        fc = getattr(main_window.display, "full_contours", None)
+        if fc is None:
+            return None
+        if isinstance(fc, dict):
+            return fc.get(name, None)
+        if isinstance(fc, list):
+            return fc
+        return None
+
+    # Lumen full contours (defensive)
+    lumen_full_list = _get_full_list_by_name("lumen")
+    # Fallback: try display.get_full_contour_list for backward compatibility
+    if lumen_full_list is None:
+        try:
+            from gui.left_half.IVUS_display import ContourType
+
+            lumen_full_list = main_window.display.get_full_contour_list(ContourType.LUMEN)
+        except (ImportError, AttributeError) as e:
+            logger.bind(file=main_window.file_name).warning(
+                f'Could not import ContourType/get_full_contour_list; using display.full_contours fallback. Reason: {e}'
             )
+            lumen_full_list = getattr(main_window.display, "full_contours", None)
 
-            ax.legend(loc='upper right')
-            ax.invert_yaxis()
-            ax.grid()
-            ax.set_title(f'Frame {frame + 1}')
+    def build_xy_lists(full_list):
+        if full_list is None:
+            nframes = main_window.metadata.get("num_frames", 0)
+            return [None] * nframes, [None] * nframes
+        x_list = [contour[0] if (contour is not None and len(contour) >= 2) else None for contour in full_list]
+        y_list = [contour[1] if (contour is not None and len(contour) >= 2) else None for contour in full_list]
+        return x_list, y_list
 
-        fig.tight_layout()
-        fig.show()
+    contours = {'lumen': build_xy_lists(lumen_full_list)}
+    for name in ('eem', 'calcium', 'branch'):
+        contours[name] = build_xy_lists(_get_full_list_by_name(name))
 
-    return report_data
+    return contours
+
+
+def build_report_table(main_window, contoured_frames, metrics):
+    """
+    Builds the report table in one go from per-frame metric arrays.
+
+    The table is indexed by the (1-based) frame number, so consumers can look up rows with
+    report_data.loc[frames, column] instead of scanning the 'frame' column.
+    """
+    frames = np.asarray(contoured_frames, dtype=int)
+    n_frames = main_window.metadata.get('num_frames', len(frames))
+    pullback_length = np.asarray(main_window.metadata['pullback_length'], dtype=float)
+    start_frame = main_window.metadata['pullback_start_frame']
+
+    position = pullback_length[frames]
+    if start_frame <= 0.25 * n_frames:
+        position = position - pullback_length[start_frame - 1]
+    measure_lengths = np.array([main_window.data['measure_lengths'][frame] for frame in frames], dtype=float)
+    eem_area = main_window.data.get('eem_area', [0] * n_frames)
+
+    columns = {
+        'frame': frames + 1,
+        'position': np.maximum(position, 0),
+        'phase': np.asarray(main_window.data['phases'], dtype=object)[frames],
+    }
+    for name, values in metrics.items():
+        columns[name] = np.asarray(values, dtype=float)[frames]
+    columns['measurement_1'] = measure_lengths.reshape(-1, 2)[:, 0]
+    columns['measurement_2'] = measure_lengths.reshape(-1, 2)[:, 1]
+    columns['eem_area'] = np.asarray(eem_area, dtype=float)[frames]
+
+    return pd.DataFrame(columns, index=frames + 1)
 
 
 def compute_polygon_metrics(main_window, polygon, frame):
@@ -416,42 +479,3 @@ def closest_points(main_window, polygon, frame):
     main_window.data['nearest_point'][1][frame] = closest_point_y
 
     return shortest_distance, closest_point_x, closest_point_y
-
-
-def save_csv_files(main_window, lumen_x, lumen_y, name, frames):
-    if not frames:
-        logger.warning(f'No frames available for {name} contours, skipping CSV saving.')
-        return
-    csv_out_dir = os.path.join(main_window.file_name + '_csv_files')
-    logger.info(f'Saving {name} contours to {csv_out_dir}')
-    os.makedirs(csv_out_dir, exist_ok=True)
-    img_dim_mm = main_window.metadata['dimension'] * main_window.metadata['resolution']
-
-    with open(os.path.join(csv_out_dir, f'{name}_contours.csv'), 'w', newline='') as contours_file:
-        contours_writer = csv.writer(contours_file, delimiter='\t')
-        distance_offset = main_window.metadata['pullback_length'][frames[0]]
-        for frame in frames:
-            if lumen_x[frame] is None:
-                continue
-            rows = zip(
-                [x * main_window.metadata['resolution'] for x in lumen_x[frame]],
-                [abs(y * main_window.metadata['resolution'] - img_dim_mm) for y in lumen_y[frame]],
-            )
-            for row in rows:
-                row = [frame + 1] + list(row) + [main_window.metadata['pullback_length'][frame] - distance_offset]
-                contours_writer.writerow(row)
-
-    if name in ('diastolic', 'systolic'):
-        ref_file_name = f'{name}_reference_points.csv'
-        with open(os.path.join(csv_out_dir, ref_file_name), 'w', newline='') as reference_file:
-            reference_writer = csv.writer(reference_file, delimiter='\t')
-            for frame in frames:
-                if main_window.data['reference'][frame] is not None:
-                    reference_writer.writerow(
-                        [
-                            frame + 1,
-                            main_window.data['reference'][frame][0] * main_window.metadata['resolution'],
-                            abs(main_window.data['reference'][frame][1] * main_window.metadata['resolution'] - img_dim_mm),
-                            main_window.metadata['pullback_length'][frame] - distance_offset,
-                        ]
-                    )
\ No newline at end of file
@@ -0,0 +1,103 @@
+import math
+import os
+
+from loguru import logger
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def sample_frames(contoured_frames, n_frames):
+    """Picks n_frames evenly spread over the contoured frames (0.2, 0.4, 0.6 and 0.8 for four frames)."""
+    n_frames = min(n_frames, len(contoured_frames))
+    indices = [int(len(contoured_frames) * (i + 1) / (n_frames + 1)) for i in range(n_frames)]
+    return [contoured_frames[index] for index in indices]
+
+
+def plot_frames(lumen, data, frames):
+    """
+    Plots contour, centroid and farthest/nearest points for the given frames into an off-screen figure.
+
+    Only the object-oriented matplotlib API is used (no pyplot), so no window is opened and the figures of
+    the GUI are not touched.
+
+    Parameters:
+    - lumen (tuple): (x_list, y_list) with one lumen contour per frame.
+    - data (dict): main_window.data with the computed lumen metrics.
+    - frames (list): frames (0-based) to plot.
+    """
+    lumen_x, lumen_y = lumen
+    lumen_area = data['lumen_area']
+    longest_distance = data['longest_distance']
+    shortest_distance = data['shortest_distance']
+    centroid_x, centroid_y = data['lumen_centroid']
+    farthest_x, farthest_y = data['farthest_point']
+    nearest_x, nearest_y = data['nearest_point']
+
+    n_cols = min(len(frames), 2 if len(frames) <= 4 else 4)
+    n_rows = math.ceil(len(frames) / n_cols)
+    fig = Figure(figsize=(6 * n_cols, 6 * n_rows))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(n_rows, n_cols, squeeze=False).ravel()
+
+    for ax, frame in zip(axes, frames):
+        ax.plot(lumen_x[frame], lumen_y[frame], '-g', linewidth=2, label='Contour')
+        ax.plot(centroid_x[frame], centroid_y[frame], 'ro', markersize=8, label='Centroid')
+        ax.plot(farthest_x[frame][0], farthest_y[frame][0], 'bo', markersize=8, label='Farthest Point 1')
+        ax.plot(farthest_x[frame][1], farthest_y[frame][1], 'bo', markersize=8, label='Farthest Point 2')
+        ax.plot(nearest_x[frame][0], nearest_y[frame][0], 'yo', markersize=8, label='Nearest Point 1')
+        ax.plot(nearest_x[frame][1], nearest_y[frame][1], 'yo', markersize=8, label='Nearest Point 2')
+
+        # Annotate with shortest and longest distances
+        ax.annotate(
+            f'Shortest Distance: {shortest_distance[frame]:.2f} mm',
+            xy=(centroid_x[frame], centroid_y[frame]),
+            xycoords='data',
+            xytext=(10, 30),
+            textcoords='offset points',
+            arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=.2'),
+        )
+        ax.annotate(
+            f'Longest Distance: {longest_distance[frame]:.2f} mm',
+            xy=(centroid_x[frame], centroid_y[frame]),
+            xycoords='data',
+            xytext=(10, -30),
+            textcoords='offset points',
+            arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=-.2'),
+        )
+        elliptic_ratio = longest_distance[frame] / shortest_distance[frame] if shortest_distance[frame] else 0
+        ax.annotate(
+            f'Lumen Area: {lumen_area[frame]:.2f} mm\N{SUPERSCRIPT TWO}\nElliptic Ratio: {elliptic_ratio:.2f}',
+            xy=(centroid_x[frame], centroid_y[frame]),
+            xycoords='data',
+            xytext=(10, 0),
+            textcoords='offset points',
+            arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=0'),
+        )
+
+        ax.legend(loc='upper right')
+        ax.invert_yaxis()
+        ax.grid()
+        ax.set_title(f'Frame {frame + 1}')
+
+    for ax in axes[len(frames) :]:
+        ax.set_axis_off()
+    fig.tight_layout()
+
+    return fig
+
+
+def save_report_plots(file_name, lumen, data, contoured_frames, n_frames=4, formats=('png',)):
+    """Renders the sample frame plots off-screen and saves them as <file>_report_plots.<format>."""
+    frames = sample_frames(contoured_frames, n_frames)
+    if not frames:
+        return []
+
+    fig = plot_frames(lumen, data, frames)
+    out_files = []
+    for file_format in formats:
+        out_file = f'{os.path.splitext(file_name)[0]}_report_plots.{file_format}'
+        fig.savefig(out_file, dpi=100)
+        out_files.append(out_file)
+    logger.info(f'Saved report plots to {", ".join(out_files)}')
+
+    return out_files
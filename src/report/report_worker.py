@@ -0,0 +1,120 @@
+import time
+
+from loguru import logger
+from PyQt6.QtCore import QObject, QThread, Qt, pyqtSignal, pyqtSlot
+from PyQt6.QtWidgets import QProgressDialog
+
+from gui.popup_windows.message_boxes import ErrorMessage
+
+
+class ProgressThrottle:
+    """Forwards progress values at most every min_interval seconds (the final value is always forwarded)."""
+
+    def __init__(self, callback, maximum, min_interval=0.25):
+        self.callback = callback
+        self.maximum = maximum
+        self.min_interval = min_interval
+        self.last_update = -float('inf')
+
+    def __call__(self, value):
+        now = time.monotonic()
+        if value >= self.maximum or now - self.last_update >= self.min_interval:
+            self.last_update = now
+            self.callback(value)
+
+
+class BackgroundWorker(QObject):
+    """Runs compute(progress_callback, is_cancelled) in a background thread."""
+
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)  # result of compute, None if cancelled
+    failed = pyqtSignal(str)
+
+    def __init__(self, compute, maximum, min_interval=0.25):
+        super().__init__()
+        self.compute = compute
+        self.maximum = maximum
+        self.min_interval = min_interval
+        self.cancelled = False
+
+    @pyqtSlot()
+    def run(self):
+        throttle = ProgressThrottle(self.progress.emit, self.maximum, self.min_interval)
+        try:
+            result = self.compute(progress_callback=throttle, is_cancelled=lambda: self.cancelled)
+        except Exception as e:
+            logger.exception(f'Background computation failed: {e}')
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(result)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class BackgroundTask(QObject):
+    """
+    Owns the progress dialog, thread and worker of one long computation (lives in the GUI thread).
+    on_finished(result) is called in the GUI thread once the worker is done, label and error name the
+    computation in the dialog and in the error message.
+    """
+
+    def __init__(self, main_window, compute, on_finished, maximum, label, error):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.on_finished = on_finished
+        self.label = label
+        self.error = error
+
+        self.progress = QProgressDialog(label, 'Cancel', 0, maximum, main_window)
+        self.progress.setWindowFlags(Qt.WindowType.Dialog)
+        self.progress.setWindowTitle(label)
+        self.progress.setModal(True)  # contours must not change while the worker reads them
+        self.progress.setMinimumDuration(0)
+        self.progress.resize(500, 100)
+
+        self.thread = QThread(self)
+        self.worker = BackgroundWorker(compute, maximum)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.thread.finished.connect(self.worker.deleteLater)
+        self.worker.progress.connect(self.progress.setValue)
+        self.worker.finished.connect(self._finished)
+        self.worker.failed.connect(self._failed)
+        self.progress.canceled.connect(self.worker.cancel, Qt.ConnectionType.DirectConnection)
+
+    def start(self):
+        self.main_window.status_bar.showMessage(self.label)
+        self.progress.setValue(0)
+        self.thread.start()
+
+    @pyqtSlot(object)
+    def _finished(self, result):
+        self._cleanup()
+        self.on_finished(result)
+
+    @pyqtSlot(str)
+    def _failed(self, message):
+        self._cleanup()
+        ErrorMessage(self.main_window, f'{self.error}: {message}')
+
+    def _cleanup(self):
+        self.thread.quit()
+        self.thread.wait()
+        self.progress.close()
+        self.main_window.status_bar.showMessage(self.main_window.waiting_status)
+        self.deleteLater()
+
+
+class ReportTask(BackgroundTask):
+    """BackgroundTask of one report computation, kept in main_window.report_task while it runs."""
+
+    def __init__(
+        self, main_window, compute, on_finished, maximum, label='Writing report...', error='Report could not be written'
+    ):
+        super().__init__(main_window, compute, on_finished, maximum, label, error)
+
+    def _cleanup(self):
+        if getattr(self.main_window, 'report_task', None) is self:
+            self.main_window.report_task = None
+        super()._cleanup()
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+VOLUME_TYPES = ('lumen', 'eem', 'plaque')
+
+
+class SegmentVolumes:
+    """
+    Lumen, EEM and plaque volumes along the pullback for one phase.
+
+    Areas are integrated over the pullback position with the trapezoidal rule. The cumulative
+    integrals are computed once, so the volume of any sub-segment is a difference of two entries.
+    Frames without EEM contour count as EEM and plaque area 0, the areas taper linearly to 0 towards them. An
+    interval between a frame with and one without EEM contour thus adds half the slab of the former.
+    """
+
+    def __init__(self, frames, position, lumen_area, eem_area):
+        order = np.argsort(position, kind='stable')
+        self.frames = np.asarray(frames)[order]
+        self.position = np.asarray(position, dtype=float)[order]
+        lumen_area = np.asarray(lumen_area, dtype=float)[order]
+        eem_area = np.nan_to_num(np.asarray(eem_area, dtype=float)[order])
+        areas = {
+            'lumen': lumen_area,
+            'eem': eem_area,
+            'plaque': np.where(eem_area > 0, np.clip(eem_area - lumen_area, 0, None), 0),
+        }
+        step = np.diff(self.position)
+        self.cumulative = {
+            name: np.concatenate(([0], np.cumsum(step * (area[1:] + area[:-1]) / 2))) for name, area in areas.items()
+        }
+
+    def __len__(self):
+        return len(self.frames)
+
+    def volume(self, name, start=0, end=None):
+        """Volume in mm³ between the sorted indices start and end (inclusive)."""
+        cumulative = self.cumulative[name]
+        end = len(cumulative) - 1 if end is None else end
+        return cumulative[end] - cumulative[start]
+
+    def volume_between(self, name, start_position, end_position):
+        """Volume in mm³ between two pullback positions (mm), linearly interpolated between frames."""
+        cumulative = np.interp([start_position, end_position], self.position, self.cumulative[name])
+        return cumulative[1] - cumulative[0]
+
+    def summary(self):
+        return {
+            'frames': len(self),
+            'length': self.position[-1] - self.position[0] if len(self) else 0,
+            **{f'{name}_volume': self.volume(name) if len(self) else 0 for name in VOLUME_TYPES},
+        }
+
+
+def compute_volumes(report_data):
+    """Returns a SegmentVolumes object per phase ('D', 'S') and for all contoured frames ('all')."""
+    groups = {'all': report_data}
+    for phase in ('D', 'S'):
+        group = report_data[report_data['phase'] == phase]
+        if not group.empty:
+            groups[phase] = group
+
+    return {
+        phase: SegmentVolumes(group['frame'], group['position'], group['lumen_area'], group['eem_area'])
+        for phase, group in groups.items()
+    }
+
+
+def add_volume_columns(report_data, volumes):
+    """Adds the cumulative volume within each frame's phase (NaN for frames without phase)."""
+    for name in VOLUME_TYPES:
+        report_data[f'{name}_volume'] = np.nan
+    for phase in ('D', 'S'):
+        if phase not in volumes:
+            continue
+        segment = volumes[phase]
+        for name in VOLUME_TYPES:
+            report_data.loc[segment.frames, f'{name}_volume'] = segment.cumulative[name]
+
+    return report_data
+
+
+def volume_summary(volumes):
+    """Table with one row of total volumes per phase."""
+    return pd.DataFrame.from_dict({phase: segment.summary() for phase, segment in volumes.items()}, orient='index')
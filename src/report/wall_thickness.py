@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from report.contour_arrays import stack_contours, polygon_centroids, ray_directions
+
+
+def radial_distances(x, y, center_x, center_y, angles, chunk_size=32):
+    """
+    Casts rays from one center per frame and returns the distance to the nearest polygon crossing.
+
+    All rays of a chunk of frames are intersected with all polygon edges at once, the chunk size
+    bounds the memory of the (frames, rays, edges) intermediate arrays.
+
+    Parameters:
+    - x, y (numpy.ndarray): stacked closed polygons of shape (n_frames, n_points), see stack_contours.
+    - center_x, center_y (numpy.ndarray): ray origin per frame.
+    - angles (numpy.ndarray): ray angles in degrees.
+
+    Returns:
+    - distances (numpy.ndarray): float32 array (n_frames, n_rays), NaN where a ray does not hit the polygon.
+    """
+    dx, dy = (direction.astype(np.float32)[None, :, None] for direction in ray_directions(angles))
+    distances = np.full((len(x), len(angles)), np.nan, dtype=np.float32)
+
+    for start in range(0, len(x), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        # edge start points relative to the ray origin and edge vectors
+        px = (x[chunk] - center_x[chunk, None]).astype(np.float32)
+        py = (y[chunk] - center_y[chunk, None]).astype(np.float32)
+        sx = np.roll(px, -1, axis=1) - px
+        sy = np.roll(py, -1, axis=1) - py
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denominator = dx * sy[:, None, :] - dy * sx[:, None, :]
+            t = (px * sy - py * sx)[:, None, :] / denominator  # position along the ray
+            u = (px[:, None, :] * dy - py[:, None, :] * dx) / denominator  # position along the edge
+            hit = (denominator != 0) & (u >= 0) & (u <= 1) & (t > 0)
+        nearest = np.where(hit, t, np.inf).min(axis=2)
+        nearest[~np.isfinite(nearest)] = np.nan
+        distances[chunk] = nearest
+
+    return distances
+
+
+def wall_thickness_map(lumen, eem, frames, resolution, n_rays=360):
+    """
+    Radial distance between lumen and EEM contour for N rays cast from the lumen centroid.
+
+    Parameters:
+    - lumen, eem (tuple): (x_list, y_list) with one contour per frame (None if not drawn).
+    - frames (list): frames (0-based) to include.
+    - resolution (float): pixel size in mm.
+
+    Returns:
+    - angles (numpy.ndarray): ray angles in degrees (same convention as vector_angle).
+    - thickness (numpy.ndarray): float32 matrix (n_rays, n_frames) in mm, NaN for frames without EEM contour.
+    """
+    angles = np.arange(n_rays) * 360 / n_rays
+    thickness = np.full((n_rays, len(frames)), np.nan, dtype=np.float32)
+
+    lumen_x, lumen_y, lumen_valid = stack_contours(*lumen, frames)
+    eem_x, eem_y, eem_valid = stack_contours(*eem, frames)
+    rows = np.flatnonzero(lumen_valid & eem_valid)
+    if not len(rows):
+        return angles, thickness
+
+    center_x, center_y = polygon_centroids(lumen_x[rows], lumen_y[rows])
+    lumen_radius = radial_distances(lumen_x[rows], lumen_y[rows], center_x, center_y, angles)
+    eem_radius = radial_distances(eem_x[rows], eem_y[rows], center_x, center_y, angles)
+    thickness[:, rows] = ((eem_radius - lumen_radius) * resolution).T
+
+    return angles, thickness
+
+
+def save_wall_thickness(file_name, angles, frames, thickness):
+    """Writes the thickness map with one row per angle and one column per (1-based) frame."""
+    out_file = os.path.splitext(file_name)[0] + '_wall_thickness.txt'
+    table = pd.DataFrame(thickness, index=pd.Index(angles, name='angle'), columns=np.asarray(frames) + 1)
+    table.to_csv(out_file, sep='\t', float_format='%.3f')
+    logger.info(f'Saved wall thickness map to {out_file}')
@@ -0,0 +1,45 @@
+from unittest.mock import Mock
+
+from omegaconf import OmegaConf
+from PyQt6.QtWidgets import QWidget
+
+from gui.popup_windows.gating_parameters import GatingParametersDialog
+
+
+def test_editing_filter_band_disables_auto_heart_rate(qtbot):
+    main_window = QWidget()
+    qtbot.addWidget(main_window)
+    main_window.config = OmegaConf.create(
+        {
+            'gating': {
+                'normalize_step': 0,
+                'lowcut': 1.33,
+                'highcut': 6.0,
+                'order': 6,
+                'extrema_y_lim': 50,
+                'extrema_x_lim': 6,
+                'window': 0,
+                'window_overlap': 150,
+                'maxima_only': False,
+                'auto_heart_rate': True,
+            }
+        }
+    )
+    main_window.metadata = {
+        'frame_rate': 30,
+        'heart_rate': {'bpm': 90, 'confidence': 0.9, 'lowcut': 1.5, 'highcut': 7.2, 'extrema_x_lim': 5},
+    }
+    main_window.contour_based_gating = Mock()
+    main_window.status_bar = Mock()
+    main_window.waiting_status = ''
+    dialog = GatingParametersDialog(main_window)
+
+    assert dialog.inputs['lowcut'].value() == 1.5  # values in use, not the overridden config
+    assert dialog.inputs['extrema_x_lim'].value() == 5
+
+    dialog.inputs['highcut'].setValue(5.0)
+    dialog.preview()
+
+    assert main_window.config.gating.auto_heart_rate is False
+    assert main_window.config.gating.highcut == 5.0 and main_window.config.gating.lowcut == 1.5
+    main_window.contour_based_gating.refilter.assert_called_once()
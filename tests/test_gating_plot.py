@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+pytest.importorskip('skimage')  # pulled in by the report module
+
+
+@pytest.fixture
+def gating(mock_main_window):
+    from gating.contour_based_gating import ContourBasedGating
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    gating = ContourBasedGating(mock_main_window)
+    gating.fig = fig
+    gating.ax = fig.add_subplot()
+    gating.ax.plot(np.arange(1, 101), np.sin(np.arange(100)))
+    gating.x = np.arange(1, 101)
+    return gating
+
+
+def test_nearest_line_uses_sorted_positions(gating):
+    for x in (40, 10, 70, 25):
+        gating.add_line(x, 'grey')
+
+    assert gating.line_positions.tolist() == [10, 25, 40, 70]
+    assert gating.nearest_line(26.5, 2).get_xdata()[0] == 25
+    assert gating.nearest_line(55, 2) is None
+
+    gating.vertical_lines[0].set_xdata([90, 90])  # dragged
+    gating.sort_lines()
+    assert gating.line_positions.tolist() == [25, 40, 70, 90]
+    assert gating.nearest_line(89, 2) is gating.vertical_lines[-1]
+
+
+def test_frame_marker_is_blitted_over_cached_background(gating):
+    gating.fig.canvas.mpl_connect('draw_event', gating.on_draw)
+    gating.add_line(30, 'grey')
+    gating.fig.canvas.draw()
+    assert gating.background is not None
+
+    gating.set_frame(49)
+    gating.select_line(gating.vertical_lines[0])
+
+    assert gating.frame_marker.get_animated() and gating.frame_marker.get_xdata()[0] == 50
+    assert gating.selected_line.get_animated()
+    gating.reset_highlights()
+    assert not gating.vertical_lines[0].get_animated()
+
+
+def test_refilter_updates_signals_in_place(mock_main_window):
+    import pandas as pd
+    from omegaconf import OmegaConf
+
+    from gating.contour_based_gating import ContourBasedGating
+    from gating.signal_processing import filter_signals, normalize_signals
+
+    rng = np.random.default_rng(0)
+    n_frames = 200
+    phase = 2 * np.pi * np.arange(n_frames) / 20
+    report_data = pd.DataFrame(
+        {
+            'frame': np.arange(1, n_frames + 1),
+            'shortest_distance': np.cos(phase) + rng.normal(0, 0.1, n_frames),
+            'vector_angle': np.cos(phase + 0.1) + rng.normal(0, 0.1, n_frames),
+            'vector_length': np.cos(phase - 0.1) + rng.normal(0, 0.1, n_frames),
+            'elliptic_ratio': 1.2 + 0.1 * np.cos(phase),
+        },
+        index=np.arange(1, n_frames + 1),
+    )
+    gating_config = {
+        'normalize_step': 0,
+        'lowcut': 1.33,
+        'highcut': 6.0,
+        'order': 6,
+        'extrema_y_lim': 50,
+        'extrema_x_lim': 6,
+        'maxima_only': True,
+        'auto_heart_rate': False,
+    }
+    mock_main_window.config = OmegaConf.create({'gating': gating_config})
+    mock_main_window.diastole_color_plt = (0.2, 0.3, 0.9)
+    mock_main_window.systole_color_plt = (0.8, 0.2, 0.1)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    mock_main_window.gating_display.fig = fig
+
+    gating = ContourBasedGating(mock_main_window)
+    gating.x = report_data['frame'].values
+    gating.report_data = report_data
+    gating.measured_signals = (
+        [np.cos(phase) + rng.normal(0, 0.05, n_frames), np.cos(phase + 0.05) + rng.normal(0, 0.05, n_frames)],
+        [report_data[column].to_numpy() for column in ('shortest_distance', 'vector_angle', 'vector_length')],
+    )
+    gating.plot_data(*filter_signals(mock_main_window, *normalize_signals(mock_main_window, *gating.measured_signals)))
+    image_line = gating.signal_lines[0]
+    n_lines = len(gating.ax.lines)
+
+    mock_main_window.config.gating.highcut = 3.0
+    signals = gating.refilter()
+
+    assert gating.signal_lines[0] is image_line and len(gating.ax.lines) == n_lines
+    assert image_line.get_ydata() == pytest.approx(signals[2])
+    assert len(gating.preview_markers[0].get_xdata()) > 0
+    mock_main_window.config.gating.lowcut = 4.0  # above highcut
+    with pytest.raises(ValueError):
+        gating.refilter()
@@ -0,0 +1,399 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import numpy as np
+import pandas as pd
+import pytest
+from omegaconf import OmegaConf
+from shapely.geometry import Polygon
+
+import report.report as report_module
+from report.contour_arrays import stack_contours
+from report.contour_validation import self_intersecting
+from report.report import build_report_table
+
+
+@pytest.fixture
+def report_window():
+    n_frames = 10
+    return SimpleNamespace(
+        metadata={'num_frames': n_frames, 'pullback_length': np.arange(n_frames) * 0.5, 'pullback_start_frame': 2},
+        data={
+            'phases': ['D', '-', 'S', '-', 'D', '-', 'S', '-', 'D', '-'],
+            'measure_lengths': [[np.nan, np.nan] for _ in range(n_frames)],
+            'eem_area': [float(frame) * 2 for frame in range(n_frames)],
+        },
+    )
+
+
+@pytest.fixture
+def gating_report_window(tmp_path):
+    n_frames = 8
+    return SimpleNamespace(
+        image_displayed=True,
+        file_name=str(tmp_path / 'pullback.dcm'),
+        metadata={'num_frames': n_frames, 'pullback_speed': 0.5, 'pullback_start_frame': 1, 'frame_rate': 30},
+        data={'lumen': [[[1.0, 2.0, 3.0]] * n_frames, [[1.0, 2.0, 3.0]] * n_frames]},
+        config=OmegaConf.create(
+            {
+                'report': {
+                    'save_as_csv': True,
+                    'save_as_parquet': False,
+                    'wall_thickness_rays': 360,
+                    'plot': True,
+                    'plot_frames': 4,
+                    'plot_formats': ['png'],
+                }
+            }
+        ),
+    )
+
+
+def test_write_report_renders_plots_after_the_report(gating_report_window, tmp_path, monkeypatch):
+    report_file = tmp_path / 'pullback_report.txt'
+    rendered = []
+
+    def save_report_plots(file_name, lumen, data, contoured_frames, n_frames, formats):
+        assert report_file.exists()  # the report is written before the plots are rendered
+        rendered.append((contoured_frames, n_frames, formats))
+
+    monkeypatch.setattr(report_module, 'save_report_plots', save_report_plots)
+    monkeypatch.setattr(report_module, 'full_contour_lists', lambda main_window: {'lumen': ([], [])})
+    frames = np.array([1, 2, 3, 4])
+    report_data = pd.DataFrame(
+        {
+            'frame': frames,
+            'position': frames * 0.5,
+            'phase': ['D', 'S', 'D', 'S'],
+            'lumen_area': np.ones(4),
+            'eem_area': np.full(4, 2.0),
+        },
+        index=frames,
+    )
+
+    report_module.write_report(
+        gating_report_window, [0, 1, 2, 3], report_data, suppress_messages=True, full_report=False, plot_frames=4
+    )
+
+    assert rendered == [([0, 1, 2, 3], 4, ('png',))]
+
+
+def test_build_report_table_is_frame_indexed(report_window):
+    contoured_frames = [0, 2, 4, 6, 8]
+    metrics = {'lumen_area': np.arange(10) * 1.5, 'elliptic_ratio': np.linspace(1, 2, 10)}
+    report_data = build_report_table(report_window, contoured_frames, metrics)
+
+    assert list(report_data.index) == [1, 3, 5, 7, 9]
+    assert list(report_data['frame']) == [1, 3, 5, 7, 9]
+    assert report_data.loc[5, 'lumen_area'] == pytest.approx(6.0)
+    assert report_data.loc[[3, 7], 'elliptic_ratio'].tolist() == pytest.approx([metrics['elliptic_ratio'][2], metrics['elliptic_ratio'][6]])
+    assert list(report_data['phase']) == ['D', 'S', 'D', 'S', 'D']
+    # position relative to the pullback start frame, clipped at 0
+    assert report_data['position'].tolist() == pytest.approx([0.0, 0.5, 1.5, 2.5, 3.5])
+    assert report_data.loc[9, 'eem_area'] == pytest.approx(16.0)
+
+
+def test_sub_range_report_writes_no_exports(gating_report_window, tmp_path, monkeypatch):
+    calls = []
+
+    def compute_all(main_window, contoured_frames, **kwargs):
+        calls.append(kwargs)
+        frames = np.asarray(contoured_frames) + 1
+        return pd.DataFrame(
+            {
+                'frame': frames,
+                'position': frames * 0.5,
+                'phase': ['D', 'S'] * (len(frames) // 2),
+                'lumen_area': np.ones(len(frames)),
+                'eem_area': np.full(len(frames), 2.0),
+            },
+            index=frames,
+        )
+
+    monkeypatch.setattr(report_module, 'compute_all', compute_all)
+    gating_report_window.results_plot = Mock()
+    gating_report_window.wall_thickness = (np.linspace(0, 2 * np.pi, 4, endpoint=False), [0, 1], np.ones((2, 4)))
+    gating_report_window.wall_thickness_display = Mock()
+    report_data = report_module.report(gating_report_window, 2, 6, suppress_messages=True)
+
+    assert list(report_data['frame']) == [3, 4, 5, 6]
+    assert calls[0]['save_as_csv'] is False and calls[0]['save_as_parquet'] is False
+    assert calls[0]['wall_thickness_rays'] == 0 and 'plot_frames' not in calls[0]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['pullback_report.txt']
+    assert not hasattr(gating_report_window, 'segment_volumes')
+    gating_report_window.results_plot.update_data.assert_not_called()
+    gating_report_window.wall_thickness_display.set_data.assert_not_called()
+
+
+def test_segment_volumes_integrate_area_over_position():
+    import pandas as pd
+    from report.volumes import compute_volumes, add_volume_columns
+
+    report_data = pd.DataFrame(
+        {
+            'frame': [1, 2, 3, 4, 5, 6],
+            'position': [0.0, 0.0, 1.0, 1.0, 2.0, 2.0],
+            'phase': ['D', 'S', 'D', 'S', 'D', 'S'],
+            'lumen_area': [2.0, 1.0, 4.0, 1.0, 6.0, 1.0],
+            'eem_area': [5.0, 0.0, 5.0, 0.0, 5.0, 0.0],
+        },
+        index=[1, 2, 3, 4, 5, 6],
+    )
+    volumes = compute_volumes(report_data)
+
+    assert set(volumes) == {'all', 'D', 'S'}
+    assert volumes['D'].volume('lumen') == pytest.approx(8.0)  # trapezoid of 2, 4, 6 over 2 mm
+    assert volumes['D'].volume('lumen', 1, 2) == pytest.approx(5.0)
+    assert volumes['D'].volume('plaque') == pytest.approx(2.5)  # 3, 1, 0 (clipped)
+    assert volumes['D'].volume_between('lumen', 0.5, 1.5) == pytest.approx(4.0)
+    assert volumes['S'].volume('eem') == 0
+
+    add_volume_columns(report_data, volumes)
+    assert report_data.loc[[1, 3, 5], 'lumen_volume'].tolist() == pytest.approx([0.0, 3.0, 8.0])
+    assert report_data.loc[6, 'lumen_volume'] == pytest.approx(2.0)
+
+
+def test_segment_volumes_taper_to_frames_without_eem():
+    from report.volumes import SegmentVolumes
+
+    volumes = SegmentVolumes([1, 2, 3, 4], [0.0, 1.0, 2.0, 3.0], [2.0, 2.0, 2.0, 2.0], [6.0, 6.0, 0.0, np.nan])
+
+    assert volumes.volume('eem') == pytest.approx(6.0 + 3.0)  # full slab, then half a slab to frame 3
+    assert volumes.volume('eem', 2, 3) == 0
+    assert volumes.volume('plaque') == pytest.approx(4.0 + 2.0)
+    assert volumes.volume('lumen') == pytest.approx(6.0)
+
+
+def test_compare_phases_pairs_nearest_diastolic_frame():
+    import pandas as pd
+    from report.phase_comparison import compare_phases
+
+    report_data = pd.DataFrame(
+        {
+            'frame': [1, 2, 3, 4, 5, 6],
+            'position': [0.0, 0.4, 1.0, 1.7, 2.0, 3.5],
+            'phase': ['D', 'S', 'D', 'S', 'D', 'S'],
+            'lumen_area': [5.0, 4.0, 6.0, 5.5, 7.0, 6.0],
+            'elliptic_ratio': [1.1, 1.5, 1.2, 1.4, 1.3, 1.6],
+            'shortest_distance': [2.0, 1.8, 2.2, 2.1, 2.4, 2.3],
+        }
+    )
+    comparison = compare_phases(report_data)
+
+    assert comparison['systolic_frame'].tolist() == [2, 4, 6]
+    assert comparison['diastolic_frame'].tolist() == [1, 5, 5]
+    assert comparison['position_difference'].tolist() == pytest.approx([0.4, -0.3, 1.5])
+    assert comparison['lumen_area_delta'].tolist() == pytest.approx([-1.0, -1.5, -1.0])
+    assert comparison['elliptic_ratio_delta'].tolist() == pytest.approx([0.4, 0.1, 0.3])
+    assert compare_phases(report_data[report_data['phase'] == 'D']).empty
+
+
+def test_progress_throttle_rate_limits_updates(monkeypatch):
+    from report import report_worker
+
+    clock = iter([0.0, 0.1, 0.2, 0.3, 0.5, 0.55])
+    monkeypatch.setattr(report_worker.time, 'monotonic', lambda: next(clock))
+    received = []
+    throttle = report_worker.ProgressThrottle(received.append, maximum=5, min_interval=0.25)
+    for value in range(6):
+        throttle(value)
+
+    assert received == [0, 3, 5]  # first, after 0.25 s and the final value
+
+
+def test_report_worker_runs_in_background(qtbot):
+    import threading
+    from report.report_worker import BackgroundWorker
+    from PyQt6.QtCore import QThread
+
+    threads = []
+
+    def compute(progress_callback, is_cancelled):
+        threads.append(threading.current_thread())
+        progress_callback(1)
+        return 'report'
+
+    thread = QThread()
+    worker = BackgroundWorker(compute, maximum=1)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    with qtbot.waitSignal(worker.finished, timeout=5000) as blocker:
+        thread.start()
+    thread.quit()
+    thread.wait()
+
+    assert blocker.args == ['report']
+    assert threads[0] is not threading.main_thread()
+
+
+def test_wall_thickness_map_concentric_circles():
+    from report.wall_thickness import wall_thickness_map
+
+    theta = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    lumen_x = [list(50 + 10 * np.cos(theta)) for _ in range(3)]
+    lumen_y = [list(50 + 10 * np.sin(theta)) for _ in range(3)]
+    eem_x = [list(50 + 20 * np.cos(theta)), None, list(50 + 20 * np.cos(theta))]
+    eem_y = [list(50 + 20 * np.sin(theta)), None, list(50 + 20 * np.sin(theta))]
+
+    angles, thickness = wall_thickness_map((lumen_x, lumen_y), (eem_x, eem_y), [0, 1, 2], resolution=0.1, n_rays=36)
+
+    assert thickness.shape == (36, 3)
+    assert np.allclose(thickness[:, [0, 2]], 1.0, atol=0.01)
+    assert np.isnan(thickness[:, 1]).all()
+
+
+def test_wall_thickness_display_single_ray(qtbot):
+    from gui.right_half.wall_thickness_display import WallThicknessDisplay
+
+    main_window = SimpleNamespace(
+        config=OmegaConf.create({'display': {'image_size': 400}}),
+        metadata={'num_frames': 4},
+        display=SimpleNamespace(frame=0),
+    )
+    display = WallThicknessDisplay(main_window)
+    qtbot.addWidget(display)
+
+    display.set_data(np.array([0.0]), [1, 2], np.ones((1, 2)))
+
+    assert display.image.get_extent() == pytest.approx([0.5, 4.5, 360, 0])
+
+
+def test_lesion_metrics_calcium_arc_and_branch_angle():
+    from report.lesion_metrics import lesion_metrics
+
+    theta = np.linspace(0, 2 * np.pi, 100, endpoint=False)
+    lumen = ([list(10 * np.cos(theta))] * 2, [list(10 * np.sin(theta))] * 2)
+    # calcium ring segment between radius 12 and 14 spanning 90° around the y-axis (angle 0)
+    arc = np.radians(np.linspace(45, 135, 50))
+    calcium_x = np.concatenate([12 * np.cos(arc), 14 * np.cos(arc[::-1])])
+    calcium_y = np.concatenate([12 * np.sin(arc), 14 * np.sin(arc[::-1])])
+    calcium = ([list(calcium_x), None], [list(calcium_y), None])
+    branch = ([None, [20, 22, 22, 20]], [None, [-1, -1, 1, 1]])  # square at +x -> 270°
+
+    metrics = lesion_metrics(lumen, calcium, branch, frames=[0, 1], resolution=0.5)
+
+    assert metrics['calcium_arc'] == pytest.approx([90, 0])
+    assert metrics['calcium_thickness'] == pytest.approx([1, 0])
+    assert metrics['calcium_area'][0] == pytest.approx(np.pi * (14**2 - 12**2) / 4 * 0.25, rel=0.01)
+    assert metrics['branch_area'] == pytest.approx([0, 1])
+    assert np.isnan(metrics['branch_angle'][0])
+    assert metrics['branch_angle'][1] == pytest.approx(270)
+
+
+def test_self_intersection_detection_and_repair():
+    from report.contour_validation import find_self_intersections, repair_contour, self_intersecting
+
+    theta = np.linspace(0, 2 * np.pi, 200, endpoint=False) + 0.01
+    circle = (list(np.cos(theta)), list(np.sin(theta)))
+    radius = 1 + 0.6 * np.cos(2 * theta)
+    bean = (list(radius * np.cos(theta) + 0.9), list(radius * np.sin(theta)))
+    figure_eight = (list(np.sin(theta)), list(np.sin(2 * theta)))
+    x_list = [circle[0], figure_eight[0], None, bean[0]]
+    y_list = [circle[1], figure_eight[1], None, bean[1]]
+
+    assert find_self_intersections({'lumen': (x_list, y_list)}, [0, 1, 2, 3]) == {'lumen': [1]}
+
+    repaired_x, repaired_y = repair_contour(*figure_eight, n_points=10)
+    assert len(repaired_x) == 10
+    assert not self_intersecting(np.array([repaired_x]), np.array([repaired_y]))[0]
+
+
+def test_repaired_contours_get_new_metrics():
+    pytest.importorskip('skimage')  # imported with the display
+    from gui.utils.contours_gui import repair_contours
+
+    n_frames = 3
+    theta = np.linspace(0, 2 * np.pi, 200, endpoint=False) + 0.01
+    circle = (list(100 + 20 * np.cos(theta)), list(100 + 20 * np.sin(theta)))
+    figure_eight = (list(100 + 20 * np.sin(theta)), list(100 + 10 * np.sin(2 * theta)))
+    lumen = [[circle[0], figure_eight[0], circle[0]], [circle[1], figure_eight[1], circle[1]]]
+    full_contours = {'lumen': [(lumen[0][frame], lumen[1][frame]) for frame in range(n_frames)]}
+    full_contours.update({name: [None] * n_frames for name in ('eem', 'calcium', 'branch')})
+
+    def build_full_contour(contour_type, frame):  # the knots stand in for the spline
+        full_contours[contour_type.value][frame] = (lumen[0][frame], lumen[1][frame])
+
+    def frame_values(value):
+        return [value] * n_frames
+
+    window = SimpleNamespace(
+        file_name='pullback',
+        images=np.zeros((n_frames, 200, 200)),
+        metadata={
+            'num_frames': n_frames,
+            'resolution': 0.01,
+            'pullback_length': np.arange(n_frames) * 0.5,
+            'pullback_start_frame': 1,
+        },
+        data={
+            'lumen': lumen,
+            'phases': frame_values('-'),
+            'measure_lengths': [[np.nan, np.nan] for _ in range(n_frames)],
+            'lumen_area': frame_values(0.5),  # computed from the self-intersecting contour
+            'lumen_circumf': frame_values(3.0),
+            'elliptic_ratio': frame_values(2.0),
+            'eem_area': frame_values(0),
+            'longest_distance': frame_values(0),
+            'shortest_distance': frame_values(0),
+            'vector_length': frame_values(0),
+            'vector_angle': frame_values(0),
+            'farthest_point': [frame_values(0), frame_values(0)],
+            'nearest_point': [frame_values(0), frame_values(0)],
+            'lumen_centroid': [frame_values(0), frame_values(0)],
+        },
+        display=SimpleNamespace(
+            full_contours=full_contours, build_full_contour=build_full_contour, display_image=Mock()
+        ),
+        status_bar=Mock(),
+        waiting_status='',
+    )
+
+    repair_contours(window, {'lumen': [1]})
+    report_data = report_module.compute_all(window, [0, 1, 2], save_as_csv=False)
+
+    assert report_data.loc[2, 'lumen_area'] != pytest.approx(0.5)
+    assert report_data.loc[2, 'lumen_area'] == pytest.approx(Polygon(zip(*full_contours['lumen'][1])).area * 1e-4)
+    assert report_data.loc[2, 'elliptic_ratio'] != pytest.approx(2.0)
+    assert report_data.loc[[1, 3], 'lumen_area'].tolist() == pytest.approx([0.5, 0.5])  # not repaired
+
+
+def test_self_intersection_matches_shapely_validity():
+    touching_vertex = [(0, 0), (4, 0), (4, 4), (2, 0), (0, 4)]
+    collinear_overlap = [(0, 0), (4, 0), (2, 0), (2, 4)]
+    straight_continuation = [(0, 0), (2, 0), (4, 0), (4, 4), (0, 4)]
+    flat = [(4, 1), (5, 0), (0, 5)]
+    # small integer coordinates give many touching vertices and collinear edges
+    rng = np.random.default_rng(4)
+    polygons = [touching_vertex, collinear_overlap, straight_continuation, flat]
+    polygons += [[tuple(point) for point in rng.integers(0, 6, (n, 2))] for n in rng.integers(3, 12, 500)]
+    x_list = [[float(px) for px, _ in polygon] for polygon in polygons]
+    y_list = [[float(py) for _, py in polygon] for polygon in polygons]
+    x, y, _ = stack_contours(x_list, y_list, list(range(len(polygons))))
+
+    invalid = self_intersecting(x, y)
+
+    assert list(invalid[:4]) == [True, True, False, True]
+    assert list(invalid) == [not Polygon(polygon).is_valid for polygon in polygons]
+
+
+def test_report_plot_sample_frames():
+    from report.report_plots import sample_frames
+
+    assert sample_frames(list(range(10)), 4) == [2, 4, 6, 8]
+    assert sample_frames([3, 5], 4) == [3, 5]
+
+
+def test_results_plot_decimation_keeps_extrema():
+    from gui.popup_windows.results_plot import decimate
+
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 50)
+    y[1234] = 5
+    y[100] = np.nan
+
+    x_decimated, y_decimated = decimate(x, y, max_points=200)
+
+    assert len(x_decimated) <= 200
+    assert np.all(np.diff(x_decimated) > 0)
+    assert y_decimated.max() == 5 and 1234 in x_decimated
+    assert not np.isnan(y_decimated).any()
@@ -0,0 +1,98 @@
+import os
+import csv
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from report.export import build_contour_table, save_contour_tables
+
+
+@pytest.fixture
+def export_window(tmp_path):
+    """Main window stand-in with a few lumen/eem contours and gated frames."""
+    n_frames = 6
+    rng = np.random.default_rng(0)
+    lumen_x = [rng.uniform(100, 200, 20) if frame != 3 else None for frame in range(n_frames)]
+    lumen_y = [rng.uniform(100, 200, 20) if frame != 3 else None for frame in range(n_frames)]
+    eem_x = [rng.uniform(50, 250, 30) if frame in (0, 2) else None for frame in range(n_frames)]
+    eem_y = [rng.uniform(50, 250, 30) if frame in (0, 2) else None for frame in range(n_frames)]
+    window = SimpleNamespace(
+        metadata={'resolution': 0.02, 'dimension': 500, 'pullback_length': np.arange(n_frames) * 0.5},
+        data={'reference': [None, (120.0, 130.0), None, None, (150.0, 160.0), None]},
+        gated_frames_dia=[0, 2, 4],
+        gated_frames_sys=[1, 3, 5],
+        file_name=str(tmp_path / 'pullback'),
+    )
+    contours = {'lumen': (lumen_x, lumen_y), 'eem': (eem_x, eem_y), 'calcium': ([None] * n_frames, [None] * n_frames)}
+    return window, contours
+
+
+def legacy_rows(window, x_list, y_list, frames):
+    """Rows as written by the former per-row csv.writer implementation."""
+    resolution = window.metadata['resolution']
+    img_dim_mm = window.metadata['dimension'] * resolution
+    offset = window.metadata['pullback_length'][frames[0]]
+    rows = []
+    for frame in frames:
+        if x_list[frame] is None:
+            continue
+        for x, y in zip(x_list[frame], y_list[frame]):
+            rows.append(
+                [frame + 1, x * resolution, abs(y * resolution - img_dim_mm), window.metadata['pullback_length'][frame] - offset]
+            )
+    return np.array(rows)
+
+
+def test_contour_table_matches_legacy_rows(export_window):
+    window, contours = export_window
+    phases = {'diastolic': window.gated_frames_dia, 'systolic': window.gated_frames_sys}
+    table = build_contour_table(window, contours, phases)
+
+    assert set(table['contour']) == {'lumen', 'eem'}
+    for contour_name in ('lumen', 'eem'):
+        for phase, frames in phases.items():
+            expected = legacy_rows(window, *contours[contour_name], frames)
+            group = table[(table['contour'] == contour_name) & (table['phase'] == phase)]
+            if not len(expected):
+                assert group.empty
+                continue
+            np.testing.assert_allclose(group[['frame', 'x', 'y', 'position']].to_numpy(dtype=float), expected)
+
+
+def test_save_contour_tables_writes_legacy_files(export_window):
+    window, contours = export_window
+    save_contour_tables(window, contours, save_as_csv=True)
+    out_dir = window.file_name + '_csv_files'
+
+    assert sorted(os.listdir(out_dir)) == [
+        'diastolic_contours.csv',
+        'diastolic_reference_points.csv',
+        'eem_diastolic_contours.csv',
+        'eem_systolic_contours.csv',  # no EEM contour in the systolic frames, written empty as before
+        'systolic_contours.csv',
+        'systolic_reference_points.csv',
+    ]
+    assert os.path.getsize(os.path.join(out_dir, 'eem_systolic_contours.csv')) == 0
+    with open(os.path.join(out_dir, 'systolic_contours.csv')) as in_file:
+        rows = np.array(list(csv.reader(in_file, delimiter='\t')), dtype=float)
+    np.testing.assert_allclose(rows, legacy_rows(window, *contours['lumen'], window.gated_frames_sys))
+
+    with open(os.path.join(out_dir, 'systolic_reference_points.csv')) as in_file:
+        reference = np.array(list(csv.reader(in_file, delimiter='\t')), dtype=float)
+    np.testing.assert_allclose(reference, [[2, 2.4, abs(130.0 * 0.02 - 10.0), 0.0]])
+
+
+def test_save_contour_tables_without_contours_in_gated_frames(export_window):
+    window, _ = export_window
+    empty = ([None] * 6, [None] * 6)
+    save_contour_tables(window, {'lumen': empty, 'eem': empty}, save_as_csv=True)
+    out_dir = window.file_name + '_csv_files'
+
+    assert sorted(os.listdir(out_dir)) == [
+        'diastolic_contours.csv',
+        'diastolic_reference_points.csv',
+        'systolic_contours.csv',
+        'systolic_reference_points.csv',
+    ]
+    assert os.path.getsize(os.path.join(out_dir, 'systolic_reference_points.csv')) > 0
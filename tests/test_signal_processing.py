@@ -0,0 +1,529 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from omegaconf import OmegaConf
+from scipy.ndimage import gaussian_filter
+from scipy.signal import butter, filtfilt, find_peaks
+
+from gating.auto_tune import auto_tune, beat_regularity
+from gating.headless_gating import GatingContext, gate_pullback, phase_frames
+from gating.image_signals import ImageSignalStream
+from gating.signal_processing import (
+    bandpass_filter,
+    bandpass_sos,
+    calculate_blurring_fft,
+    calculate_correlation,
+    calculate_motion_pca,
+    calculate_spectral_signals,
+    downsample_frames,
+    estimate_heart_rate,
+    filter_signals,
+    gating_cache_key,
+    gating_setting,
+    gating_windows,
+    identify_extrema,
+    image_signal_names,
+    measure_signals,
+    normalize_data,
+    normalize_signals,
+    prepare_data,
+    raw_signals,
+    stitch_windows,
+)
+
+CONTOUR_COLUMNS = ['shortest_distance', 'vector_angle', 'vector_length']
+
+
+@pytest.fixture
+def gating_config():
+    """Fixed gating settings without heart rate estimate and windows, tests change the ones they are about"""
+    return OmegaConf.create(
+        {
+            'gating': {
+                'normalize_step': 0,
+                'downsample': 2,
+                'lowcut': 1.33,
+                'highcut': 6.0,
+                'order': 6,
+                'extrema_y_lim': 50,
+                'extrema_x_lim': 6,
+                'maxima_only': True,
+                'motion_pca': False,
+                'spectral_signals': False,
+                'auto_heart_rate': False,
+                'window': 0,
+                'window_overlap': 0,
+            }
+        }
+    )
+
+
+@pytest.fixture
+def gating_context(gating_config):
+    """Stand-in for the main window at 30 fps"""
+    return GatingContext(gating_config, 30)
+
+
+def random_report_data(rng, n_frames):
+    return pd.DataFrame(rng.normal(0, 1, (n_frames, 3)), columns=CONTOUR_COLUMNS)
+
+
+@pytest.mark.parametrize('n_frames', [1, 2, 17, 40])
+def test_calculate_correlation_matches_corrcoef(n_frames):
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (60, 50))
+    frames = np.clip(base + rng.integers(-80, 80, (n_frames, 60, 50)), 0, 255).astype(np.uint8)
+
+    expected = [np.corrcoef(frames[i].ravel(), frames[i + 1].ravel())[0, 1] for i in range(n_frames - 1)] + [0]
+
+    assert calculate_correlation(frames) == pytest.approx(expected, abs=1e-5)
+
+
+@pytest.mark.parametrize('shape', [(5, 32, 32), (20, 31, 27)])
+def test_calculate_blurring_fft_matches_full_spectrum(shape):
+    frames = np.random.default_rng(1).integers(0, 256, shape).astype(np.uint8)
+
+    expected = []
+    for frame in frames:
+        magnitude_spectrum = np.abs(np.fft.fftshift(np.fft.fft2(frame))).ravel()
+        threshold_index = int(0.9 * magnitude_spectrum.size)
+        expected.append(np.mean(np.partition(magnitude_spectrum, threshold_index)[threshold_index:]))
+
+    scores = calculate_blurring_fft(frames, chunk_size=4, workers=2)
+
+    assert scores == pytest.approx(expected, rel=1e-5)
+
+
+def test_image_signal_stream_matches_batch_signals():
+    images = np.random.default_rng(2).integers(0, 256, (37, 80, 70)).astype(np.uint8)
+    crop = (10, 60, 5, 65)
+    stream = ImageSignalStream(len(images), crop=crop, buffer_size=8)
+    for start in range(0, len(images), 5):  # frames arrive in batches unrelated to the buffer size
+        stream.push(images[start : start + 5])
+        assert stream.signals(0, len(images), crop=crop) is None or stream.complete
+    stream.finish()
+
+    cropped = images[:, 10:60, 5:65]
+    correlation, blurring = stream.signals(4, 30, crop=crop)
+    assert correlation == pytest.approx(calculate_correlation(cropped[4:30]), abs=1e-5)
+    assert blurring == pytest.approx(calculate_blurring_fft(cropped[4:30]), rel=1e-5)
+    assert stream.signals(4, 30) is None  # different crop
+
+
+def test_gating_cache_key_tracks_range_crop_and_content(gating_context):
+    images = np.random.default_rng(3).integers(0, 256, (30, 64, 64)).astype(np.uint8)
+    report_data = random_report_data(np.random.default_rng(4), 10)
+    crop = (5, 60, 5, 60)
+
+    key = gating_cache_key(gating_context, images[0:10], report_data, (0, 10), crop)
+
+    assert json.loads(json.dumps(key)) == key  # saved with the contours
+    assert gating_cache_key(gating_context, images[0:10], report_data, (0, 10), crop) == key
+    assert gating_cache_key(gating_context, images[10:20], report_data, (10, 20), crop) != key  # same length
+    assert gating_cache_key(gating_context, images[0:10], report_data, (0, 10), (0, 64, 0, 64)) != key
+    assert gating_cache_key(gating_context, images[0:10], report_data * 2, (0, 10), crop) != key
+    changed = images[0:10].copy()
+    changed[:, ::7, ::7] += 1
+    assert gating_cache_key(gating_context, changed, report_data, (0, 10), crop) != key
+
+
+def test_image_signal_store_serves_sub_ranges():
+    images = np.random.default_rng(5).integers(0, 256, (40, 50, 50)).astype(np.uint8)
+    crop = (0, 50, 0, 50)
+    stream = ImageSignalStream(len(images), crop=crop)
+    stream.store(10, 30, calculate_correlation(images[10:30]), calculate_blurring_fft(images[10:30]), crop=crop)
+
+    correlation, blurring = stream.signals(15, 25, crop=crop)
+    assert correlation == pytest.approx(calculate_correlation(images[15:25]), abs=1e-5)
+    assert blurring == pytest.approx(calculate_blurring_fft(images[15:25]), rel=1e-5)
+    assert stream.signals(5, 25, crop=crop) is None
+
+
+@pytest.mark.parametrize('step', [0, 7, 10, 200])
+def test_normalize_data_segments(step):
+    data = np.random.default_rng(6).normal(5, 2, 53)
+    expected = np.zeros_like(data)
+    for start in range(0, len(data), step or len(data)):
+        segment = data[start : start + (step or len(data))]
+        expected[start : start + len(segment)] = (segment - segment.mean()) / segment.std()
+
+    assert normalize_data(data, step) == pytest.approx(expected)
+
+
+def test_normalize_data_constant_segment_is_zero():
+    data = np.r_[np.full(10, 3.0), np.arange(10.0), [1.0]]  # constant segment and single-sample tail
+
+    normalized = normalize_data(data, 10)
+
+    assert np.isfinite(normalized).all()
+    assert normalized[:10] == pytest.approx(0)
+    assert normalized[-1] == 0
+
+
+@pytest.mark.parametrize('missing', [0, 12, 19])
+def test_normalize_data_interpolates_missing_value(missing):
+    data = np.random.default_rng(8).normal(5, 2, 40)
+    expected = data.copy()
+    data[missing] = np.nan
+    expected[missing] = np.interp(missing, np.flatnonzero(np.isfinite(data)), data[np.isfinite(data)])
+
+    normalized = normalize_data(data, 20)
+
+    assert np.isfinite(normalized).all()
+    assert normalized == pytest.approx(normalize_data(expected, 20))
+    assert np.abs(normalized[:20]).max() > 0  # the segment with the missing value is not blanked
+    assert normalize_data(np.full(5, np.nan), 0) == pytest.approx(0)
+
+
+@pytest.mark.parametrize('factor', [1, 2, 4])
+def test_downsample_frames_averages_blocks(factor):
+    frames = np.random.default_rng(7).integers(0, 256, (70, 42, 39)).astype(np.uint8)
+
+    reduced = downsample_frames(frames, factor, chunk_size=32)
+
+    height, width = 42 // factor, 39 // factor
+    blocks = frames[:, : height * factor, : width * factor].reshape(70, height, factor, width, factor)
+    assert reduced.shape == (70, height, width)
+    assert reduced == pytest.approx(blocks.mean(axis=(2, 4)), abs=1e-4)
+
+
+def test_downsampled_image_signals_keep_extrema():
+    rng = np.random.default_rng(8)
+    pattern = gaussian_filter(rng.random((128, 128)), 1.5) * 1000
+    displacement = np.round(5 * np.sin(2 * np.pi * np.arange(120) / 20)).astype(int)  # one beat per 20 frames
+    frames = np.stack([np.roll(pattern, shift, axis=0) for shift in displacement])
+    frames = np.clip(frames - frames.min() + rng.normal(0, 5, frames.shape), 0, 255).astype(np.uint8)
+
+    peaks = []
+    for factor in (1, 4):
+        signal = -calculate_correlation(downsample_frames(frames, factor))[:-1]  # motion between frames
+        peaks.append(find_peaks(signal, distance=6, prominence=np.ptp(signal) / 4)[0])
+
+    assert len(peaks[0]) == len(peaks[1])
+    assert np.abs(peaks[0] - peaks[1]).max() <= 1
+
+
+def test_gate_pullback_without_qt(gating_config):
+    code = 'import sys, gating.headless_gating; print(any(name.startswith("PyQt") for name in sys.modules))'
+    imported_qt = subprocess.run([sys.executable, '-c', code], cwd='src', capture_output=True, text=True, check=True)
+    assert imported_qt.stdout.strip() == 'False'
+
+    rng = np.random.default_rng(9)
+    n_frames, period = 150, 24  # 75 bpm at 30 fps
+    phase = 2 * np.pi * np.arange(n_frames) / period
+    pattern = gaussian_filter(rng.random((96, 96)), 1.5) * 1000
+    frames = np.stack([np.roll(pattern, round(shift), axis=0) for shift in 4 * np.sin(phase)])
+    frames = np.clip(frames - frames.min() + rng.normal(0, 5, frames.shape), 0, 255).astype(np.uint8)
+    report_data = pd.DataFrame(
+        {
+            'frame': np.arange(1, n_frames + 1),
+            'shortest_distance': np.cos(phase) + rng.normal(0, 0.05, n_frames),
+            'vector_angle': np.cos(phase + 0.1) + rng.normal(0, 0.05, n_frames),
+            'vector_length': np.cos(phase - 0.1) + rng.normal(0, 0.05, n_frames),
+            'elliptic_ratio': 1.2 + 0.1 * np.cos(phase),
+        },
+        index=np.arange(1, n_frames + 1),
+    )
+    result = gate_pullback(frames, report_data, gating_config, 30, image_method='extrema', crop=(0, 96, 0, 96))
+
+    assert len(result.image_based_gating_filtered) == len(result.contour_based_gating_filtered) == n_frames
+    gated = sorted(result.diastolic_frames + result.systolic_frames)
+    assert gated == np.intersect1d(result.image_indices, result.contour_indices).tolist()  # frame 1 is row 0
+    assert not set(result.diastolic_frames) & set(result.systolic_frames)
+    with pytest.raises(ValueError):
+        gate_pullback(frames[1:], report_data, gating_config, 30)
+
+
+def test_phase_frames_assigns_compressed_frames_to_systole(gating_context):
+    signal = np.sin(2 * np.pi * np.arange(100) / 20)  # maxima at 5, 25, ..., minima at 15, 35, ...
+    report_data = pd.DataFrame({'frame': np.arange(11, 111), 'elliptic_ratio': 1.2 + 0.1 * signal})
+
+    diastolic, systolic, image_indices, _ = phase_frames(gating_context, report_data, signal, signal, 'extrema')
+
+    assert image_indices.tolist() == [5, 15, 25, 35, 45, 55, 65, 75, 85, 95]
+    assert systolic == [15, 35, 55, 75, 95]  # row 5 is frame 16, 0-based 15
+    assert diastolic == [25, 45, 65, 85, 105]
+
+
+def test_beat_regularity_prefers_regular_complete_beats():
+    regular = beat_regularity(list(range(0, 200, 20)), list(range(10, 200, 20)), 200, 30)
+    irregular = beat_regularity([0, 15, 40, 55, 80, 95, 120], list(range(10, 200, 20)), 200, 30)
+    missing = beat_regularity(list(range(0, 100, 20)), list(range(10, 100, 20)), 200, 30)
+
+    assert regular == pytest.approx(0)
+    assert irregular > regular and missing > regular
+    assert np.isnan(beat_regularity([0, 20], list(range(10, 200, 20)), 200, 30))  # too few beats
+    assert np.isnan(beat_regularity(list(range(0, 200, 2)), list(range(1, 200, 2)), 200, 30))  # 900 bpm
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_auto_tune_ranks_grid(workers, gating_context, monkeypatch):
+    rng = np.random.default_rng(10)
+    n_frames, period = 240, 24  # 75 bpm at 30 fps
+    signal = np.sin(2 * np.pi * np.arange(n_frames) / period)
+    raw = [signal + rng.normal(0, 0.05, n_frames) for _ in range(5)]
+    monkeypatch.setattr('gating.auto_tune.raw_signals', lambda *args: (raw[:2], raw[2:]))
+    report_data = pd.DataFrame({'frame': np.arange(1, n_frames + 1), 'elliptic_ratio': 1.2 + 0.1 * signal})
+    gating_context.config.gating.maxima_only = False
+    grid = {'lowcut': [1.0, 1.33], 'highcut': [6.0, 20.0], 'order': [2, 4], 'extrema_y_lim': [50]}
+
+    best, ranking = auto_tune(gating_context, None, report_data, grid, 'extrema', 'extrema', workers=workers)
+
+    assert len(ranking) == 12  # highcut 20 Hz is above the Nyquist frequency
+    scores = ranking['score'].to_numpy()
+    assert np.isfinite(scores[0]) and np.all(np.diff(scores[np.isfinite(scores)]) >= 0)
+    assert best['normalize_step'] == 0
+    for name in ('lowcut', 'highcut', 'order', 'extrema_y_lim', 'extrema_x_lim'):
+        assert best[name] == ranking[name].iloc[0]
+
+    progress = []
+    cancelled = auto_tune(
+        gating_context,
+        None,
+        report_data,
+        grid,
+        workers=workers,
+        progress_callback=progress.append,
+        is_cancelled=lambda: True,
+    )
+    assert cancelled is None and progress == [1]  # stops after the first filter setting
+
+
+def test_auto_tune_scores_like_gating(gating_context, monkeypatch):
+    rng = np.random.default_rng(12)
+    n_frames, period = 480, 24
+    signal = np.sin(2 * np.pi * np.arange(n_frames) / period)
+    raw = [signal + rng.normal(0, 0.05, n_frames) for _ in range(5)]
+    monkeypatch.setattr('gating.auto_tune.raw_signals', lambda *args: (raw[:2], raw[2:]))
+    report_data = pd.DataFrame({'frame': np.arange(1, n_frames + 1), 'elliptic_ratio': 1.2 + 0.1 * signal})
+    gating_context.config.gating.update(
+        {'maxima_only': False, 'auto_heart_rate': True, 'window': 200, 'window_overlap': 40}
+    )
+    grid = {'lowcut': [1.0], 'highcut': [6.0], 'order': [2, 4], 'extrema_y_lim': [50], 'extrema_x_lim': [6]}
+
+    best, ranking = auto_tune(gating_context, None, report_data, grid, 'extrema', 'extrema', workers=1)
+
+    assert np.isfinite(ranking['score'].iloc[0])
+    assert ranking['auto_heart_rate'].tolist().count(True) == 1  # the band derived from the heart rate competes
+    for row in ranking.itertuples():
+        config = OmegaConf.create({'gating': {**gating_context.config.gating, **row._asdict()}})
+        context = GatingContext(config, 30)
+        with np.errstate(all='ignore'):  # the unfiltered sines have perfectly regular extrema
+            *_, image_signal, contour_signal = filter_signals(context, raw[:2], raw[2:])
+        assert 'heart_rate_windows' in context.metadata  # gated in windows
+        diastolic, systolic, *_ = phase_frames(context, report_data, image_signal, contour_signal, 'extrema', 'extrema')
+        assert row.score == pytest.approx(beat_regularity(diastolic, systolic, n_frames, 30), nan_ok=True)
+    assert best['auto_heart_rate'] == ranking['auto_heart_rate'].iloc[0]
+
+
+@pytest.mark.parametrize('order', [2, 4, 6])
+def test_bandpass_filter_matches_ba_filtfilt(order, gating_context):
+    signals = np.random.default_rng(11).normal(size=(5, 500))
+    b, a = butter(order, [1.33 / 15, 6.0 / 15], btype='band')
+    gating_context.config.gating.order = order
+
+    filtered = bandpass_filter(gating_context, signals)
+
+    assert filtered == pytest.approx(filtfilt(b, a, signals), abs=1e-8)
+    assert bandpass_filter(gating_context, signals[2]) == pytest.approx(filtered[2])
+    assert bandpass_sos(30.0, 1.33, 6.0, order) is bandpass_sos(30.0, 1.33, 6.0, order)  # designed once
+
+
+def test_bandpass_filter_is_stable_for_narrow_bands(gating_context):
+    frame_rate, lowcut, highcut = 60, 1.0, 1.5  # (b, a) form of order 6 has poles outside the unit circle
+    time_s = np.arange(3000) / frame_rate
+    sine = np.sin(2 * np.pi * np.sqrt(lowcut * highcut) * time_s)
+    gating_context.metadata['frame_rate'] = frame_rate
+    gating_context.config.gating.update({'lowcut': lowcut, 'highcut': highcut})
+
+    filtered = bandpass_filter(gating_context, sine)
+
+    assert np.all(np.isfinite(filtered))
+    assert np.abs(filtered[500:-500]).max() == pytest.approx(1, abs=0.05)  # pass band kept
+
+
+@pytest.mark.parametrize('bpm', [50, 75, 150])
+def test_estimate_heart_rate_sets_gating_settings(bpm, gating_context):
+    rng = np.random.default_rng(12)
+    time_s = np.arange(3000) / 30
+    signal_frequency = 2 * bpm / 60  # both resting phases per beat
+    signals = [np.sin(2 * np.pi * signal_frequency * time_s + shift) for shift in range(5)]
+    signals = np.array(signals) + rng.normal(0, 0.5, (5, len(time_s)))
+
+    heart_rate = estimate_heart_rate(signals, 30)
+
+    assert heart_rate['bpm'] == pytest.approx(bpm, rel=0.05)
+    assert heart_rate['confidence'] > 0.5
+    assert heart_rate['extrema_x_lim'] == round(15 / signal_frequency)
+    assert heart_rate['lowcut'] < signal_frequency < heart_rate['highcut'] < 15
+
+    gating_context.metadata['heart_rate'] = heart_rate
+    assert gating_setting(gating_context, 'extrema_x_lim') == 6  # auto_heart_rate not set
+    gating_context.config.gating.auto_heart_rate = True
+    assert gating_setting(gating_context, 'extrema_x_lim') == heart_rate['extrema_x_lim']
+    assert gating_setting(gating_context, 'order') == 6
+
+
+def test_estimate_heart_rate_keeps_config_for_noise():
+    heart_rate = estimate_heart_rate(np.random.default_rng(13).normal(size=(5, 3000)), 30)
+
+    assert heart_rate['confidence'] < 0.2
+    assert 'extrema_x_lim' not in heart_rate
+    assert estimate_heart_rate(np.zeros(10), 30) is None  # too short
+
+
+def test_calculate_motion_pca_matches_exact_svd():
+    rng = np.random.default_rng(12)
+    n_frames = 90
+    phase = 2 * np.pi * np.arange(n_frames) / 18
+    components = rng.normal(0, 1, (3, 40 * 36))
+    weights = np.stack([np.sin(phase), np.cos(2 * phase), 0.3 * rng.normal(0, 1, n_frames)], axis=1)
+    frames = (128 + 20 * (weights @ components) + rng.normal(0, 2, (n_frames, 40 * 36))).reshape(n_frames, 40, 36)
+    frames = np.clip(frames, 0, 255).astype(np.uint8)
+
+    data = frames.reshape(n_frames, -1).astype(float)
+    left, singular_values, _ = np.linalg.svd(data - data.mean(axis=0), full_matrices=False)
+    scores = left[:, :4] * singular_values[:4]
+    expected = -np.linalg.norm(np.diff(scores, axis=0), axis=1)
+
+    signal = calculate_motion_pca(frames, n_components=4, chunk_size=16)
+
+    assert signal.shape == (n_frames,)
+    assert signal[-1] == signal[-2]
+    assert np.corrcoef(signal[:-1], expected)[0, 1] > 0.99
+
+
+def test_raw_signals_adds_motion_pca(gating_context):
+    rng = np.random.default_rng(13)
+    frames = rng.integers(0, 256, (30, 48, 48)).astype(np.uint8)
+    report_data = random_report_data(rng, 30)
+
+    image_signals, contour_signals = raw_signals(gating_context, frames, report_data, (0, 48, 0, 48))
+    assert len(image_signals) == 2 and len(contour_signals) == 3
+
+    gating_context.config.gating.motion_pca = True
+    image_signals, _ = raw_signals(gating_context, frames, report_data, (0, 48, 0, 48))
+    assert len(image_signals) == 3
+    assert all(len(signal) == 30 for signal in image_signals)
+
+
+def test_filter_signals_matches_prepare_data(gating_context):
+    rng = np.random.default_rng(14)
+    n_frames = 120
+    frames = rng.integers(0, 256, (n_frames, 40, 40)).astype(np.uint8)
+    report_data = random_report_data(rng, n_frames)
+    gating_context.config.gating.update({'normalize_step': 50, 'downsample': 1, 'order': 4, 'auto_heart_rate': True})
+    crop = (0, 40, 0, 40)
+
+    expected = prepare_data.__wrapped__(gating_context, frames, report_data, *crop)
+    measured = measure_signals(gating_context, frames, report_data, crop)
+    gating_context.metadata.pop('heart_rate', None)
+    signals = filter_signals(gating_context, *normalize_signals(gating_context, *measured))
+
+    assert measured[1][0][0] == report_data['shortest_distance'].iloc[-1]  # shifted to the current frame
+    for signal, reference in zip(signals, expected):
+        assert signal == pytest.approx(reference)
+    assert gating_context.metadata.get('heart_rate') == gating_context.data['gating_signal']['heart_rate']
+
+    # the plot keeps the measured signals for refilter, a cache hit measures nothing
+    gating_context.data.clear()
+    *_, kept = prepare_data.__wrapped__(gating_context, frames, report_data, *crop, return_measured=True)
+    for signal, reference in zip([*kept[0], *kept[1]], [*measured[0], *measured[1]]):
+        assert signal == pytest.approx(reference)
+    assert prepare_data.__wrapped__(gating_context, frames, report_data, *crop, return_measured=True)[-1] is None
+
+
+@pytest.mark.parametrize(
+    'n_frames, window, overlap',
+    [(500, 0, 50), (500, 500, 50), (8000, 1800, 150), (2000, 1800, 150), (3600, 1800, 0), (4100, 1000, 0)],
+)
+def test_gating_windows_cover_frames_with_overlap(n_frames, window, overlap):
+    windows = gating_windows(n_frames, window, overlap)
+
+    assert windows[0][0] == 0 and windows[-1][1] == n_frames
+    if not window or n_frames <= window:
+        assert windows == [(0, n_frames)]
+    for (start, stop), (next_start, _) in zip(windows[:-1], windows[1:]):
+        assert stop - start == window
+        assert stop - next_start >= overlap
+    signal = np.random.default_rng(15).normal(0, 1, n_frames)
+    stitched = stitch_windows([signal[start:stop] for start, stop in windows], windows, n_frames)
+    assert stitched == pytest.approx(signal)
+
+
+def test_stitch_windows_joins_touching_windows():
+    windows = gating_windows(3600, 1800, 0)
+    pieces = [np.full(1800, 1.0), np.full(1800, 2.0)]
+
+    stitched = stitch_windows(pieces, windows, 3600)
+
+    assert windows == [(0, 1800), (1800, 3600)]
+    assert stitched[:1800] == pytest.approx(1) and stitched[1800:] == pytest.approx(2)
+
+
+def test_windowed_gating_follows_heart_rate(gating_context):
+    rng = np.random.default_rng(16)
+    n_frames, frame_rate = 4000, 30
+    bpm = np.linspace(55, 110, n_frames)
+    phase = 2 * np.pi * np.cumsum(2 * bpm / 60 / frame_rate)  # one systole and diastole per half beat
+    image_signals = [-np.abs(np.cos(phase)) + rng.normal(0, 0.3, n_frames) for _ in range(2)]
+    contour_signals = [np.sin(phase) + rng.normal(0, 0.3, n_frames) for _ in range(3)]
+    gating_context.config.gating.update(
+        {'maxima_only': False, 'auto_heart_rate': True, 'window': 1000, 'window_overlap': 100}
+    )
+
+    signals = filter_signals(gating_context, image_signals, contour_signals)
+
+    assert all(len(signal) == n_frames for signal in signals)
+    assert 'heart_rate' not in gating_context.metadata
+    estimates = [window['heart_rate']['bpm'] for window in gating_context.metadata['heart_rate_windows']]
+    assert len(estimates) == 5
+    assert np.all(np.diff(estimates) > 0)
+    assert estimates[0] == pytest.approx(bpm[500], abs=8) and estimates[-1] == pytest.approx(bpm[-500], abs=8)
+    extrema, maxima = identify_extrema(gating_context, signals[3])
+    assert np.all(np.diff(extrema) > 0) and np.isin(maxima, extrema).all()
+
+    gating_context.config.gating.window_overlap = 0  # allowed in the parameter panel, windows only touch
+    assert all(np.isfinite(signal).all() for signal in filter_signals(gating_context, image_signals, contour_signals))
+
+    gating_context.config.gating.window = n_frames  # one window is the same as gating the whole range
+    single = filter_signals(gating_context, image_signals, contour_signals)
+    gating_context.config.gating.window = 0
+    assert filter_signals(gating_context, image_signals, contour_signals)[3] == pytest.approx(single[3])
+
+
+def test_spectral_signals_share_one_fft_pass():
+    rng = np.random.default_rng(17)
+    pattern = gaussian_filter(rng.random((64, 48)), 1.5) * 1000
+    offsets = [(0, 0), (3, -2), (5, 1), (5, 1), (-7, 4), (-6, 4), (0, 0)]
+    frames = np.stack([np.roll(pattern, offset, axis=(0, 1)) for offset in offsets]).astype(np.float32)
+
+    blurring, shift, similarity = calculate_spectral_signals(frames, chunk_size=2, workers=2)
+
+    expected_shift = [-np.hypot(*np.subtract(b, a)) for a, b in zip(offsets[:-1], offsets[1:])]
+    assert blurring == pytest.approx(calculate_blurring_fft(frames), rel=1e-5)
+    assert shift == pytest.approx(expected_shift + expected_shift[-1:], abs=1e-3)
+    assert similarity == pytest.approx(np.ones(len(frames)), abs=1e-4)  # translation keeps the magnitude spectrum
+
+    blurred = frames.copy()
+    blurred[3] = gaussian_filter(frames[3], 2)
+    similarity = calculate_spectral_signals(blurred)[2]
+    assert similarity[2] < 0.99 and similarity[0] > 0.999
+
+
+def test_raw_signals_names_optional_image_signals(gating_context):
+    rng = np.random.default_rng(18)
+    frames = rng.integers(0, 256, (30, 48, 48)).astype(np.uint8)
+    report_data = random_report_data(rng, 30)
+    gating_context.config.gating.update({'spectral_signals': True, 'motion_pca': True})
+
+    image_signals, _ = raw_signals(gating_context, frames, report_data, (0, 48, 0, 48))
+
+    names = image_signal_names(gating_context)
+    assert names == ['Correlation', 'Blurring', 'Phase shift', 'Spectral similarity', 'PCA motion']
+    assert len(image_signals) == len(names)
+    assert all(len(signal) == 30 for signal in image_signals)